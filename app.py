@@ -36,6 +36,9 @@ DB_CONFIG = {
     "port": int(get_secret("DB_PORT", 5432)),
     "connect_timeout": 5,
 }
+# Offers listed by the dashboard: the last N days (only their monthly partitions
+# are read), near-duplicates excluded like in the materialized views
+DASHBOARD_DAYS = int(get_secret("DASHBOARD_DAYS", 90))
 st.write("DB:", DB_CONFIG["host"], DB_CONFIG["dbname"])
 st.title(APP_TITLE)
 
@@ -126,27 +129,39 @@ df_jobs = load_dataframe(
         l.code_postal,
         l.latitude,
         l.longitude
-    FROM public.job_offer jo
+    FROM public.job_offer_distinct jo
     LEFT JOIN public.contract c ON c.id = jo.contract_id
     LEFT JOIN public.location l ON l.id = jo.location_id
+    WHERE jo.date_posted >= CURRENT_DATE - %d
     """
+    % DASHBOARD_DAYS
 )
 st.write(df_jobs.head())
 
+# Pre-aggregated analyses (materialized views, refreshed after each ingest run)
+df_market = load_dataframe("SELECT nb_offres, with_gps, pct_with_gps FROM public.mv_market_summary")
+
 df_skills = load_dataframe(
     """
-    SELECT
-        s.name,
-        s.category,
-        jos.requirement_level,
-        jos.job_offer_id
-    FROM public.job_offer_skill jos
-    JOIN public.skill s ON s.id = jos.skill_id
+    SELECT category, name, job_count AS nb_offres, pct_jobs AS pct
+    FROM public.mv_skill_share
+    WHERE requirement_level = 'any'
+    ORDER BY job_count DESC
     """
 )
 
-if df_jobs.empty:
-    st.stop()
+df_cities = load_dataframe(
+    """
+    SELECT ville, SUM(nb_offres) AS nb_offres
+    FROM public.mv_location_offers
+    GROUP BY ville
+    ORDER BY nb_offres DESC
+    LIMIT 5
+    """
+)
+
+# Tabs listing recent offers show this instead; the others still render
+NO_RECENT_OFFERS = f"Aucune offre publiée ces {DASHBOARD_DAYS} derniers jours."
 
 
 # ==================================================
@@ -168,25 +183,25 @@ tabs = st.tabs(
 with tabs[0]:
     st.subheader("Vue globale du marché")
 
-    st.metric("Nombre total d'offres", df_jobs["id"].nunique())
-
-    st.dataframe(
-        df_jobs[["title", "ville", "contract"]],
-        use_container_width=True,
+    # All offers ingested (materialized view), not only the listed ones
+    st.metric(
+        "Nombre total d'offres",
+        int(df_market["nb_offres"].iloc[0]) if not df_market.empty else "—",
     )
 
-    st.subheader("Top localisations")
+    st.caption(f"Offres publiées ces {DASHBOARD_DAYS} derniers jours")
+    if df_jobs.empty:
+        st.info(NO_RECENT_OFFERS)
+    else:
+        st.dataframe(
+            df_jobs[["title", "ville", "contract"]],
+            use_container_width=True,
+        )
 
-    loc_counts = (
-        df_jobs.groupby("ville")
-        .size()
-        .reset_index(name="nb_offres")
-        .sort_values("nb_offres", ascending=False)
-        .head(5)
-    )
+    st.subheader("Top localisations")
 
     fig = px.bar(
-        loc_counts,
+        df_cities,
         x="ville",
         y="nb_offres",
         title="Top 5 des villes avec le plus d'offres",
@@ -200,17 +215,8 @@ with tabs[0]:
 with tabs[1]:
     st.subheader("Analyse des compétences")
 
-    total_jobs = df_jobs["id"].nunique()
-
     for category, label in [("hard", "Hard skills"), ("soft", "Soft skills")]:
-        skills = (
-            df_skills[df_skills["category"] == category]
-            .groupby("name")["job_offer_id"]
-            .nunique()
-            .reset_index(name="nb_offres")
-            .sort_values("nb_offres", ascending=False)
-        )
-        skills["pct"] = round(100 * skills["nb_offres"] / total_jobs, 1)
+        skills = df_skills[df_skills["category"] == category][["name", "nb_offres", "pct"]]
 
         st.markdown(f"### {label}")
         st.dataframe(skills.head(20), use_container_width=True)
@@ -229,21 +235,28 @@ with tabs[1]:
 # ==================================================
 with tabs[2]:
     st.subheader("Analyse des salaires")
+    # Every figure of this tab is over the listed offers only
+    st.caption(f"Offres publiées ces {DASHBOARD_DAYS} derniers jours")
 
     total = len(df_jobs)
     with_salary = df_jobs["salary_min_annual"].notna().sum()
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Offres totales", total)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric(f"Offres ({DASHBOARD_DAYS} j)", total)
     col2.metric("Offres avec salaire", with_salary)
-    col3.metric("% avec salaire", f"{round(100 * with_salary / total, 1)} %")
+    col3.metric("% avec salaire", f"{round(100 * with_salary / total, 1)} %" if total else "—")
+    median = df_jobs["salary_min_annual"].median()
+    col4.metric("Salaire min. médian", "—" if pd.isna(median) else f"{median:,.0f} €".replace(",", " "))
 
-    st.dataframe(
-        df_jobs[["title", "salary_min_annual", "ville"]]
-        .dropna(subset=["salary_min_annual"])
-        .head(50),
-        use_container_width=True,
-    )
+    if df_jobs.empty:
+        st.info(NO_RECENT_OFFERS)
+    else:
+        st.dataframe(
+            df_jobs[["title", "salary_min_annual", "ville"]]
+            .dropna(subset=["salary_min_annual"])
+            .head(50),
+            use_container_width=True,
+        )
 
 
 # ==================================================
@@ -254,7 +267,9 @@ with tabs[3]:
 
     df_geo = df_jobs.dropna(subset=["latitude", "longitude"])
 
-    if df_geo.empty:
+    if df_jobs.empty:
+        st.info(NO_RECENT_OFFERS)
+    elif df_geo.empty:
         st.info("Aucune coordonnée géographique exploitable.")
     else:
         fig_map = px.scatter_mapbox(
@@ -277,7 +292,9 @@ with tabs[4]:
 
     query = st.text_input("Intitulé de poste de référence")
 
-    if query:
+    if query and df_jobs.empty:
+        st.info(NO_RECENT_OFFERS)
+    elif query:
         from analysis.job_titles import find_related_job_titles
 
         results = find_related_job_titles(
@@ -0,0 +1,151 @@
+"""
+Materialized analytics views (sql/schema.sql, MATERIALIZED ANALYTICS VIEWS).
+
+The sql/analytics.sql aggregations are pre-computed into small views that
+the API and the dashboard read in milliseconds. They are refreshed
+CONCURRENTLY at the end of each successful ingest run: readers keep
+seeing the previous content during a refresh, never an empty or
+half-built view. Each refresh is recorded in `analytics_refresh` (data as
+of, duration, rows), which `freshness` reports.
+
+Usage (from ingestion/):
+    python analytics_views.py             # freshness of every view
+    python analytics_views.py --refresh   # refresh them now
+"""
+import argparse
+import json
+import logging
+import time
+
+import psycopg2
+
+from config import settings
+from db import get_connection
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+MATERIALIZED_VIEWS = (
+    "mv_market_summary",
+    "mv_skill_share",
+    "mv_location_offers",
+    "mv_contract_offers",
+    "mv_monthly_offers",
+)
+
+
+def refresh_views(conn, views=MATERIALIZED_VIEWS) -> dict[str, float]:
+    """
+    Refresh each view in its own transaction; return {view: seconds}.
+    A view never populated yet is refreshed without CONCURRENTLY (which
+    requires existing content); a missing view is skipped with a warning.
+    """
+    durations = {}
+    for view in views:
+        t0 = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT ispopulated
+                FROM pg_matviews
+                WHERE schemaname = 'public' AND matviewname = %s
+                """,
+                (view,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                logger.warning("materialized view %s does not exist: apply sql/schema.sql", view)
+                conn.rollback()
+                continue
+
+            concurrently = "CONCURRENTLY " if row[0] else ""
+            cur.execute(f"REFRESH MATERIALIZED VIEW {concurrently}public.{view}")
+            cur.execute(f"SELECT COUNT(*) FROM public.{view}")
+            row_count = cur.fetchone()[0]
+            seconds = time.perf_counter() - t0
+            cur.execute(
+                """
+                INSERT INTO public.analytics_refresh (view_name, refreshed_at, duration_ms, row_count)
+                VALUES (%s, now(), %s, %s)
+                ON CONFLICT (view_name) DO UPDATE SET
+                    refreshed_at = EXCLUDED.refreshed_at,
+                    duration_ms = EXCLUDED.duration_ms,
+                    row_count = EXCLUDED.row_count
+                """,
+                (view, round(seconds * 1000, 3), row_count),
+            )
+        conn.commit()
+        durations[view] = seconds
+    return durations
+
+
+def refresh_after_ingest() -> dict[str, float]:
+    """
+    End-of-run hook of the ingestion CLIs (ANALYTICS_REFRESH=0 disables it).
+    The run's data is already committed: a failed refresh is logged, not
+    raised, and the views keep their previous content.
+    """
+    if not settings.ANALYTICS_REFRESH:
+        return {}
+    conn = get_connection()
+    try:
+        with stage("refresh_views", rows=len(MATERIALIZED_VIEWS)):
+            durations = refresh_views(conn)
+        logger.info(
+            "analytics views refreshed in %.2fs: %s",
+            sum(durations.values()),
+            {view: round(s, 3) for view, s in durations.items()},
+        )
+        return durations
+    except psycopg2.Error:
+        conn.rollback()
+        logger.exception("analytics views refresh failed, they keep their previous content")
+        return {}
+    finally:
+        conn.close()
+
+
+def freshness(conn) -> list[dict]:
+    """
+    Last refresh of each view: data as of, age, duration and row count
+    (refreshed_at None = never refreshed since it was created)
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                v.view_name,
+                r.refreshed_at,
+                EXTRACT(EPOCH FROM now() - r.refreshed_at) AS age_seconds,
+                r.duration_ms,
+                r.row_count
+            FROM unnest(%s::text[]) AS v(view_name)
+            LEFT JOIN public.analytics_refresh r ON r.view_name = v.view_name
+            ORDER BY v.view_name
+            """,
+            (list(MATERIALIZED_VIEWS),),
+        )
+        columns = [c.name for c in cur.description]
+        rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+    conn.rollback()
+    for row in rows:
+        if row["age_seconds"] is not None:
+            row["age_seconds"] = round(float(row["age_seconds"]), 1)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialized analytics views")
+    parser.add_argument("--refresh", action="store_true", help="refresh every view before reporting")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    conn = get_connection()
+    try:
+        if args.refresh:
+            refresh_views(conn)
+        for row in freshness(conn):
+            print(json.dumps(row, default=str))
+    finally:
+        conn.close()
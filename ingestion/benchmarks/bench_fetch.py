@@ -0,0 +1,60 @@
+"""
+Sequential vs concurrent paging against the local search stub.
+
+Usage (from ingestion/):
+    python -m benchmarks.bench_fetch --offers 3150 --latency 0.2 --fail-rate 0.05
+"""
+import argparse
+import time
+
+from ft_client import FranceTravailClient
+from ingest import fetch_all_ft_offers
+
+from benchmarks.stub_ft_api import StubFranceTravail
+from benchmarks.synthetic import generate_ft_items
+
+
+def run(stub: StubFranceTravail, url: str, max_results: int, concurrency: int, rate_limit: float) -> dict:
+    stub.requests = stub.failures = 0
+    client = FranceTravailClient(
+        client_id="bench",
+        client_secret="bench",
+        token_url=stub.token_url,
+        search_url=url,
+        pool_size=concurrency,
+        rate_limit=rate_limit,
+    )
+    t0 = time.perf_counter()
+    offers = fetch_all_ft_offers(
+        keywords="data",
+        max_results=max_results,
+        concurrency=concurrency,
+        client=client,
+    )
+    elapsed = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "rate_limit": rate_limit,
+        "offers": len(offers),
+        "unique_ids": len({o["id"] for o in offers}),
+        "requests": stub.requests,
+        "injected_failures": stub.failures,
+        "seconds": round(elapsed, 3),
+        "latency": client.metrics(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=3150)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    items = generate_ft_items(args.offers)
+    with StubFranceTravail(items, latency=args.latency, fail_rate=args.fail_rate, token_ttl=3600) as stub:
+        url = stub.start()
+        for n in args.concurrency:
+            print(run(stub, url, len(items), n, args.rate_limit))
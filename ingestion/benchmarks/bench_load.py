@@ -0,0 +1,105 @@
+"""
+Compare the loaders on the same synthetic dataset.
+
+Usage (from ingestion/):
+    python -m benchmarks.bench_load --offers 10000 --loaders row batch copy [--cache]
+
+Every loader runs in its own transaction which is rolled back, so the
+target database is left untouched. The exception is `parallel`, which
+commits (see loaders.load_offers_parallel): it is only run when listed
+in --loaders, against a scratch database.
+
+Round trips count the statements of every connection opened during the
+run, the parallel loader's worker connections included.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import db
+from config import settings
+from dimension_cache import DimensionCaches
+from ingest import preprocess_ft
+from instrumentation import InstrumentedCursor
+from loaders import LOADERS
+
+from benchmarks.synthetic import generate_ft_items
+
+
+# Loaders that commit their writes: never part of the default run
+COMMITTING_LOADERS = {"parallel"}
+
+
+class CountingCursor(InstrumentedCursor):
+    """
+    Cursor counting every statement sent to the server (= round trips),
+    from any thread
+    """
+    statements = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def _count(cls) -> None:
+        with cls._lock:
+            cls.statements += 1
+
+    def execute(self, query, vars=None):
+        self._count()
+        return super().execute(query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        self._count()
+        return super().copy_expert(sql, file, size)
+
+
+def run(loader: str, df, use_cache: bool = False) -> dict:
+    CountingCursor.statements = 0
+    db.set_cursor_factory(CountingCursor)
+    cache = DimensionCaches(max_size=settings.DIM_CACHE_MAX_SIZE) if use_cache else None
+
+    try:
+        conn = db.get_connection()
+        try:
+            t0 = time.perf_counter()
+            if cache:
+                cache.warm(conn)
+            LOADERS[loader](conn, df, cache=cache)
+            elapsed = time.perf_counter() - t0
+        finally:
+            conn.rollback()
+            conn.close()
+    finally:
+        db.set_cursor_factory(None)
+
+    return {
+        "loader": loader,
+        "cache": cache.stats() if cache else None,
+        "offers": len(df),
+        "round_trips": CountingCursor.statements,
+        "seconds": round(elapsed, 3),
+        "offers_per_sec": round(len(df) / elapsed, 1) if elapsed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--loaders",
+        nargs="+",
+        choices=sorted(LOADERS),
+        default=sorted(set(LOADERS) - COMMITTING_LOADERS),
+    )
+    parser.add_argument("--cache", action="store_true", help="warm a run-scoped dimension cache")
+    args = parser.parse_args()
+
+    for name in sorted(COMMITTING_LOADERS.intersection(args.loaders)):
+        print(f"warning: the {name} loader COMMITS its offers into {os.environ.get('DB_NAME')}", file=sys.stderr)
+
+    df = preprocess_ft(generate_ft_items(args.offers, seed=args.seed))
+
+    for name in args.loaders:
+        print(run(name, df, use_cache=args.cache))
@@ -0,0 +1,58 @@
+"""
+Throughput of the parallel sharded loader from 1 to 8 workers.
+
+Usage (from ingestion/):
+    python -m benchmarks.bench_parallel --offers 20000 --workers 1 2 4 8
+
+Every run loads a fresh set of offer URLs (same companies, skills and
+locations) and COMMITS into the database from db.get_connection: point
+DB_* at a scratch database.
+"""
+import argparse
+import time
+
+from db import get_connection, resize_pool
+from ingest import preprocess_ft
+from loaders import load_offers_parallel
+
+from benchmarks.synthetic import generate_ft_items
+
+
+def run(df, workers: int, batch_size: int) -> dict:
+    conn = get_connection()
+    try:
+        t0 = time.perf_counter()
+        links = load_offers_parallel(conn, df, workers=workers, batch_size=batch_size)
+        elapsed = time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    return {
+        "workers": workers,
+        "offers": len(df),
+        "links_inserted": links["inserted"],
+        "seconds": round(elapsed, 3),
+        "offers_per_sec": round(len(df) / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    # Coordinator + one connection per shard, for the largest run
+    resize_pool(max(args.workers) + 1)
+
+    # Warm-up: create the shared dimension rows so every run starts equal
+    run(preprocess_ft(generate_ft_items(1000, seed=args.seed, start=10_000_000)), 1, args.batch_size)
+
+    baseline = None
+    for i, workers in enumerate(args.workers):
+        df = preprocess_ft(generate_ft_items(args.offers, seed=args.seed, start=(i + 1) * 1_000_000))
+        result = run(df, workers, args.batch_size)
+        baseline = baseline or result["offers_per_sec"]
+        print({**result, "speedup": round(result["offers_per_sec"] / baseline, 2)})
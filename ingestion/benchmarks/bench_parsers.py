@@ -0,0 +1,105 @@
+"""
+Micro-benchmarks of the memoized parsers in preprocessing.py.
+
+Labels are drawn from a few hundred distinct values with a Zipf-like
+distribution, as in real France Travail payloads. The baseline runs every
+parser (and the helpers it calls) unmemoized.
+
+Usage (from ingestion/):
+    python -m benchmarks.bench_parsers --calls 200000
+"""
+import argparse
+import contextlib
+import random
+import time
+
+import preprocessing
+
+from benchmarks.synthetic import CITIES, SALARIES
+
+DEPARTEMENTS = ["01", "06", "13", "2A", "31", "33", "34", "35", "38", "44", "59", "67", "69", "75", "92", "93", "974"]
+TOWNS = ["Paris", "Lyon", "Marseille", "Toulouse", "Nantes", "Lille", "Rennes", "Nice", "Grenoble", "Saint-Denis"]
+
+
+def location_labels(rng: random.Random, distinct: int = 300) -> list[str]:
+    labels = set(CITIES)
+    while len(labels) < distinct:
+        town = rng.choice(TOWNS)
+        if rng.random() < 0.3:
+            town += f" {rng.randrange(1, 21)}e Arrondissement"
+        labels.add(f"{rng.choice(DEPARTEMENTS)} - {town}")
+    return sorted(labels)
+
+
+def salary_labels(rng: random.Random, distinct: int = 200) -> list[str]:
+    labels = set()
+    while len(labels) < distinct:
+        lo = rng.randrange(18_000, 80_000, 500)
+        template = rng.choice([t for t in SALARIES if t])
+        labels.add(template.format(lo=lo, hi=lo + 8000, m=lo // 12, k=lo // 1000, k2=lo // 1000 + 8))
+    return sorted(labels)
+
+
+def zipf_sample(rng: random.Random, labels: list[str], n: int, s: float = 1.1) -> list[str]:
+    weights = [1 / (rank + 1) ** s for rank in range(len(labels))]
+    return rng.choices(labels, weights=weights, k=n)
+
+
+@contextlib.contextmanager
+def unmemoized():
+    """
+    Swap every memoized parser for its undecorated function
+    """
+    originals = {name: getattr(preprocessing, name) for name in preprocessing._MEMOIZED}
+    for name, fn in originals.items():
+        setattr(preprocessing, name, fn.__wrapped__)
+    try:
+        yield
+    finally:
+        for name, fn in originals.items():
+            setattr(preprocessing, name, fn)
+
+
+def run(name: str, inputs: list[str]) -> dict:
+    def timed() -> float:
+        fn = getattr(preprocessing, name)
+        t0 = time.perf_counter()
+        for value in inputs:
+            fn(value)
+        return time.perf_counter() - t0
+
+    with unmemoized():
+        baseline = timed()
+    preprocessing.clear_parser_caches()
+    memoized = timed()
+
+    return {
+        "parser": name,
+        "calls": len(inputs),
+        "distinct": len(set(inputs)),
+        "baseline_calls_per_s": round(len(inputs) / baseline),
+        "memoized_calls_per_s": round(len(inputs) / memoized),
+        "speedup": round(baseline / memoized, 1),
+        "hit_rate": preprocessing.parser_cache_stats()[name]["hit_rate"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    locations = zipf_sample(rng, location_labels(rng), args.calls)
+    salaries = zipf_sample(rng, salary_labels(rng), args.calls)
+    cities = [label.split(" - ", 1)[1] for label in locations]
+
+    for name, inputs in [
+        ("parse_location", locations),
+        ("normalize_unicode", locations),
+        ("clean_city_name", cities),
+        ("parse_salary_france_travail", salaries),
+        ("normalize_text", salaries),
+    ]:
+        print(run(name, inputs))
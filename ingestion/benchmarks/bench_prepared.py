@@ -0,0 +1,104 @@
+"""
+Per-statement latency of the row loader with and without server-side
+prepared statements, and the cost of getting a connection with and
+without the pool.
+
+Usage (from ingestion/):
+    DB_HOST=localhost ... DB_SSLMODE=disable \\
+        python -m benchmarks.bench_prepared --offers 2000 --rounds 3
+
+Both modes run the same DataFrame through the `get_or_create_*` helpers,
+alternately, each round in its own transaction which is rolled back, so
+the target database is left untouched.
+"""
+import argparse
+import time
+from collections import defaultdict
+
+from psycopg2.extensions import cursor as _cursor
+
+import db
+from ingest import preprocess_ft
+from loaders import LOADERS
+
+from benchmarks.runner import percentiles
+from benchmarks.synthetic import generate_ft_items
+
+
+class StatementTimer(_cursor):
+    """
+    Cursor recording each statement's duration under its command tag
+    (PREPARE statements are recorded apart: they run once per session)
+    """
+    durations: dict[str, list[float]] = defaultdict(list)
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        result = super().execute(query, vars)
+        command = (self.statusmessage or "OTHER").split(" ", 1)[0]
+        StatementTimer.durations[command].append(time.perf_counter() - t0)
+        return result
+
+
+def load_round(df, prepared: bool) -> dict[str, list[float]]:
+    db.use_prepared_statements(prepared)
+    StatementTimer.durations = defaultdict(list)
+    conn = db.get_connection()
+    conn.cursor_factory = StatementTimer
+    try:
+        LOADERS["row"](conn, df)
+    finally:
+        conn.rollback()
+        conn.close()
+    return StatementTimer.durations
+
+
+def acquire(n: int, pooled: bool) -> list[float]:
+    seconds = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        conn = db.get_connection() if pooled else db._connect()
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        conn.close()
+        seconds.append(time.perf_counter() - t0)
+    return seconds
+
+
+def _summary(seconds: list[float]) -> dict:
+    return {
+        "statements": len(seconds),
+        "mean_ms": round(sum(seconds) / len(seconds) * 1000, 3) if seconds else None,
+        **percentiles(seconds),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--connections", type=int, default=50)
+    args = parser.parse_args()
+
+    df = preprocess_ft(generate_ft_items(args.offers, seed=args.seed))
+
+    # Warm the pool and the server caches before measuring
+    load_round(df, prepared=True)
+
+    collected = {False: defaultdict(list), True: defaultdict(list)}
+    for _ in range(args.rounds):
+        for prepared in (False, True):
+            for command, seconds in load_round(df, prepared).items():
+                collected[prepared][command] += seconds
+
+    for prepared, by_command in collected.items():
+        mode = "prepared" if prepared else "plain"
+        every = [s for command, seconds in by_command.items() if command != "PREPARE" for s in seconds]
+        print({"mode": mode, "command": "ALL", **_summary(every)})
+        for command, seconds in sorted(by_command.items()):
+            print({"mode": mode, "command": command, **_summary(seconds)})
+
+    for pooled in (False, True):
+        print({"connection": "pooled" if pooled else "new", **_summary(acquire(args.connections, pooled))})
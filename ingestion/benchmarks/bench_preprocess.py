@@ -0,0 +1,45 @@
+"""
+Row-by-row vs columnar France Travail preprocessing.
+
+Usage (from ingestion/):
+    python -m benchmarks.bench_preprocess --offers 100000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from ft_columnar import preprocess_ft_columnar, preprocess_ft_frames
+from ingest import preprocess_ft_rows
+
+from benchmarks.synthetic import generate_ft_items
+
+
+def timed(fn, items) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    out = fn(items)
+    return time.perf_counter() - t0, out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    items = generate_ft_items(args.offers, seed=args.seed)
+
+    rows_s, expected = timed(preprocess_ft_rows, items)
+    columnar_s, got = timed(preprocess_ft_columnar, items)
+    frames_s, (_, links) = timed(preprocess_ft_frames, items)
+    pd.testing.assert_frame_equal(expected, got, check_exact=True)
+
+    for name, seconds in [("rows", rows_s), ("columnar", columnar_s), ("frames (no lists)", frames_s)]:
+        print({
+            "mode": name,
+            "offers": len(items),
+            "seconds": round(seconds, 3),
+            "offers_per_s": round(len(items) / seconds),
+            "speedup": round(rows_s / seconds, 2),
+        })
+    print({"links": len(links)})
@@ -0,0 +1,187 @@
+"""
+Latency of the French full-text search (search_job_offers, sql/schema.sql)
+on a large corpus of offers.
+
+Usage (from ingestion/):
+    DB_HOST=localhost ... DB_SSLMODE=disable \\
+        python -m benchmarks.bench_search --offers 1000000 --build
+    python -m benchmarks.bench_search --rounds 20
+
+--build truncates the job market tables and COPYs a seeded corpus into
+job_offer (two years of dates, titles and descriptions drawn from a
+Zipf-weighted French vocabulary, so that common words match a large
+share of the offers and rare ones a handful): point DB_* at a scratch
+database. Without it, the queries run against the current content.
+"""
+import argparse
+import io
+import random
+import time
+from datetime import date, timedelta
+
+import db
+from db import get_connection
+from partitions import add_months, ensure_partitions, month_start
+
+from benchmarks.runner import percentiles, reset_tables
+
+TITLES = [
+    "Data analyst", "Data engineer", "Data scientist", "Analyste BI", "Développeur Python",
+    "Développeur Java", "Développeur full stack", "Chef de projet informatique", "Architecte cloud",
+    "Ingénieur DevOps", "Administrateur systèmes et réseaux", "Technicien support informatique",
+    "Comptable", "Assistant comptable", "Contrôleur de gestion", "Auditeur financier",
+    "Commercial sédentaire", "Technico-commercial", "Responsable commercial", "Chargé de clientèle",
+    "Infirmier", "Aide-soignant", "Auxiliaire de vie", "Pharmacien", "Cuisinier", "Serveur",
+    "Chef de rang", "Réceptionniste", "Agent d'entretien", "Électricien", "Plombier chauffagiste",
+    "Maçon", "Conducteur de travaux", "Cariste", "Préparateur de commandes", "Chauffeur livreur",
+    "Magasinier", "Vendeur en boulangerie", "Assistant ressources humaines", "Chargé de recrutement",
+]
+
+# Content words of French job offers, roughly by decreasing frequency
+WORDS = """
+poste expérience équipe mission client entreprise profil compétences formation travail
+service gestion projet développement rejoindre recherchons candidat activité qualité
+rigueur autonomie sens relationnel organisation connaissance maîtrise outils accompagnement
+suivi production responsable secteur environnement clients évolution contrat horaires
+salaire avantages mutuelle tickets restaurant télétravail semaine week-end planning
+données analyse reporting tableaux bord indicateurs performance amélioration processus
+logiciel application architecture cloud infrastructure sécurité réseau serveurs support
+python java javascript sql excel sap salesforce docker kubernetes aws azure linux
+comptabilité facturation paie fiscalité audit budget trésorerie bilan clôture
+vente prospection négociation portefeuille commercial chiffre affaires objectifs terrain
+soins patients hôpital clinique ehpad domicile médical infirmier pharmacie hygiène
+cuisine restauration hôtel salle accueil réception entretien nettoyage propreté
+chantier bâtiment électricité plomberie maçonnerie travaux sécurité habilitation caces
+logistique entrepôt stock préparation commandes livraison transport permis véhicule
+recrutement formation carrière onboarding paie administration personnel juridique
+anglais courant bilingue international déplacements région nationale
+""".split()
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    """
+    WORDS followed by pseudo-words (the long tail of a real vocabulary)
+    """
+    syllables = ["ba", "ri", "lo", "ten", "mar", "qui", "zo", "fé", "lu", "char", "vin", "dé", "pra", "nu", "sol"]
+    words = list(WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(syllables) for _ in range(rng.randrange(3, 5)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def build_corpus(n: int, seed: int = 42, words_per_offer: int = 120, chunk: int = 50_000) -> None:
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng, 20_000)
+    cum_weights = []
+    total = 0.0
+    for rank in range(len(vocabulary)):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+    today = date.today()
+
+    reset_tables()
+    conn = get_connection()
+    try:
+        ensure_partitions(conn, [add_months(month_start(today), -k) for k in range(25)])
+        for start in range(0, n, chunk):
+            buf = io.StringIO()
+            for i in range(start, min(n, start + chunk)):
+                title = f"{rng.choice(TITLES)} (H/F)"
+                description = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words_per_offer))
+                posted = today - timedelta(days=rng.randrange(730))
+                buf.write(f"{title}\t{description}\t{posted.isoformat()}\thttps://bench.example/{i}\t{i + 1}\n")
+            buf.seek(0)
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    "COPY public.job_offer (title, description, date_posted, url, id) FROM STDIN",
+                    buf,
+                )
+                cur.execute("SELECT setval(pg_get_serial_sequence('public.job_offer', 'id'), %s)", (n,))
+            conn.commit()
+            print({"offers_loaded": min(n, start + chunk)})
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE public.job_offer")
+    finally:
+        conn.close()
+
+
+# Search strings (websearch_to_tsquery syntax), from rare to very common
+QUERIES = [
+    "tenmarqui",
+    "kubernetes",
+    "data engineer",
+    "développeur python",
+    "comptable paie",
+    '"tableaux de bord"',
+    "infirmier -ehpad",
+    "commercial or vendeur",
+    "expérience",
+    "équipe client",
+]
+
+
+def first_call(query: str, max_results: int) -> float:
+    """
+    Seconds of a search on a new connection (no cached plans yet)
+    """
+    conn = db._connect()
+    try:
+        t0 = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM public.search_job_offers(%s, %s)", (query, max_results))
+            cur.fetchall()
+        return time.perf_counter() - t0
+    finally:
+        conn.close()
+
+
+def run(conn, query: str, rounds: int, max_results: int) -> dict:
+    cold_ms = round(first_call(query, max_results) * 1000, 2)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*) FROM public.job_offer WHERE search_vector @@ websearch_to_tsquery('french', %s)",
+            (query,),
+        )
+        matches = cur.fetchone()[0]
+        seconds = []
+        for _ in range(rounds + 1):
+            t0 = time.perf_counter()
+            cur.execute("SELECT * FROM public.search_job_offers(%s, %s)", (query, max_results))
+            rows = cur.fetchall()
+            seconds.append(time.perf_counter() - t0)
+    conn.rollback()
+    # The first round warms the cache
+    return {
+        "query": query,
+        "matches": matches,
+        "returned": len(rows),
+        "first_call_ms": cold_ms,
+        **percentiles(seconds[1:]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--build", action="store_true", help="replace the job market tables by a seeded corpus")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20, help="results per query")
+    args = parser.parse_args()
+
+    if args.build:
+        t0 = time.perf_counter()
+        build_corpus(args.offers, args.seed)
+        print({"corpus_offers": args.offers, "build_seconds": round(time.perf_counter() - t0, 1)})
+
+    conn = get_connection()
+    try:
+        for query in QUERIES:
+            print(run(conn, query, args.rounds, args.limit))
+    finally:
+        conn.close()
@@ -0,0 +1,57 @@
+"""
+Peak memory of a whole-run load vs the streaming pipeline.
+
+Usage (from ingestion/), one mode per process so peak RSS is meaningful:
+    python -m benchmarks.bench_stream --mode stream --offers 50000
+    python -m benchmarks.bench_stream --mode bulk --offers 50000
+
+Both modes COMMIT into the database from db.get_connection: point DB_* at
+a scratch database.
+"""
+import argparse
+import resource
+import time
+
+from db import get_connection
+from ingest import preprocess_ft
+from loaders import LOADERS
+from pipeline import run_pipeline
+
+from benchmarks.synthetic import iter_ft_pages
+
+
+def run_bulk(offers: int, loader: str) -> dict:
+    t0 = time.perf_counter()
+    items = [item for page in iter_ft_pages(offers) for item in page]
+    df = preprocess_ft(items)
+    conn = get_connection()
+    try:
+        LOADERS[loader](conn, df)
+        conn.commit()
+    finally:
+        conn.close()
+    return {"first_commit_seconds": round(time.perf_counter() - t0, 3)}
+
+
+def run_stream(offers: int, loader: str) -> dict:
+    return run_pipeline(iter_ft_pages(offers), preprocess_ft, loader=loader)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["bulk", "stream"], required=True)
+    parser.add_argument("--offers", type=int, default=50_000)
+    parser.add_argument("--loader", default="batch")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    stats = (run_stream if args.mode == "stream" else run_bulk)(args.offers, args.loader)
+
+    print({
+        "mode": args.mode,
+        "offers": args.offers,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "first_commit_seconds": stats["first_commit_seconds"],
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
@@ -0,0 +1,285 @@
+"""
+End-to-end ingestion benchmark: fetch, preprocess and ingest a seeded
+synthetic dataset served by the local France Travail stub, against a
+local PostgreSQL, and write a JSON report comparable across commits.
+
+Usage (from ingestion/):
+    DB_HOST=localhost DB_NAME=... DB_USER=... DB_PASSWORD=... DB_SSLMODE=disable \\
+        python -m benchmarks.runner --offers 5000 --loader batch --reset --output before.json
+    python -m benchmarks.runner --compare before.json after.json
+
+Every stage records its throughput, the France Travail latency
+percentiles (fetch / ingest), the DB round trips and statement latency
+percentiles (ingest) and the peak RSS of the process so far.
+--reset truncates the job market tables first: never point it at a
+database whose content matters.
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import db
+from ft_client import FranceTravailClient
+from ingest import fetch_all_ft_offers, ingest_ft_to_postgres, preprocess_ft
+from instrumentation import InstrumentedCursor
+
+from benchmarks.stub_ft_api import StubFranceTravail
+from benchmarks.synthetic import CITIES, MORE_CITIES, generate_ft_items
+
+TABLES = "job_offer_skill, job_offer, skill, company, location, contract, industry, rollup_offer_daily, rollup_skill_daily"
+
+# One search per departement: the API (and the stub) stop at 3150 results per query
+DEPARTEMENTS = sorted({city.split(" - ")[0] for city in CITIES + MORE_CITIES})
+
+
+# ==================================================
+# Measurements
+# ==================================================
+
+class TimingCursor(InstrumentedCursor):
+    """
+    Cursor recording the duration of every statement sent to the server
+    """
+    durations: list[float] = []
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            TimingCursor.durations.append(time.perf_counter() - t0)
+
+    def copy_expert(self, sql, file, size=8192):
+        t0 = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            TimingCursor.durations.append(time.perf_counter() - t0)
+
+
+def percentiles(seconds: list[float]) -> dict:
+    ordered = sorted(seconds)
+
+    def pct(q: float) -> float | None:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {"p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99), "max_ms": pct(1.0)}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux, in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage(offers: int, seconds: float, **extra) -> dict:
+    return {
+        "offers": offers,
+        "seconds": round(seconds, 3),
+        "offers_per_sec": round(offers / seconds, 1) if seconds else None,
+        **extra,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ==================================================
+# Stages
+# ==================================================
+
+def _client(stub: StubFranceTravail, search_url: str, args) -> FranceTravailClient:
+    return FranceTravailClient(
+        client_id="bench",
+        client_secret="bench",
+        token_url=stub.token_url,
+        search_url=search_url,
+        pool_size=args.concurrency,
+        rate_limit=args.rate_limit,
+    )
+
+
+def stage_fetch(stub: StubFranceTravail, search_url: str, args) -> tuple[dict, list[dict]]:
+    client = _client(stub, search_url, args)
+    stub.requests = stub.failures = 0
+
+    t0 = time.perf_counter()
+    items = []
+    for dep in DEPARTEMENTS:
+        items += fetch_all_ft_offers(
+            keywords=args.keywords,
+            departement=dep,
+            max_results=args.offers,
+            concurrency=args.concurrency,
+            client=client,
+        )
+    elapsed = time.perf_counter() - t0
+
+    return _stage(
+        len(items),
+        elapsed,
+        http_requests=stub.requests,
+        injected_failures=stub.failures,
+        http=client.metrics(),
+    ), items
+
+
+def stage_preprocess(items: list[dict]) -> dict:
+    t0 = time.perf_counter()
+    df = preprocess_ft(items)
+    return _stage(len(df), time.perf_counter() - t0)
+
+
+def stage_ingest(stub: StubFranceTravail, search_url: str, args, expected: int) -> dict:
+    client = _client(stub, search_url, args)
+    TimingCursor.durations = []
+    db.set_cursor_factory(TimingCursor)
+
+    t0 = time.perf_counter()
+    try:
+        for dep in DEPARTEMENTS:
+            ingest_ft_to_postgres(
+                args.keywords,
+                max_results=args.offers,
+                loader=args.loader,
+                spool_dir=None,
+                departement=dep,
+                client=client,
+            )
+    finally:
+        db.set_cursor_factory(None)
+    elapsed = time.perf_counter() - t0
+
+    return _stage(
+        expected,
+        elapsed,
+        db_round_trips=len(TimingCursor.durations),
+        db_statements=percentiles(TimingCursor.durations),
+        http=client.metrics(),
+    )
+
+
+def reset_tables() -> None:
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {TABLES} RESTART IDENTITY CASCADE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(args) -> dict:
+    items = generate_ft_items(args.offers, seed=args.seed, n_companies=args.companies)
+    stages = {}
+
+    with StubFranceTravail(items, latency=args.latency, fail_rate=args.fail_rate, token_ttl=3600) as stub:
+        search_url = stub.start()
+
+        stages["fetch"], fetched = stage_fetch(stub, search_url, args)
+        stages["preprocess"] = stage_preprocess(fetched)
+
+        if not args.skip_db:
+            if args.reset:
+                reset_tables()
+            stages["ingest"] = stage_ingest(stub, search_url, args, len(fetched))
+
+    return {
+        "label": args.label or git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "params": {
+            "offers": args.offers,
+            "seed": args.seed,
+            "companies": args.companies,
+            "keywords": args.keywords,
+            "latency": args.latency,
+            "fail_rate": args.fail_rate,
+            "rate_limit": args.rate_limit,
+            "concurrency": args.concurrency,
+            "loader": args.loader,
+        },
+        "stages": stages,
+    }
+
+
+# ==================================================
+# Comparison
+# ==================================================
+
+COMPARED = ("seconds", "offers_per_sec", "db_round_trips", "peak_rss_mb")
+
+
+def compare(before: dict, after: dict) -> list[dict]:
+    """
+    One row per (stage, metric) present in both reports, with the relative change
+    """
+    if before["params"] != after["params"]:
+        print("warning: the two reports were run with different parameters", file=sys.stderr)
+
+    rows = []
+    for stage, old in before["stages"].items():
+        new = after["stages"].get(stage)
+        if new is None:
+            continue
+        for metric in COMPARED:
+            a, b = old.get(metric), new.get(metric)
+            if a is None or b is None:
+                continue
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "before": a,
+                "after": b,
+                "change_pct": round((b - a) / a * 100, 1) if a else None,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--offers", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--companies", type=int, default=500)
+    parser.add_argument("--keywords", default="")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--loader", default="batch")
+    parser.add_argument("--label", help="report label (default: current git commit)")
+    parser.add_argument("--reset", action="store_true", help="truncate the job market tables before ingesting")
+    parser.add_argument("--skip-db", action="store_true", help="fetch and preprocess only")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        for row in compare(*reports):
+            print(row)
+        sys.exit(0)
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,194 @@
+"""
+Local stub of the France Travail /offres/search endpoint.
+
+Emulates the `range` semantics of the real API:
+- 200 when the whole result set fits in the requested range, 206 otherwise,
+  with a ``Content-Range: offres <first>-<last>/<total>`` header,
+- 204 when the range starts past the last offer,
+- 400 for ranges wider than 150 offers or ending after offer 3149.
+
+Transient failures can be injected (`fail_rate`, answered with 429 or 503
+and a ``Retry-After`` header) as well as a fixed per-request `latency`,
+and the first `stalled_requests` searches can hang for `stall` seconds
+before answering (a stalled connection).
+
+With a `token_ttl`, the stub also serves the OAuth2 client-credentials
+endpoint and answers 401 to searches without a live bearer token.
+"""
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+MAX_PAGE = 150
+MAX_END = 3149
+
+_RANGE_RE = re.compile(r"^(\d+)-(\d+)$")
+
+
+class StubFranceTravail:
+    def __init__(
+        self,
+        items: list[dict],
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: int = 0,
+        token_ttl: float | None = None,
+        stall: float = 0.0,
+        stalled_requests: int = 0,
+    ):
+        self.items = items
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.stall = stall
+        self.stalled_requests = stalled_requests
+        self.requests = 0
+        self.failures = 0
+        self.token_requests = 0
+        self.unauthorized = 0
+        self._tokens: dict[str, float] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    # ---------- lifecycle ----------
+    def start(self, port: int = 0) -> str:
+        """
+        Serve in a background thread; return the search URL
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{self._server.server_port}"
+        self.token_url = f"{base}/connexion/oauth2/access_token?realm=/partenaire"
+        return f"{base}/offres/search"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- request handling ----------
+    def issue_token(self) -> tuple[int, dict, bytes]:
+        token = secrets.token_hex(16)
+        with self._lock:
+            self.token_requests += 1
+            self._tokens[token] = time.monotonic() + (self.token_ttl or 0)
+        body = {"access_token": token, "token_type": "Bearer", "expires_in": self.token_ttl or 0}
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode()
+
+    def authorized(self, header: str | None) -> bool:
+        if self.token_ttl is None:
+            return True
+        token = (header or "").removeprefix("Bearer ")
+        with self._lock:
+            ok = self._tokens.get(token, 0) > time.monotonic()
+            if not ok:
+                self.unauthorized += 1
+        return ok
+
+    def search(self, query: dict) -> tuple[int, dict, bytes]:
+        with self._lock:
+            self.requests += 1
+            stalled = self.requests <= self.stalled_requests
+            fail = self._rng.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+        if stalled:
+            time.sleep(self.stall)
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return (
+                self._rng.choice([429, 503]),
+                {"Retry-After": str(self.retry_after)},
+                b"",
+            )
+
+        match = _RANGE_RE.match(query.get("range", ["0-149"])[0])
+        if not match:
+            return 400, {}, b""
+        first, last = int(match.group(1)), int(match.group(2))
+        if last < first or last - first + 1 > MAX_PAGE or last > MAX_END:
+            return 400, {}, b""
+
+        items = self._filter(query)
+        total = len(items)
+        if first >= total:
+            return 204, {}, b""
+
+        page = items[first:last + 1]
+        status = 200 if first == 0 and len(page) == total else 206
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Range": f"offres {first}-{first + len(page) - 1}/{total}",
+        }
+        return status, headers, json.dumps({"resultats": page}).encode()
+
+    def _filter(self, query: dict) -> list[dict]:
+        items = self.items
+        if "motsCles" in query:
+            words = query["motsCles"][0].lower().split()
+            items = [
+                i for i in items
+                if any(w in (i.get("intitule") or "").lower() for w in words)
+            ]
+        if "departement" in query:
+            dep = query["departement"][0]
+            items = [i for i in items if (i.get("lieuTravail", {}).get("libelle") or "").startswith(dep)]
+        if "typeContrat" in query:
+            items = [i for i in items if i.get("typeContrat") == query["typeContrat"][0]]
+        if "minCreationDate" in query:
+            # Same fixed-width ISO format on both sides: string order is date order
+            low, high = query["minCreationDate"][0], query["maxCreationDate"][0]
+            items = [i for i in items if low <= i.get("dateCreation", "")[:19] + "Z" <= high]
+        return items
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/offres/search":
+                    self._send(404, {}, b"")
+                    return
+                if not stub.authorized(self.headers.get("Authorization")):
+                    self._send(401, {}, b"")
+                    return
+                self._send(*stub.search(parse_qs(url.query)))
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlparse(self.path).path != "/connexion/oauth2/access_token":
+                    self._send(404, {}, b"")
+                    return
+                self._send(*stub.issue_token())
+
+            def _send(self, status: int, headers: dict, body: bytes):
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,168 @@
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator
+
+# ==================================================
+# Synthetic France Travail payloads
+#
+# Seeded, and skewed like real search results: a few cities, skills,
+# employers and salary labels account for most offers (Zipf-like weights,
+# the order of each list below is its popularity rank).
+# ==================================================
+
+CITIES = [
+    "75 - Paris",
+    "75 - Paris 9e Arrondissement",
+    "69 - Lyon 3e Arrondissement",
+    "13 - Marseille",
+    "31 - Toulouse",
+    "33 - Bordeaux",
+    "44 - Nantes",
+    "59 - Lille",
+    "67 - Strasbourg",
+    "92 - Nanterre",
+    "2A - Ajaccio",
+    "974 - Saint-Denis",
+]
+MORE_CITIES = [
+    "92 - Courbevoie",
+    "75 - Paris 8e Arrondissement",
+    "69 - Lyon 7e Arrondissement",
+    "35 - Rennes",
+    "06 - Nice",
+    "34 - Montpellier",
+    "38 - Grenoble",
+    "93 - Saint-Denis",
+    "13 - Aix-en-Provence",
+    "76 - Rouen",
+    "2B - Bastia",
+    "971 - Pointe-à-Pitre",
+]
+
+CONTRACTS = [
+    ("CDI", "Contrat à durée indéterminée"),
+    ("CDD", "Contrat à durée déterminée"),
+    ("MIS", "Mission intérimaire"),
+    ("SAI", "Travail saisonnier"),
+]
+INDUSTRIES = ["Conseil en systèmes et logiciels informatiques", "Activités des sièges sociaux", None]
+HARD_SKILLS = ["Python", "SQL", "Power BI", "Excel", "Tableau", "Spark", "R", "Machine learning", "ETL", "Git"]
+MORE_HARD_SKILLS = [
+    "Analyser des données",
+    "Modélisation de données",
+    "Airflow",
+    "dbt",
+    "Docker",
+    "AWS",
+    "Azure",
+    "Looker",
+    "SAS",
+    "Statistiques",
+    "Data visualisation",
+    "Qlik",
+    "Scala",
+    "Kafka",
+    "PostgreSQL",
+    "Snowflake",
+    "Deep learning",
+    "NLP",
+    "Gestion de projet",
+    "VBA",
+]
+SOFT_SKILLS = ["Rigueur", "Travail en équipe", "Autonomie", "Curiosité", "Sens de la communication"]
+LANGUAGES = ["Anglais", "Espagnol", "Allemand"]
+
+SALARIES = [
+    "Annuel de {lo}.0 Euros à {hi}.0 Euros",
+    "Mensuel de {m}.0 Euros sur 12.0 mois",
+    "Horaire de 11.88 Euros sur 151.67 heures",
+    "Annuel de {k} à {k2} k€",
+    None,
+]
+
+
+def _zipf(n: int, s: float = 1.1) -> list[float]:
+    return [1 / (rank + 1) ** s for rank in range(n)]
+
+
+def _pick(rng: random.Random, values: list, k: int, weights: list[float] | None = None) -> list:
+    """
+    `k` distinct values, drawn by weight
+    """
+    if weights is None:
+        return rng.sample(values, min(k, len(values)))
+    picked = []
+    while len(picked) < min(k, len(values)):
+        value = rng.choices(values, weights=weights)[0]
+        if value not in picked:
+            picked.append(value)
+    return picked
+
+
+_ALL_CITIES = CITIES + MORE_CITIES
+_ALL_HARD_SKILLS = HARD_SKILLS + MORE_HARD_SKILLS
+_CITY_WEIGHTS = _zipf(len(_ALL_CITIES))
+_SKILL_WEIGHTS = _zipf(len(_ALL_HARD_SKILLS), 0.8)
+_LANGUAGE_WEIGHTS = [8, 1, 1]
+# Salary label templates; about a third of the offers have no salary
+_SALARY_WEIGHTS = [30, 20, 5, 10, 35]
+
+
+def generate_ft_items(n: int, seed: int = 42, n_companies: int = 500, start: int = 0) -> list[dict]:
+    """
+    Return `n` items shaped like the `resultats` of /offres/search;
+    offer ids (and URLs) are numbered from `start`
+    """
+    return list(iter_ft_items(n, seed=seed, n_companies=n_companies, start=start))
+
+
+def iter_ft_pages(n: int, page_size: int = 150, **kwargs) -> Iterator[list[dict]]:
+    """
+    Lazily yield `n` synthetic items in pages, like the search endpoint
+    """
+    items = iter_ft_items(n, **kwargs)
+    while page := list(islice(items, page_size)):
+        yield page
+
+
+def iter_ft_items(n: int, seed: int = 42, n_companies: int = 500, start: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    base_date = datetime(2025, 1, 1)
+    company_weights = _zipf(n_companies, 0.9)
+    companies = range(n_companies)
+
+    for i in range(n):
+        lo = rng.randrange(28, 60) * 1000
+        salary = rng.choices(SALARIES, weights=_SALARY_WEIGHTS)[0]
+        if salary:
+            salary = salary.format(lo=lo, hi=lo + 8000, m=lo // 12, k=lo // 1000, k2=lo // 1000 + 8)
+
+        offer_id = f"{100000 + start + i}X"
+        contract_code, contract_label = rng.choice(CONTRACTS)
+        yield {
+            "id": offer_id,
+            "intitule": rng.choice(["Data analyst", "Data engineer", "Data scientist", "Analyste BI"]) + f" (H/F) #{i}",
+            "description": " ".join(rng.choices(HARD_SKILLS + SOFT_SKILLS, k=40)),
+            "dateCreation": (base_date + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "lieuTravail": {"libelle": rng.choices(_ALL_CITIES, weights=_CITY_WEIGHTS)[0]},
+            "entreprise": {"nom": f"Entreprise {rng.choices(companies, weights=company_weights)[0]}"},
+            "typeContrat": contract_code,
+            "typeContratLibelle": contract_label,
+            "secteurActiviteLibelle": rng.choice(INDUSTRIES),
+            "experienceLibelle": rng.choice(["Débutant accepté", "2 An(s)", "5 An(s)"]),
+            "formations": [{"libelle": "Bac+5 et plus ou équivalents"}],
+            "salaire": {"libelle": salary} if salary else {},
+            "competences": [
+                {"libelle": s, "exigence": rng.choice("EES")}
+                for s in _pick(rng, _ALL_HARD_SKILLS, rng.randrange(1, 8), _SKILL_WEIGHTS)
+            ],
+            "qualitesProfessionnelles": [
+                {"libelle": s} for s in _pick(rng, SOFT_SKILLS, rng.randrange(0, 3))
+            ],
+            "langues": [
+                {"libelle": s, "exigence": rng.choice("ES")}
+                for s in _pick(rng, LANGUAGES, rng.choice([0, 0, 1, 1, 1, 2]), _LANGUAGE_WEIGHTS)
+            ],
+            "origineOffre": {"urlOrigine": f"https://candidat.francetravail.fr/offres/recherche/detail/{offer_id}"},
+        }
@@ -0,0 +1,386 @@
+from psycopg2.extras import execute_values
+
+from config import settings
+from instrumentation import record_rows
+
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def _fetch_values(conn, sql: str, rows: list[tuple], template: str | None = None) -> list[tuple]:
+    """
+    Run a multi-row statement in a single round trip and return its rows
+    """
+    if not rows:
+        return []
+    with conn.cursor() as cur:
+        return execute_values(
+            cur,
+            sql,
+            rows,
+            template=template,
+            page_size=len(rows),
+            fetch=True,
+        )
+
+
+def _fetch_missing(
+    conn,
+    sql: str,
+    rows: list[tuple],
+    found: list[tuple],
+    width: int = 1,
+    template: str | None = None,
+) -> list[tuple]:
+    """
+    Upsert rows plus the keys they lack. A key committed by a concurrent
+    loader after the upsert's snapshot is neither inserted (conflict) nor
+    seen by its SELECT: `sql` reads those keys again in a new statement.
+    `rows` are the input rows and `found` the upsert's (id, *key, inserted)
+    rows, keys being the first `width` input columns.
+    """
+    keys = {row[1:1 + width] for row in found}
+    missing = [row for row in rows if tuple(row[:width]) not in keys]
+    return found + _fetch_values(conn, sql, missing, template)
+
+
+def _record_upserted(table: str, rows: list[tuple]) -> list[tuple]:
+    """
+    Count and strip the trailing `inserted` flag of dimension upsert rows
+    """
+    inserted = sum(1 for row in rows if row[-1])
+    record_rows(table, inserted=inserted, unchanged=len(rows) - inserted)
+    return [row[:-1] for row in rows]
+
+
+# ==================================================
+# Dimensions
+# (rows are inserted in key order, so concurrent loaders take the
+# unique-index locks in the same order and cannot deadlock on them;
+# company and skill names resolve to canonical rows, sql/schema.sql)
+# ==================================================
+
+def upsert_companies(conn, names: set[str]) -> dict[str, int]:
+    """
+    {name: canonical company id}: names are matched to the known companies
+    by sql/schema.sql's resolve_companies (aliases, then trigram similarity)
+    """
+    if not names:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT company_id, name, inserted FROM public.resolve_companies(%s, %s)",
+            (sorted(names), settings.COMPANY_MATCH_THRESHOLD),
+        )
+        rows = _record_upserted("company", cur.fetchall())
+    return {name: id_ for id_, name in rows}
+
+
+def upsert_industries(conn, names: set[str]) -> dict[str, int]:
+    input_rows = [(n,) for n in names]
+    rows = _fetch_values(
+        conn,
+        """
+        WITH input (name) AS (VALUES %s),
+        inserted AS (
+            INSERT INTO public.industry (name)
+            SELECT DISTINCT name FROM input
+            ORDER BY name
+            ON CONFLICT (name) DO NOTHING
+            RETURNING id, name
+        )
+        SELECT id, name, true FROM inserted
+        UNION ALL
+        SELECT id, name, false FROM public.industry
+        WHERE name IN (SELECT name FROM input)
+        """,
+        input_rows,
+    )
+    rows = _fetch_missing(
+        conn,
+        """
+        SELECT i.id, i.name, false
+        FROM public.industry i
+        JOIN (VALUES %s) AS input (name) ON input.name = i.name
+        """,
+        input_rows,
+        rows,
+    )
+    rows = _record_upserted("industry", rows)
+    return {name: id_ for id_, name in rows}
+
+
+def upsert_contracts(conn, labels: set[str]) -> dict[str, int]:
+    input_rows = [(label,) for label in labels]
+    rows = _fetch_values(
+        conn,
+        """
+        WITH input (type_contrat) AS (VALUES %s),
+        inserted AS (
+            INSERT INTO public.contract (type_contrat)
+            SELECT DISTINCT type_contrat FROM input
+            ORDER BY type_contrat
+            ON CONFLICT (type_contrat) DO NOTHING
+            RETURNING id, type_contrat
+        )
+        SELECT id, type_contrat, true FROM inserted
+        UNION ALL
+        SELECT id, type_contrat, false FROM public.contract
+        WHERE type_contrat IN (SELECT type_contrat FROM input)
+        """,
+        input_rows,
+    )
+    rows = _fetch_missing(
+        conn,
+        """
+        SELECT c.id, c.type_contrat, false
+        FROM public.contract c
+        JOIN (VALUES %s) AS input (type_contrat) ON input.type_contrat = c.type_contrat
+        """,
+        input_rows,
+        rows,
+    )
+    rows = _record_upserted("contract", rows)
+    return {label: id_ for id_, label in rows}
+
+
+def upsert_locations(
+    conn,
+    locations: dict[tuple[str, str], tuple[float | None, float | None]],
+) -> dict[tuple[str, str], int]:
+    """
+    locations: {(city, postal_code): (latitude, longitude)}
+    """
+    input_rows = [(city, pc, lat, lon) for (city, pc), (lat, lon) in locations.items()]
+    rows = _fetch_values(
+        conn,
+        """
+        WITH input (ville, code_postal, latitude, longitude) AS (VALUES %s),
+        inserted AS (
+            INSERT INTO public.location (ville, code_postal, latitude, longitude)
+            SELECT ville, code_postal, latitude, longitude FROM input
+            ORDER BY ville, code_postal
+            ON CONFLICT (ville, code_postal) DO NOTHING
+            RETURNING id, ville, code_postal
+        )
+        SELECT id, ville, code_postal, true FROM inserted
+        UNION ALL
+        SELECT l.id, l.ville, l.code_postal, false
+        FROM public.location l
+        JOIN input i ON i.ville = l.ville AND i.code_postal = l.code_postal
+        """,
+        input_rows,
+        template="(%s, %s, %s::numeric, %s::numeric)",
+    )
+    rows = _fetch_missing(
+        conn,
+        """
+        SELECT l.id, l.ville, l.code_postal, false
+        FROM public.location l
+        JOIN (VALUES %s) AS input (ville, code_postal, latitude, longitude)
+            ON input.ville = l.ville AND input.code_postal = l.code_postal
+        """,
+        input_rows,
+        rows,
+        width=2,
+        template="(%s, %s, %s::numeric, %s::numeric)",
+    )
+    rows = _record_upserted("location", rows)
+    return {(city, pc): id_ for id_, city, pc in rows}
+
+
+def upsert_skills(conn, skills: set[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """
+    skills: {(name, category)}, matched within their category by resolve_skills
+    """
+    if not skills:
+        return {}
+    keys = sorted(skills)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT skill_id, name, category, inserted FROM public.resolve_skills(%s, %s, %s)",
+            ([name for name, _ in keys], [category for _, category in keys], settings.SKILL_MATCH_THRESHOLD),
+        )
+        rows = _record_upserted("skill", cur.fetchall())
+    return {(name, category): id_ for id_, name, category in rows}
+
+
+# ==================================================
+# Job offer
+# ==================================================
+
+JOB_OFFER_COLUMNS = (
+    "title",
+    "description",
+    "salary_min_annual",
+    "salary_max_annual",
+    "experience",
+    "education",
+    "date_posted",
+    "url",
+    "company_id",
+    "contract_id",
+    "industry_id",
+    "location_id",
+    "content_hash",
+)
+
+
+def move_job_offer_dates(conn, offers: list[dict]) -> None:
+    """
+    Set the new date_posted of stored offers whose date changed: the
+    upsert's conflict target is (url, date_posted), and an ON CONFLICT
+    update cannot move a row to another partition. A plain UPDATE does,
+    with the offer's links (ON UPDATE CASCADE). Links of an undated offer
+    do not reference it (MATCH SIMPLE): they are moved explicitly.
+    """
+    if not offers:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            WITH moved AS (
+                UPDATE public.job_offer jo
+                SET date_posted = v.date_posted
+                FROM (VALUES %s) AS v (url, date_posted)
+                WHERE jo.url = v.url
+                  AND jo.date_posted IS DISTINCT FROM v.date_posted
+                RETURNING jo.id, jo.date_posted
+            )
+            UPDATE public.job_offer_skill jos
+            SET date_posted = moved.date_posted
+            FROM moved
+            WHERE jos.job_offer_id = moved.id
+              AND jos.date_posted IS NULL
+              AND moved.date_posted IS NOT NULL
+            """,
+            sorted((o["url"], o.get("date_posted")) for o in offers),
+            template="(%s, %s::date)",
+            page_size=len(offers),
+        )
+
+
+def upsert_job_offers(conn, offers: list[dict]) -> dict[str, int]:
+    """
+    Insert or update every offer (keyed by URL) in one statement.
+    URLs must be unique within `offers`. Offers whose content_hash is
+    unchanged are neither updated nor returned.
+    """
+    move_job_offer_dates(conn, offers)
+    columns = ", ".join(JOB_OFFER_COLUMNS)
+    updates = ",\n            ".join(
+        f"{c} = EXCLUDED.{c}" for c in JOB_OFFER_COLUMNS if c not in ("url", "date_posted")
+    )
+    rows = _fetch_values(
+        conn,
+        f"""
+        INSERT INTO public.job_offer ({columns})
+        VALUES %s
+        ON CONFLICT (url, date_posted) DO UPDATE SET
+            {updates},
+            -- new content: tagged again (near_dup.tag_near_duplicates)
+            canonical_offer_id = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE public.job_offer.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+        -- xmax cannot be read through a partitioned table: created by this transaction
+        RETURNING id, url, (created_at = CURRENT_TIMESTAMP) AS inserted
+        """,
+        # URL order: concurrent writers lock the rows in the same order
+        [tuple(o.get(c) for c in JOB_OFFER_COLUMNS) for o in sorted(offers, key=lambda o: o["url"])],
+    )
+    inserted = sum(1 for *_, is_new in rows if is_new)
+    record_rows(
+        "job_offer",
+        inserted=inserted,
+        updated=len(rows) - inserted,
+        unchanged=len(offers) - len(rows),
+    )
+    return {url: id_ for id_, url, _ in rows}
+
+
+def link_job_offer_skills(conn, links: list[tuple[int, int, str]]) -> None:
+    """
+    links: [(job_offer_id, skill_id, requirement_level)], stored under
+    their offer's date_posted (the partition key)
+    """
+    if not links:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO public.job_offer_skill (
+                job_offer_id,
+                skill_id,
+                requirement_level,
+                date_posted
+            )
+            SELECT l.job_offer_id, l.skill_id, l.requirement_level, jo.date_posted
+            FROM (VALUES %s) AS l (job_offer_id, skill_id, requirement_level)
+            JOIN public.job_offer jo ON jo.id = l.job_offer_id
+            ON CONFLICT DO NOTHING
+            """,
+            links,
+            page_size=len(links),
+        )
+
+
+def fetch_job_offer_skills(conn, job_offer_ids: list[int]) -> dict[tuple[int, int], str]:
+    """
+    Existing links of the given offers: {(job_offer_id, skill_id): requirement_level}
+    """
+    if not job_offer_ids:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT job_offer_id, skill_id, requirement_level
+            FROM public.job_offer_skill
+            WHERE job_offer_id = ANY(%s)
+            """,
+            (list(job_offer_ids),),
+        )
+        return {(jo, sk): level for jo, sk, level in cur.fetchall()}
+
+
+def delete_job_offer_skills(conn, pairs: list[tuple[int, int]]) -> None:
+    """
+    pairs: [(job_offer_id, skill_id)]
+    """
+    if not pairs:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            DELETE FROM public.job_offer_skill js
+            USING (VALUES %s) AS d (job_offer_id, skill_id)
+            WHERE js.job_offer_id = d.job_offer_id
+              AND js.skill_id = d.skill_id
+            """,
+            pairs,
+            page_size=len(pairs),
+        )
+
+
+def update_job_offer_skill_levels(conn, links: list[tuple[int, int, str]]) -> None:
+    """
+    links: [(job_offer_id, skill_id, requirement_level)]
+    """
+    if not links:
+        return
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            UPDATE public.job_offer_skill js
+            SET requirement_level = u.requirement_level
+            FROM (VALUES %s) AS u (job_offer_id, skill_id, requirement_level)
+            WHERE js.job_offer_id = u.job_offer_id
+              AND js.skill_id = u.skill_id
+            """,
+            links,
+            page_size=len(links),
+        )
@@ -21,6 +21,17 @@ class Settings:
     DB_PASSWORD: str = _get_env("DB_PASSWORD", "123456")
     DATABASE_URL: str | None = _get_env("DATABASE_URL", None)
 
+    # -----------------------
+    # Connection pool (0 = a new connection per get_connection), seconds;
+    # the parallel loader needs LOAD_WORKERS + 1 connections
+    # -----------------------
+    DB_POOL_SIZE: int = int(_get_env("DB_POOL_SIZE", "8") or 8)
+    DB_POOL_MAX_LIFETIME: float = float(_get_env("DB_POOL_MAX_LIFETIME", "1800") or 1800)
+    DB_POOL_IDLE_CHECK: float = float(_get_env("DB_POOL_IDLE_CHECK", "30") or 30)
+    DB_POOL_TIMEOUT: float = float(_get_env("DB_POOL_TIMEOUT", "30") or 30)
+    # Server-side prepared statements (0 behind a transaction mode pooler)
+    DB_PREPARE: bool = (_get_env("DB_PREPARE", "1") or "1") not in ("0", "false", "no")
+
     # -----------------------
     # France Travail API
     # -----------------------
@@ -32,6 +43,71 @@ class Settings:
     # -----------------------
     FT_STEP: int = int(_get_env("FT_STEP", "150") or 150)
     FT_MAX_RESULTS: int = int(_get_env("FT_MAX_RESULTS", "300") or 300)
+    FT_CONCURRENCY: int = int(_get_env("FT_CONCURRENCY", "4") or 4)
+    FT_RATE_LIMIT: float = float(_get_env("FT_RATE_LIMIT", "5") or 5)  # requests / second
+    FT_MAX_RETRIES: int = int(_get_env("FT_MAX_RETRIES", "5") or 5)
+    FT_QUERY_CONCURRENCY: int = int(_get_env("FT_QUERY_CONCURRENCY", "4") or 4)
+    # Seconds to connect / between two bytes of a response (then retried)
+    FT_CONNECT_TIMEOUT: float = float(_get_env("FT_CONNECT_TIMEOUT", "5") or 5)
+    FT_READ_TIMEOUT: float = float(_get_env("FT_READ_TIMEOUT", "30") or 30)
+
+    # -----------------------
+    # Dimension cache (company / location are bounded, LRU eviction)
+    # -----------------------
+    DIM_CACHE_MAX_SIZE: int = int(_get_env("DIM_CACHE_MAX_SIZE", "50000") or 50000)
+
+    # -----------------------
+    # Company / skill name matching (pg_trgm similarity of a new name to the
+    # closest known one, 0-1, to be merged into it; 1 = same normalized name only)
+    # -----------------------
+    COMPANY_MATCH_THRESHOLD: float = float(_get_env("COMPANY_MATCH_THRESHOLD", "0.6") or 0.6)
+    SKILL_MATCH_THRESHOLD: float = float(_get_env("SKILL_MATCH_THRESHOLD", "0.7") or 0.7)
+
+    # -----------------------
+    # Parallel loader (worker connections, offers per committed shard batch)
+    # -----------------------
+    LOAD_WORKERS: int = int(_get_env("LOAD_WORKERS", "4") or 4)
+    LOAD_BATCH_SIZE: int = int(_get_env("LOAD_BATCH_SIZE", "1000") or 1000)
+
+    # -----------------------
+    # Parser memo caches (entries per parser, keyed on the raw label)
+    # -----------------------
+    PARSER_CACHE_SIZE: int = int(_get_env("PARSER_CACHE_SIZE", "4096") or 4096)
+
+    # -----------------------
+    # Streaming pipeline (offers per committed chunk, pages buffered ahead)
+    # -----------------------
+    PIPELINE_CHUNK_SIZE: int = int(_get_env("PIPELINE_CHUNK_SIZE", "500") or 500)
+    PIPELINE_QUEUE_SIZE: int = int(_get_env("PIPELINE_QUEUE_SIZE", "4") or 4)
+
+    # -----------------------
+    # Raw page spool (unset = disabled)
+    # -----------------------
+    SPOOL_DIR: str | None = _get_env("SPOOL_DIR", None)
+
+    # -----------------------
+    # Near-duplicate detection (persisted LSH index; unset = disabled)
+    # -----------------------
+    DEDUP_INDEX_PATH: str | None = _get_env("DEDUP_INDEX_PATH", None)
+    DEDUP_THRESHOLD: float = float(_get_env("DEDUP_THRESHOLD", "0.8") or 0.8)  # estimated Jaccard
+
+    # -----------------------
+    # Materialized analytics views (refreshed after each successful ingest run)
+    # -----------------------
+    ANALYTICS_REFRESH: bool = (_get_env("ANALYTICS_REFRESH", "1") or "1") not in ("0", "false", "no")
+
+    # -----------------------
+    # Monthly job_offer partitions (older months are archived to Parquet
+    # files under ARCHIVE_DIR by partitions.py; unset = no archival)
+    # -----------------------
+    PARTITION_RETENTION_MONTHS: int = int(_get_env("PARTITION_RETENTION_MONTHS", "24") or 24)
+    ARCHIVE_DIR: str | None = _get_env("ARCHIVE_DIR", None)
+
+    # -----------------------
+    # Run metrics (JSON summary, Prometheus textfile; unset = not written)
+    # -----------------------
+    METRICS_JSON_PATH: str | None = _get_env("METRICS_JSON_PATH", None)
+    METRICS_PROM_PATH: str | None = _get_env("METRICS_PROM_PATH", None)
 
     # -----------------------
     # General
@@ -0,0 +1,401 @@
+"""
+COPY-based loader for large backfills.
+
+Preprocessed offers are streamed into temporary staging tables (private
+to the connection, dropped at commit: concurrent loads do not share or
+lock them) with COPY FROM STDIN, then merged into the canonical tables of sql/schema.sql
+by one set-based SQL script, i.e. a constant number of round trips
+whatever the number of offers.
+"""
+import io
+from collections import Counter
+
+import pandas as pd
+
+from config import settings
+from instrumentation import record_rows
+from offers import normalize_offer
+
+# ==================================================
+# Staging tables
+# (the same transaction may run several loads: created once, emptied)
+# ==================================================
+
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS stg_job_offer (
+    seq BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    company TEXT NOT NULL,
+    industry TEXT,
+    contract TEXT,
+    experience TEXT,
+    education TEXT,
+    salary_min_annual DOUBLE PRECISION,
+    salary_max_annual DOUBLE PRECISION,
+    date_posted DATE,
+    city TEXT NOT NULL,
+    postal_code TEXT NOT NULL,
+    latitude DECIMAL(9,6),
+    longitude DECIMAL(9,6),
+    content_hash TEXT
+) ON COMMIT DROP;
+
+CREATE TEMP TABLE IF NOT EXISTS stg_job_offer_skill (
+    seq BIGINT NOT NULL,
+    url TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    requirement_level TEXT NOT NULL
+) ON COMMIT DROP;
+
+-- Canonical ids of the staged company / skill names
+CREATE TEMP TABLE IF NOT EXISTS stg_company (
+    name TEXT PRIMARY KEY,
+    id INTEGER NOT NULL
+) ON COMMIT DROP;
+
+CREATE TEMP TABLE IF NOT EXISTS stg_skill (
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (name, category)
+) ON COMMIT DROP;
+
+-- Offers inserted / changed by the merge, for the link diff
+CREATE TEMP TABLE IF NOT EXISTS stg_job_offer_upserted (
+    id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    date_posted DATE,
+    inserted BOOLEAN NOT NULL
+) ON COMMIT DROP;
+TRUNCATE stg_job_offer, stg_job_offer_skill, stg_job_offer_upserted,
+    stg_company, stg_skill;
+"""
+
+STG_JOB_OFFER_COLUMNS = (
+    "seq",
+    "url",
+    "title",
+    "description",
+    "company",
+    "industry",
+    "contract",
+    "experience",
+    "education",
+    "salary_min_annual",
+    "salary_max_annual",
+    "date_posted",
+    "city",
+    "postal_code",
+    "latitude",
+    "longitude",
+    "content_hash",
+)
+
+STG_SKILL_COLUMNS = ("seq", "url", "name", "category", "requirement_level")
+
+
+# ==================================================
+# Set-based merge (same semantics as the row loader:
+# first location / requirement level seen wins, last offer version wins,
+# offers with an unchanged content_hash are skipped, removed skills are unlinked)
+# ==================================================
+
+MERGE_SQL = """
+ANALYZE stg_job_offer;
+ANALYZE stg_job_offer_skill;
+
+-- Names -> canonical rows (sql/schema.sql, NAME CANONICALIZATION)
+INSERT INTO stg_company (name, id)
+SELECT name, company_id
+FROM public.resolve_companies(
+    (SELECT array_agg(DISTINCT company ORDER BY company) FROM stg_job_offer),
+    %(company_threshold)s
+);
+
+INSERT INTO public.industry (name)
+SELECT DISTINCT industry FROM stg_job_offer
+WHERE industry IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO public.contract (type_contrat)
+SELECT DISTINCT contract FROM stg_job_offer
+WHERE contract IS NOT NULL
+ON CONFLICT (type_contrat) DO NOTHING;
+
+INSERT INTO public.location (ville, code_postal, latitude, longitude)
+SELECT DISTINCT ON (city, postal_code) city, postal_code, latitude, longitude
+FROM stg_job_offer
+ORDER BY city, postal_code, seq
+ON CONFLICT (ville, code_postal) DO NOTHING;
+
+INSERT INTO stg_skill (name, category, id)
+SELECT r.name, r.category, r.skill_id
+FROM (
+    SELECT
+        array_agg(name ORDER BY name, category) AS names,
+        array_agg(category ORDER BY name, category) AS categories
+    FROM (SELECT DISTINCT name, category FROM stg_job_offer_skill) d
+) s
+CROSS JOIN public.resolve_skills(s.names, s.categories, %(skill_threshold)s) r;
+
+-- Stored offers whose date changed move to their new partition first:
+-- the conflict target is (url, date_posted) and an ON CONFLICT update
+-- cannot move a row across partitions (links follow, ON UPDATE CASCADE;
+-- those of an undated offer do not reference it and are moved here)
+WITH moved AS (
+    UPDATE public.job_offer jo
+    SET date_posted = s.date_posted
+    FROM (
+        SELECT DISTINCT ON (url) url, date_posted
+        FROM stg_job_offer
+        ORDER BY url, seq DESC
+    ) s
+    WHERE jo.url = s.url
+      AND jo.date_posted IS DISTINCT FROM s.date_posted
+    RETURNING jo.id, jo.date_posted
+)
+UPDATE public.job_offer_skill jos
+SET date_posted = moved.date_posted
+FROM moved
+WHERE jos.job_offer_id = moved.id
+  AND jos.date_posted IS NULL
+  AND moved.date_posted IS NOT NULL;
+
+WITH upserted AS (
+INSERT INTO public.job_offer (
+    title,
+    description,
+    salary_min_annual,
+    salary_max_annual,
+    experience,
+    education,
+    date_posted,
+    url,
+    company_id,
+    contract_id,
+    industry_id,
+    location_id,
+    content_hash
+)
+SELECT DISTINCT ON (s.url)
+    s.title,
+    s.description,
+    s.salary_min_annual,
+    s.salary_max_annual,
+    s.experience,
+    s.education,
+    s.date_posted,
+    s.url,
+    c.id,
+    ct.id,
+    i.id,
+    l.id,
+    s.content_hash
+FROM stg_job_offer s
+JOIN stg_company c ON c.name = s.company
+LEFT JOIN public.contract ct ON ct.type_contrat = s.contract
+LEFT JOIN public.industry i ON i.name = s.industry
+JOIN public.location l ON l.ville = s.city AND l.code_postal = s.postal_code
+ORDER BY s.url, s.seq DESC
+ON CONFLICT (url, date_posted) DO UPDATE SET
+    title = EXCLUDED.title,
+    description = EXCLUDED.description,
+    salary_min_annual = EXCLUDED.salary_min_annual,
+    salary_max_annual = EXCLUDED.salary_max_annual,
+    experience = EXCLUDED.experience,
+    education = EXCLUDED.education,
+    company_id = EXCLUDED.company_id,
+    contract_id = EXCLUDED.contract_id,
+    industry_id = EXCLUDED.industry_id,
+    location_id = EXCLUDED.location_id,
+    content_hash = EXCLUDED.content_hash,
+    -- new content: tagged again (near_dup.tag_near_duplicates)
+    canonical_offer_id = NULL,
+    updated_at = CURRENT_TIMESTAMP
+WHERE public.job_offer.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+-- xmax cannot be read through a partitioned table: created by this transaction
+RETURNING id, url, date_posted, (created_at = CURRENT_TIMESTAMP) AS inserted
+)
+INSERT INTO stg_job_offer_upserted (id, url, date_posted, inserted)
+SELECT id, url, date_posted, inserted FROM upserted;
+
+-- Only inserted / changed offers are re-linked, by diff against their stored links.
+-- A statement of its own: the rollup triggers (sql/schema.sql) must see an
+-- offer's new keys and its link changes in separate statements.
+ANALYZE stg_job_offer_upserted;
+
+WITH desired AS (
+    SELECT DISTINCT ON (jo.id, sk.id)
+        jo.id AS job_offer_id,
+        sk.id AS skill_id,
+        ss.requirement_level,
+        jo.date_posted
+    FROM stg_job_offer_skill ss
+    JOIN stg_job_offer_upserted jo ON jo.url = ss.url
+    JOIN stg_skill sk ON sk.name = ss.name AND sk.category = ss.category
+    ORDER BY jo.id, sk.id, ss.seq
+),
+deleted AS (
+    DELETE FROM public.job_offer_skill js
+    USING stg_job_offer_upserted jo
+    WHERE js.job_offer_id = jo.id
+      AND NOT EXISTS (
+          SELECT 1 FROM desired d
+          WHERE d.job_offer_id = js.job_offer_id AND d.skill_id = js.skill_id
+      )
+    RETURNING 1
+),
+updated AS (
+    UPDATE public.job_offer_skill js
+    SET requirement_level = d.requirement_level
+    FROM desired d
+    WHERE js.job_offer_id = d.job_offer_id
+      AND js.skill_id = d.skill_id
+      AND js.requirement_level <> d.requirement_level
+    RETURNING 1
+),
+inserted AS (
+    INSERT INTO public.job_offer_skill (job_offer_id, skill_id, requirement_level, date_posted)
+    SELECT job_offer_id, skill_id, requirement_level, date_posted FROM desired
+    ON CONFLICT DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM inserted),
+    (SELECT count(*) FROM deleted),
+    (SELECT count(*) FROM updated),
+    (SELECT count(*) FROM desired),
+    (SELECT count(*) FILTER (WHERE inserted) FROM stg_job_offer_upserted),
+    (SELECT count(*) FROM stg_job_offer_upserted);
+"""
+
+TRUNCATE_SQL = """
+TRUNCATE stg_job_offer, stg_job_offer_skill, stg_job_offer_upserted,
+    stg_company, stg_skill;
+"""
+
+
+# ==================================================
+# COPY streaming
+# ==================================================
+
+def _copy_value(value) -> str:
+    """
+    Encode one value for COPY ... FROM STDIN (text format)
+    """
+    if value is None:
+        return r"\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _LineStream(io.TextIOBase):
+    """
+    Read-only file object over an iterator of COPY lines, so rows are
+    streamed to the server without building the whole payload in memory
+    """
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+def _copy_rows(conn, table: str, columns: tuple, rows) -> None:
+    lines = ("\t".join(_copy_value(v) for v in row) + "\n" for row in rows)
+    with conn.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+            _LineStream(lines),
+        )
+
+
+# ==================================================
+# Loader
+# ==================================================
+
+def load_offers_copy(conn, df: pd.DataFrame, cache=None) -> Counter:
+    """
+    Stream offers into the staging tables and merge them server-side.
+    `cache` is accepted for interface compatibility: dimensions are
+    resolved by the merge itself. Return the link changes.
+    """
+    # Same URL twice: only the last version (and its skills) is staged
+    latest = {}
+    for r in df.to_dict("records"):
+        offer = normalize_offer(r)
+        latest[offer["url"]] = offer
+    offers = list(latest.values())
+
+    with conn.cursor() as cur:
+        cur.execute(STAGING_DDL)
+
+    _copy_rows(
+        conn,
+        "stg_job_offer",
+        STG_JOB_OFFER_COLUMNS,
+        (
+            (seq, *(o[c] for c in STG_JOB_OFFER_COLUMNS[1:]))
+            for seq, o in enumerate(offers)
+        ),
+    )
+    _copy_rows(
+        conn,
+        "stg_job_offer_skill",
+        STG_SKILL_COLUMNS,
+        (
+            (seq, url, name, category, level)
+            for seq, (url, name, category, level) in enumerate(
+                (o["url"], *skill) for o in offers for skill in o["skills"]
+            )
+        ),
+    )
+
+    with conn.cursor() as cur:
+        cur.execute(
+            MERGE_SQL,
+            {
+                "company_threshold": settings.COMPANY_MATCH_THRESHOLD,
+                "skill_threshold": settings.SKILL_MATCH_THRESHOLD,
+            },
+        )
+        inserted, deleted, updated, desired, offers_inserted, offers_upserted = cur.fetchone()
+        cur.execute(TRUNCATE_SQL)
+
+    record_rows(
+        "job_offer",
+        inserted=offers_inserted,
+        updated=offers_upserted - offers_inserted,
+        unchanged=len(offers) - offers_upserted,
+    )
+    links = Counter(
+        inserted=inserted,
+        deleted=deleted,
+        updated=updated,
+        unchanged=desired - inserted - updated,
+    )
+    record_rows("job_offer_skill", **links)
+    return links
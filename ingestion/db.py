@@ -1,17 +1,322 @@
+import atexit
+import logging
 import os
+import threading
+import time
+from collections import deque
+
 import psycopg2
+from psycopg2 import errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, connection as _connection, cursor as _cursor
+from psycopg2.pool import PoolError
 
+from config import settings
+from instrumentation import InstrumentedCursor
 
-def get_connection():
+logger = logging.getLogger(__name__)
+
+# Cursor class for every new connection (statement counting / timing)
+_CURSOR_FACTORY = InstrumentedCursor
+
+# Run the repositories' hot statements as server-side prepared statements
+_USE_PREPARED = settings.DB_PREPARE
+
+
+def set_cursor_factory(factory) -> None:
     """
-    Return a PostgreSQL connection to Supabase
+    Make every connection handed out from now on use `factory` for its
+    cursors (None restores `InstrumentedCursor`)
     """
-    conn = psycopg2.connect(
-        host=os.environ["DB_HOST"],      
-        dbname=os.environ["DB_NAME"],    
-        user=os.environ["DB_USER"],      
+    global _CURSOR_FACTORY
+    _CURSOR_FACTORY = factory or InstrumentedCursor
+
+
+def use_prepared_statements(enabled: bool) -> None:
+    global _USE_PREPARED
+    _USE_PREPARED = enabled
+
+
+def _connect() -> "PooledConnection":
+    return psycopg2.connect(
+        host=os.environ["DB_HOST"],
+        dbname=os.environ["DB_NAME"],
+        user=os.environ["DB_USER"],
         password=os.environ["DB_PASSWORD"],
         port=int(os.environ.get("DB_PORT", 5432)),
-        sslmode="require",               
+        # "disable" for a local benchmark database
+        sslmode=os.environ.get("DB_SSLMODE", "require"),
+        connection_factory=PooledConnection,
+        cursor_factory=_CURSOR_FACTORY,
     )
+
+
+def get_connection():
+    """
+    Return a PostgreSQL connection to Supabase, from the process pool
+    (DB_POOL_SIZE=0: a new connection). close() gives it back to the pool.
+    """
+    if settings.DB_POOL_SIZE <= 0:
+        return _connect()
+    conn = get_pool().get()
+    conn.cursor_factory = _CURSOR_FACTORY
     return conn
+
+
+# ==================================================
+# Connection pool
+# ==================================================
+
+class PooledConnection(_connection):
+    """
+    Connection remembering its pool, its age and the statements prepared
+    on its session; close() hands it back to its pool, if any
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.in_use = False
+        self.created_at = self.last_used = time.monotonic()
+        self.prepared = set()
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        elif self.in_use:
+            self.pool.put(self)
+        # else: already back in the pool, closing twice is a no-op
+
+    def discard(self):
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of at most `max_size` open connections.
+
+    A connection older than `max_lifetime` seconds is closed instead of
+    being reused (server-side memory, credentials / failover changes); one
+    idle for more than `idle_check` seconds is pinged before being handed
+    out, so a connection dropped by the server or a proxy is replaced
+    rather than failing the caller's first statement. A returned
+    connection is rolled back, never reused mid-transaction.
+    """
+
+    def __init__(
+        self,
+        connect=_connect,
+        max_size: int = settings.DB_POOL_SIZE,
+        max_lifetime: float = settings.DB_POOL_MAX_LIFETIME,
+        idle_check: float = settings.DB_POOL_IDLE_CHECK,
+        timeout: float = settings.DB_POOL_TIMEOUT,
+    ):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def get(self) -> PooledConnection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"no connection available after {self.timeout}s ({self.max_size} in use)")
+        try:
+            conn = self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        conn.pool = self
+        conn.in_use = True
+        return conn
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if self._healthy(conn):
+                return conn
+            conn.discard()
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - conn.created_at > self.max_lifetime:
+            return False
+        if now - conn.last_used <= self.idle_check:
+            return True
+        try:
+            # Plain cursor: the ping is not one of the run's statements
+            with conn.cursor(cursor_factory=_cursor) as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def put(self, conn: PooledConnection) -> None:
+        conn.in_use = False
+        keep = not conn.closed and time.monotonic() - conn.created_at <= self.max_lifetime
+        if keep:
+            try:
+                if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except psycopg2.Error:
+                keep = False
+        if keep:
+            conn.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.discard()
+        self._slots.release()
+
+    def close(self) -> None:
+        """
+        Close the idle connections (the ones in use are closed when returned)
+        """
+        self.max_lifetime = -1
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            conn.discard()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+# Pools inherited by a forked child (replay workers): their sockets belong
+# to the parent, so they are kept referenced and never closed in the child
+_inherited: list[ConnectionPool] = []
+
+
+def _after_fork_in_child() -> None:
+    global _pool, _pool_lock
+    if _pool is not None:
+        _inherited.append(_pool)
+    _pool, _pool_lock = None, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Process-wide pool, created on first use
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def pool_capacity() -> int | None:
+    """
+    Connections the process can hold at once (None: no pool, no limit)
+    """
+    if settings.DB_POOL_SIZE <= 0:
+        return None
+    return get_pool().max_size
+
+
+def resize_pool(max_size: int) -> None:
+    """
+    Replace the process-wide pool by one of `max_size` connections (the
+    connections in use are closed when given back)
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, ConnectionPool(max_size=max_size)
+    if pool is not None:
+        pool.close()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+atexit.register(close_pool)
+
+
+# ==================================================
+# Prepared statements
+# ==================================================
+
+class PreparedStatement:
+    """
+    SQL text (with %s placeholders) run through PREPARE / EXECUTE: parsed
+    and planned once per session instead of once per call.
+
+    The statement is prepared lazily, the first time a connection runs it,
+    and stays prepared for the connection's life (a rollback does not drop
+    it). Falls back to a plain execute on connections not opened by
+    `get_connection`, or with DB_PREPARE=0 (needed behind a transaction
+    mode pooler such as Supabase's port 6543, which does not keep sessions).
+    """
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        parts = sql.split("%s")
+        self._prepare = f"PREPARE {name} AS " + "".join(
+            part + (f"${i}" if i < len(parts) else "") for i, part in enumerate(parts, start=1)
+        )
+        args = ", ".join(["%s"] * (len(parts) - 1))
+        self._execute = f"EXECUTE {name} ({args})" if args else f"EXECUTE {name}"
+
+    def execute(self, cur, params=()) -> None:
+        prepared = getattr(cur.connection, "prepared", None)
+        if not _USE_PREPARED or prepared is None:
+            cur.execute(self.sql, params)
+            return
+        if self.name not in prepared:
+            cur.execute(self._prepare)
+            prepared.add(self.name)
+        cur.execute(self._execute, params)
+
+
+_STATEMENTS: dict[str, PreparedStatement] = {}
+
+
+def execute_prepared(cur, name: str, sql: str, params=()) -> None:
+    """
+    `cur.execute(sql, params)` as the prepared statement `name`
+    (one name per SQL text)
+    """
+    stmt = _STATEMENTS.get(name)
+    if stmt is None:
+        stmt = _STATEMENTS.setdefault(name, PreparedStatement(name, sql))
+    stmt.execute(cur, params)
+
+
+# ==================================================
+# Schema changes on live tables
+# ==================================================
+
+def run_ddl(conn, sql: str, lock_timeout: str = "2s", attempts: int = 30) -> None:
+    """
+    Run `sql` in one transaction, giving up on the table locks after
+    `lock_timeout` and retrying rather than stalling the queries behind it
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+                cur.execute(sql)
+            conn.commit()
+            return
+        except errors.LockNotAvailable:
+            conn.rollback()
+            logger.warning("tables busy, DDL attempt %d/%d", attempt, attempts)
+            time.sleep(min(attempt, 10))
+    raise RuntimeError(f"could not lock the tables after {attempts} attempts")
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+# ==================================================
+# Warm-up queries: one bulk SELECT per dimension
+# (natural key columns first, id last)
+# ==================================================
+
+# Companies and skills: a name resolves to the canonical row of its alias
+# (sql/schema.sql, NAME CANONICALIZATION), not necessarily to its own row
+WARM_QUERIES = {
+    "company": """
+        SELECT c.name, a.company_id
+        FROM public.company c
+        JOIN public.company_alias a ON a.alias = public.company_key(c.name)
+        ORDER BY c.id DESC
+        LIMIT %s
+    """,
+    "industry": "SELECT name, id FROM public.industry ORDER BY id DESC LIMIT %s",
+    "contract": "SELECT type_contrat, id FROM public.contract ORDER BY id DESC LIMIT %s",
+    "location": "SELECT ville, code_postal, id FROM public.location ORDER BY id DESC LIMIT %s",
+    "skill": """
+        SELECT s.name, s.category, a.skill_id
+        FROM public.skill s
+        JOIN public.skill_alias a ON a.alias = public.skill_key(s.name) AND a.category = s.category
+        ORDER BY s.id DESC
+        LIMIT %s
+    """,
+}
+
+
+class DimensionCache:
+    """
+    Bounded LRU map natural key -> id for one dimension table
+    (maxsize=None means unbounded)
+    """
+
+    def __init__(self, name: str, maxsize: int | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self._ids: OrderedDict[Hashable, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.warmed = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, key: Hashable) -> int | None:
+        id_ = self._ids.get(key)
+        if id_ is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._ids.move_to_end(key)
+        return id_
+
+    def put(self, key: Hashable, id_: int) -> None:
+        self._ids[key] = id_
+        self._ids.move_to_end(key)
+        if self.maxsize is not None and len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_create(self, key: Hashable, create: Callable[[], int]) -> int:
+        id_ = self.get(key)
+        if id_ is None:
+            id_ = create()
+            self.put(key, id_)
+        return id_
+
+    def resolve(
+        self,
+        keys: Iterable[Hashable],
+        create_many: Callable[[set], dict],
+    ) -> dict:
+        """
+        Return {key: id} for every key; misses are created with one call
+        """
+        ids = {}
+        missing = set()
+        for key in set(keys):
+            id_ = self.get(key)
+            if id_ is None:
+                missing.add(key)
+            else:
+                ids[key] = id_
+
+        if missing:
+            created = create_many(missing)
+            for key, id_ in created.items():
+                self.put(key, id_)
+            ids.update(created)
+        return ids
+
+    def warm(self, conn) -> None:
+        with conn.cursor() as cur:
+            cur.execute(WARM_QUERIES[self.name], (self.maxsize,))
+            rows = cur.fetchall()
+
+        # Rows come newest first: insert oldest first so they are evicted first
+        for row in reversed(rows):
+            key = row[0] if len(row) == 2 else tuple(row[:-1])
+            self.put(key, row[-1])
+        self.warmed = len(rows)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._ids),
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class DimensionCaches:
+    """
+    Run-scoped caches for every dimension resolved by the loaders
+    """
+
+    def __init__(self, max_size: int | None = None):
+        # Only the large, open-ended dimensions are bounded
+        self._caches = {
+            "company": DimensionCache("company", max_size),
+            "industry": DimensionCache("industry"),
+            "contract": DimensionCache("contract"),
+            "location": DimensionCache("location", max_size),
+            "skill": DimensionCache("skill"),
+        }
+
+    def __getitem__(self, name: str) -> DimensionCache:
+        return self._caches[name]
+
+    def warm(self, conn) -> None:
+        for cache in self._caches.values():
+            cache.warm(conn)
+
+    def stats(self) -> dict:
+        return {name: cache.stats() for name, cache in self._caches.items()}
@@ -0,0 +1,88 @@
+"""
+Multi-query fan-out: keywords × département × typeContrat.
+
+The query matrix comes from a JSON file, e.g.
+
+    {
+        "keywords": ["data analyst", "data engineer"],
+        "departements": ["75", "69", null],
+        "contract_types": ["CDI", "CDD"]
+    }
+
+(null = no filter on that axis). Searches run concurrently and their
+results are deduplicated by France Travail offer `id` before preprocessing.
+"""
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class Query:
+    keywords: str
+    departement: str | None = None
+    contract_type: str | None = None
+
+    @property
+    def key(self) -> str:
+        return "|".join([self.keywords, self.departement or "*", self.contract_type or "*"])
+
+
+def load_query_matrix(path: str) -> list[Query]:
+    with open(path, encoding="utf-8") as f:
+        matrix = json.load(f)
+
+    return [
+        Query(keywords, departement, contract_type)
+        for keywords, departement, contract_type in itertools.product(
+            matrix["keywords"],
+            matrix.get("departements") or [None],
+            matrix.get("contract_types") or [None],
+        )
+    ]
+
+
+def max_date_creation(items: list[dict]) -> str | None:
+    """
+    Latest `dateCreation` of a result set (ISO-8601 strings sort chronologically)
+    """
+    dates = [i["dateCreation"] for i in items if i.get("dateCreation")]
+    return max(dates) if dates else None
+
+
+def fetch_fanout(
+    queries: list[Query],
+    fetch: Callable[[Query], list[dict]],
+    concurrency: int = 4,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Run every query and keep the first occurrence of each offer id.
+    Return (unique offers, per-query stats).
+    """
+    seen = set()
+    unique = []
+    stats = []
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        # map() yields in query order, so dedup is deterministic
+        for query, items in zip(queries, pool.map(fetch, queries)):
+            new = 0
+            for item in items:
+                offer_id = item.get("id")
+                if offer_id in seen:
+                    continue
+                seen.add(offer_id)
+                unique.append(item)
+                new += 1
+
+            stats.append({
+                "query": query.key,
+                "fetched": len(items),
+                "new": new,
+                "duplicates": len(items) - new,
+                "max_date_creation": max_date_creation(items),
+            })
+
+    return unique, stats
@@ -0,0 +1,215 @@
+"""
+France Travail API client.
+
+One client owns a pooled keep-alive session, the rate limiter, and the
+OAuth2 access token. The token is cached and refreshed shortly before it
+expires, and shared by every thread. Every response is timed per endpoint
+(see `FranceTravailClient.metrics`).
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterator
+
+import requests
+from requests.auth import AuthBase
+
+from config import settings
+from ft_fetch import TokenBucket, iter_ranges, new_session, request_with_retry
+
+FT_TOKEN_URL = "https://entreprise.francetravail.fr/connexion/oauth2/access_token?realm=/partenaire"
+FT_SEARCH_URL = (
+    "https://api.francetravail.io/partenaire/"
+    "offresdemploi/v2/offres/search"
+)
+FT_SCOPE = "api_offresdemploiv2 o2dsoffre"
+
+
+class _BearerAuth(AuthBase):
+    """
+    Attach the cached token; on a 401, refresh it and resend once
+    """
+
+    def __init__(self, client: "FranceTravailClient"):
+        self.client = client
+
+    def __call__(self, r):
+        r.headers["Authorization"] = f"Bearer {self.client.access_token()}"
+        r.register_hook("response", self._retry_401)
+        return r
+
+    def _retry_401(self, resp, **kwargs):
+        if resp.status_code != 401 or resp.request.headers.get("X-Token-Retry"):
+            return resp
+
+        self.client.invalidate_token()
+        resp.content  # release the connection
+        resp.close()
+
+        # The session hooks after this one only see the retry: record the 401 now
+        self.client._record(resp)
+
+        # Resend through the session (and the limiter); its response hooks
+        # still run on the retry once this hook returns it
+        prep = resp.request.copy()
+        prep.headers["Authorization"] = f"Bearer {self.client.access_token()}"
+        prep.headers["X-Token-Retry"] = "1"
+        prep.hooks = {"response": []}
+        self.client.limiter.acquire()
+        retry = self.client.session.send(prep, **kwargs)
+        retry.history.insert(0, resp)
+        return retry
+
+
+class _EndpointMetrics:
+    def __init__(self, window: int = 10_000):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies = deque(maxlen=window)
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(p: float) -> float | None:
+            return round(lat[min(int(p * len(lat)), len(lat) - 1)] * 1000, 1) if lat else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(lat[-1] * 1000, 1) if lat else None,
+        }
+
+
+class FranceTravailClient:
+    def __init__(
+        self,
+        client_id: str | None = None,
+        client_secret: str | None = None,
+        token_url: str = FT_TOKEN_URL,
+        search_url: str = FT_SEARCH_URL,
+        pool_size: int = settings.FT_CONCURRENCY * settings.FT_QUERY_CONCURRENCY,
+        rate_limit: float = settings.FT_RATE_LIMIT,
+        max_retries: int = settings.FT_MAX_RETRIES,
+        refresh_margin: float = 60.0,
+    ):
+        self.client_id = client_id or settings.FT_CLIENT_ID or os.environ.get("FT_CLIENT_ID")
+        self.client_secret = client_secret or settings.FT_CLIENT_SECRET or os.environ.get("FT_CLIENT_SECRET")
+        self.token_url = token_url
+        self.search_url = search_url
+        self.max_retries = max_retries
+        self.refresh_margin = refresh_margin
+
+        self.session = new_session(pool_size)
+        self.session.hooks["response"].append(self._record)
+        self.limiter = TokenBucket(rate_limit)
+        self.auth = _BearerAuth(self)
+
+        self._token = None
+        self._refresh_at = 0.0
+        self._token_lock = threading.Lock()
+        self._metrics: dict[str, _EndpointMetrics] = {}
+        self._metrics_lock = threading.Lock()
+
+    # ---------- OAuth2 ----------
+    def access_token(self) -> str:
+        with self._token_lock:
+            if self._token is None or time.monotonic() >= self._refresh_at:
+                self._fetch_token()
+            return self._token
+
+    def invalidate_token(self) -> None:
+        with self._token_lock:
+            self._token = None
+
+    def _fetch_token(self) -> None:
+        resp = request_with_retry(
+            self.session,
+            "POST",
+            self.token_url,
+            max_retries=self.max_retries,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": FT_SCOPE,
+            },
+        )
+        payload = resp.json()
+        expires_in = float(payload.get("expires_in", 0) or 0)
+        self._token = payload["access_token"]
+        # Refresh early: 60 s before expiry, or at 90 % of a short lifetime
+        self._refresh_at = time.monotonic() + max(expires_in - min(self.refresh_margin, expires_in * 0.1), 0)
+
+    # ---------- Search ----------
+    def search_pages(
+        self,
+        params: dict,
+        step: int = 150,
+        max_results: int = 600,
+        concurrency: int = settings.FT_CONCURRENCY,
+        token: str | None = None,
+        start: int = 0,
+    ) -> Iterator[list[dict]]:
+        """
+        Yield the result pages of one search from offset `start` (see
+        `ft_fetch.iter_ranges`). An explicit `token` bypasses the client's
+        OAuth handling.
+        """
+        return iter_ranges(
+            self.session,
+            self.search_url,
+            params=params,
+            headers={"Authorization": f"Bearer {token}"} if token else {},
+            auth=None if token else self.auth,
+            step=step,
+            max_results=max_results,
+            concurrency=concurrency,
+            limiter=self.limiter,
+            max_retries=self.max_retries,
+            start=start,
+        )
+
+    # ---------- Metrics ----------
+    def _endpoint(self, url: str) -> str:
+        if url.startswith(self.token_url.split("?")[0]):
+            return "token"
+        if url.startswith(self.search_url):
+            return "search"
+        return url.split("?")[0]
+
+    def _record(self, resp: requests.Response, *args, **kwargs) -> None:
+        name = self._endpoint(resp.request.url)
+        with self._metrics_lock:
+            m = self._metrics.setdefault(name, _EndpointMetrics())
+            m.calls += 1
+            m.errors += resp.status_code >= 400
+            # Decoded body, read now (no streamed requests): chunked
+            # responses have no Content-Length
+            m.bytes += len(resp.content)
+            m.latencies.append(resp.elapsed.total_seconds())
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            return {name: m.summary() for name, m in self._metrics.items()}
+
+
+# ==================================================
+# Process-wide default client
+# ==================================================
+
+_DEFAULT_CLIENT = None
+_DEFAULT_CLIENT_LOCK = threading.Lock()
+
+
+def default_client() -> FranceTravailClient:
+    global _DEFAULT_CLIENT
+    with _DEFAULT_CLIENT_LOCK:
+        if _DEFAULT_CLIENT is None:
+            _DEFAULT_CLIENT = FranceTravailClient()
+        return _DEFAULT_CLIENT
@@ -0,0 +1,172 @@
+"""
+Columnar preprocessing of France Travail offers.
+
+Same output as the row-by-row `ingest.preprocess_ft_rows`, but every field is
+extracted as a whole column and parsed with vectorized string operations;
+skills and languages go through one exploded long-form frame
+(see `ft_link_frame`) instead of per-offer list comprehensions.
+"""
+from datetime import date
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from offers import SKILL_COLUMNS
+from preprocessing import parse_location_series, parse_salary_series
+
+OFFER_COLUMNS = [
+    "url",
+    "title",
+    "description",
+    "company",
+    "industry",
+    "experience",
+    "education",
+    "contract",
+    "salary_raw",
+    "salary_min_annual",
+    "salary_max_annual",
+    "date_posted",
+    "postal_code",
+    "city",
+    "latitude",
+    "longitude",
+]
+
+LIST_COLUMNS = [column for column, _, _ in SKILL_COLUMNS]
+
+# raw list field → DataFrame column for exigence "E" / "S" (None: every entry)
+_LINK_SOURCES = [
+    ("competences", {"E": "skills_hard_required", "S": "skills_hard_optional"}),
+    ("qualitesProfessionnelles", None),
+    ("langues", {"E": "languages_required", "S": "languages_optional"}),
+]
+
+
+# ==================================================
+# Extraction
+# ==================================================
+
+def _nested(raw_items: list[dict], key: str, field: str) -> list:
+    return [(item.get(key) or {}).get(field) for item in raw_items]
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    # Parse each distinct day once
+    days = values.where(values.map(type) == str).str.slice(0, 10)
+    lookup = {d: date.fromisoformat(d) for d in days.dropna().unique() if d}
+    return days.map(lookup).astype(object).where(days.notna() & (days != ""), None)
+
+
+def _education(raw_items: list[dict]) -> list:
+    return [
+        ", ".join(f.get("libelle", "") for f in item["formations"])
+        if isinstance(item.get("formations"), list)
+        else None
+        for item in raw_items
+    ]
+
+
+def _unique_parsed(parse, values: list) -> pd.DataFrame:
+    """
+    Run a vectorized parser on the distinct values only, then broadcast back
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    parsed = parse(pd.Series(uniques, dtype=object))
+    return parsed.reindex(codes).set_axis(pd.RangeIndex(len(values)))
+
+
+def _salaries(uniques: pd.Series) -> pd.DataFrame:
+    low, high = parse_salary_series(uniques)
+    return pd.DataFrame({"salary_min_annual": low, "salary_max_annual": high})
+
+
+def ft_link_frame(raw_items: list[dict]) -> pd.DataFrame:
+    """
+    Long-form skill/language links: one row per (offer position, column, name)
+    in source order, with the skill category and requirement level
+    """
+    frames = []
+    for field, by_exigence in _LINK_SOURCES:
+        lists = [e if isinstance(e := item.get(field), list) else [] for item in raw_items]
+        entries = list(chain.from_iterable(lists))
+        links = pd.DataFrame({
+            "row": np.repeat(np.arange(len(lists)), [len(e) for e in lists]),
+            "name": pd.Series([e.get("libelle") for e in entries], dtype=object),
+        })
+        if by_exigence:
+            links["column"] = pd.Series([e.get("exigence") for e in entries], dtype=object).map(by_exigence)
+            links = links[links["column"].notna()]
+        else:
+            links["column"] = "skills_soft"
+        frames.append(links)
+
+    meta = pd.DataFrame(SKILL_COLUMNS, columns=["column", "category", "requirement_level"])
+    links = pd.concat(frames, ignore_index=True)[["row", "column", "name"]]
+    return links.merge(meta, on="column", how="left")
+
+
+# ==================================================
+# Public API
+# ==================================================
+
+def _as_list(values: pd.Series) -> list:
+    return [None if v is None or v != v else v for v in values.tolist()]
+
+
+def _offer_columns(raw_items: list[dict]) -> dict[str, list]:
+    salary_raw = _nested(raw_items, "salaire", "libelle")
+    salary = _unique_parsed(_salaries, salary_raw)
+    location = _unique_parsed(parse_location_series, _nested(raw_items, "lieuTravail", "libelle"))
+
+    urls = [
+        url or f"francetravail:{item.get('id')}"
+        for item, url in zip(raw_items, _nested(raw_items, "origineOffre", "urlOrigine"))
+    ]
+
+    return {
+        "url": urls,
+        "title": [item.get("intitule") for item in raw_items],
+        "description": [item.get("description") for item in raw_items],
+        "company": _nested(raw_items, "entreprise", "nom"),
+        "industry": [item.get("secteurActiviteLibelle") for item in raw_items],
+        "experience": [item.get("experienceLibelle") for item in raw_items],
+        "education": _education(raw_items),
+        "contract": [item.get("typeContratLibelle") for item in raw_items],
+        "salary_raw": salary_raw,
+        "salary_min_annual": _as_list(salary["salary_min_annual"]),
+        "salary_max_annual": _as_list(salary["salary_max_annual"]),
+        "date_posted": _as_list(_dates(pd.Series([item.get("dateCreation") for item in raw_items], dtype=object))),
+        "postal_code": _as_list(location["dep_code"]),
+        "city": _as_list(location["city"]),
+        "latitude": _as_list(location["latitude"]),
+        "longitude": _as_list(location["longitude"]),
+    }
+
+
+def preprocess_ft_frames(raw_items: list[dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Return (offers without list columns, long-form links with an `url` column)
+    """
+    offers = pd.DataFrame(_offer_columns(raw_items))
+    links = ft_link_frame(raw_items)
+    links.insert(0, "url", offers["url"].to_numpy()[links["row"].to_numpy()] if raw_items else [])
+    return offers, links
+
+
+def preprocess_ft_columnar(raw_items: list[dict]) -> pd.DataFrame:
+    """
+    Drop-in replacement for `preprocess_ft_rows`: identical DataFrame
+    """
+    if not raw_items:
+        return pd.DataFrame()
+
+    columns = _offer_columns(raw_items)
+    links = ft_link_frame(raw_items)
+
+    lists = {column: [[] for _ in raw_items] for column in LIST_COLUMNS}
+    for column, row, name in zip(links["column"].tolist(), links["row"].tolist(), links["name"].tolist()):
+        lists[column][row].append(name)
+
+    return pd.DataFrame({**columns, **lists})
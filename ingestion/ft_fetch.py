@@ -0,0 +1,208 @@
+"""
+Concurrent, rate-limited paging over the France Travail search endpoint.
+
+The first page tells how many offers match (``Content-Range: offres 0-149/1234``);
+the remaining ``range`` pages are then requested in parallel on a shared
+keep-alive session, under a token-bucket rate limit, with retries on
+429 / 5xx (exponential backoff with full jitter, honoring ``Retry-After``).
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import settings
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_CONTENT_RANGE_RE = re.compile(r"(\d+)-(\d+)/(\d+)")
+
+
+# ==================================================
+# Rate limiting
+# ==================================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# ==================================================
+# HTTP
+# ==================================================
+
+def new_session(pool_size: int = 10) -> requests.Session:
+    """
+    Session whose connection pool can keep one connection per worker alive
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def request_with_retry(
+    session: requests.Session,
+    method: str,
+    url: str,
+    limiter: TokenBucket | None = None,
+    max_retries: int = 5,
+    backoff: float = 0.5,
+    max_backoff: float = 30.0,
+    **kwargs,
+) -> requests.Response:
+    """
+    Send a request, retrying transient failures; raise on the last one.
+    Without a `timeout`, a stalled connection times out after
+    FT_CONNECT_TIMEOUT / FT_READ_TIMEOUT (and is retried).
+    """
+    kwargs.setdefault("timeout", (settings.FT_CONNECT_TIMEOUT, settings.FT_READ_TIMEOUT))
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire()
+
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            resp = None
+
+        if resp is not None and resp.status_code not in RETRY_STATUSES:
+            resp.raise_for_status()
+            return resp
+
+        if attempt == max_retries:
+            resp.raise_for_status()
+
+        delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+        wait = _retry_after(resp) if resp is not None else None
+        time.sleep(max(delay, wait or 0.0))
+
+    raise RuntimeError("unreachable")
+
+
+# ==================================================
+# Paging
+# ==================================================
+
+def _page(resp: requests.Response) -> tuple[list[dict], int | None]:
+    """
+    Return (offers, total matching offers if announced)
+    """
+    if resp.status_code == 204 or not resp.content:
+        return [], 0
+
+    match = _CONTENT_RANGE_RE.search(resp.headers.get("Content-Range", ""))
+    total = int(match.group(3)) if match else None
+    return resp.json().get("resultats", []), total
+
+
+def iter_ranges(
+    session: requests.Session,
+    url: str,
+    params: dict,
+    headers: dict,
+    step: int,
+    max_results: int,
+    concurrency: int = 4,
+    limiter: TokenBucket | None = None,
+    max_retries: int = 5,
+    auth: requests.auth.AuthBase | None = None,
+    start: int = 0,
+) -> Iterator[list[dict]]:
+    """
+    Yield every `range` page of a search, in order, from offset `start`
+    (`max_results` counts from offset 0). At most `concurrency` pages are
+    in flight, so a slow consumer holds back the requests.
+    """
+    def get(start: int) -> tuple[list[dict], int | None]:
+        resp = request_with_retry(
+            session,
+            "GET",
+            url,
+            limiter=limiter,
+            max_retries=max_retries,
+            headers=headers,
+            auth=auth,
+            params={**params, "range": f"{start}-{start + step - 1}"},
+        )
+        return _page(resp)
+
+    if start >= max_results:
+        return
+    first, total = get(start)
+    yield first
+    if len(first) < step:
+        return
+
+    # No Content-Range: fall back to sequential paging
+    if total is None:
+        start += step
+        while start < max_results:
+            page, _ = get(start)
+            yield page
+            if len(page) < step:
+                break
+            start += step
+        return
+
+    starts = iter(range(start + step, min(total, max_results), step))
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        window = deque(pool.submit(get, s) for s in islice(starts, max(concurrency, 1)))
+        while window:
+            page, _ = window.popleft().result()
+            start = next(starts, None)
+            if start is not None:
+                window.append(pool.submit(get, start))
+            yield page
+
+
+def fetch_ranges(*args, **kwargs) -> list[dict]:
+    """
+    Fetch every `range` page of a search (see `iter_ranges`), in order
+    """
+    return [item for page in iter_ranges(*args, **kwargs) for item in page]
@@ -1,94 +1,139 @@
-import os
-import time
+import argparse
 import json
-import requests
+import logging
+import itertools
+import contextlib
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterator
 
+from analytics_views import refresh_after_ingest
 from config import settings
 from db import get_connection
-
-from repositories import get_or_create_location
-
+from ft_client import FranceTravailClient, default_client
+import instrumentation
+from partitions import ensure_before_ingest
+from instrumentation import record_http, stage
+
+from loaders import LOADERS
+from dimension_cache import DimensionCaches
+from fanout import Query, fetch_fanout, load_query_matrix, max_date_creation
 from repositories import (
-    get_or_create_company,
-    get_or_create_job_offer,
-    get_or_create_skill,
-    get_or_create_location,
-    get_or_create_industry,
-    link_job_offer_skill,
-    get_or_create_contract, 
+    checkpoint_ingest_run,
+    create_ingest_run,
+    finish_ingest_run,
+    get_resumable_run,
+    get_watermark,
+    set_watermark,
 )
+from pipeline import dedupe_by_id, run_pipeline
+from near_dup import default_index, save_default_index, tag_near_duplicates
+from spool import SpoolWriter
+from ft_columnar import preprocess_ft_columnar
 
 from preprocessing import (
     parse_salary_france_travail,
     parse_location,
+    parser_cache_stats,
 )
 
+logger = logging.getLogger(__name__)
+
 # ==================================================
 # France Travail API
 # ==================================================
 
-FT_SEARCH_URL = (
-    "https://api.francetravail.io/partenaire/"
-    "offresdemploi/v2/offres/search"
-)
+FT_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+# Lower bound of a date window with no watermark: older than any open offer
+FT_EARLIEST_CREATION_DATE = datetime(2000, 1, 1, tzinfo=timezone.utc)
 
 
 def get_ft_access_token() -> str:
-    resp = requests.post(
-        "https://entreprise.francetravail.fr/connexion/oauth2/access_token?realm=/partenaire",
-        data={
-            "grant_type": "client_credentials",
-            "client_id": os.environ["FT_CLIENT_ID"],
-            "client_secret": os.environ["FT_CLIENT_SECRET"],
-            "scope": "api_offresdemploiv2 o2dsoffre",
-        },
-    )
-    resp.raise_for_status()
-    return resp.json()["access_token"]
+    """
+    Access token of the default client (cached, refreshed before expiry)
+    """
+    return default_client().access_token()
 
 
-def fetch_all_ft_offers(
-    token: str,
+def ft_search_params(
     keywords: str,
     location: str | None = None,
+    departement: str | None = None,
     contract_type: str | None = None,
+    min_creation_date: datetime | None = None,
+    max_creation_date: datetime | None = None,
+) -> dict:
+    params = {
+        "motsCles": keywords,
+        "sort": "1",
+    }
+
+    if location:
+        params["lieuTravail"] = location
+    if departement:
+        params["departement"] = departement
+    if contract_type:
+        params["typeContrat"] = contract_type
+    if min_creation_date or max_creation_date:
+        # The API wants both bounds
+        since = min_creation_date or FT_EARLIEST_CREATION_DATE
+        until = max_creation_date or datetime.now(timezone.utc)
+        params["minCreationDate"] = since.astimezone(timezone.utc).strftime(FT_DATE_FORMAT)
+        params["maxCreationDate"] = until.astimezone(timezone.utc).strftime(FT_DATE_FORMAT)
+
+    return params
+
+
+def iter_ft_pages(
+    params: dict,
     step: int = 150,
     max_results: int = 600,
-) -> list[dict]:
-    headers = {"Authorization": f"Bearer {token}"}
-    all_results = []
-    start = 0
-
-    while start < max_results:
-        params = {
-            "motsCles": keywords,
-            "range": f"{start}-{start + step - 1}",
-            "sort": "1",
-        }
-
-        if location:
-            params["lieuTravail"] = location
-        if contract_type:
-            params["typeContrat"] = contract_type
-
-        r = requests.get(FT_SEARCH_URL, headers=headers, params=params)
-        r.raise_for_status()
-
-        results = r.json().get("resultats", [])
-        if not results:
-            break
-
-        all_results.extend(results)
-
-        if len(results) < step:
-            break
+    concurrency: int = settings.FT_CONCURRENCY,
+    client: FranceTravailClient | None = None,
+    token: str | None = None,
+    start: int = 0,
+) -> Iterator[list[dict]]:
+    """
+    Yield the result pages of one search as they arrive, from offset `start`
+    """
+    return (client or default_client()).search_pages(
+        params,
+        step=step,
+        max_results=max_results,
+        concurrency=concurrency,
+        token=token,
+        start=start,
+    )
 
-        start += step
-        time.sleep(0.5)
 
-    return all_results
+def fetch_all_ft_offers(
+    token: str | None = None,
+    keywords: str = "",
+    location: str | None = None,
+    contract_type: str | None = None,
+    step: int = 150,
+    max_results: int = 600,
+    concurrency: int = settings.FT_CONCURRENCY,
+    departement: str | None = None,
+    min_creation_date: datetime | None = None,
+    spool: SpoolWriter | None = None,
+    client: FranceTravailClient | None = None,
+) -> list[dict]:
+    """
+    Fetch every offer of one search. Without an explicit `token`, the
+    client's cached OAuth token is used.
+    """
+    pages = iter_ft_pages(
+        ft_search_params(keywords, location, departement, contract_type, min_creation_date),
+        step=step,
+        max_results=max_results,
+        concurrency=concurrency,
+        client=client,
+        token=token,
+    )
+    if spool:
+        pages = spool.tee(pages, Query(keywords, departement or location, contract_type).key)
+    return [item for page in pages for item in page]
 
 
 # ==================================================
@@ -109,7 +154,10 @@ def to_date(x):
     return datetime.fromisoformat(x.replace("Z", "+00:00")).date()
 
 
-def preprocess_ft(raw_items: list[dict]) -> pd.DataFrame:
+def preprocess_ft_rows(raw_items: list[dict]) -> pd.DataFrame:
+    """
+    Reference row-by-row preprocessing (see ft_columnar for the fast path)
+    """
     rows = []
 
     for item in raw_items:
@@ -159,103 +207,390 @@ def preprocess_ft(raw_items: list[dict]) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+def preprocess_ft(raw_items: list[dict]) -> pd.DataFrame:
+    return preprocess_ft_columnar(raw_items)
+
+
 # ==================================================
 # Ingestion PostgreSQL
 # ==================================================
 
-def ingest_ft_to_postgres(
-    keywords: str,
-    location: str | None = None,
-    contract_type: str | None = None,
-    max_results: int = 600,
-):
-    token = get_ft_access_token()
-    raw_items = fetch_all_ft_offers(
-        token=token,
-        keywords=keywords,
-        location=location,
-        contract_type=contract_type,
-        max_results=max_results,
-    )
-
+def load_ft_items(
+    raw_items: list[dict],
+    loader: str = "row",
+    watermarks: dict[str, str] | None = None,
+) -> None:
+    """
+    Preprocess raw France Travail offers and write them in one transaction,
+    moving the query high-water marks ({query_key: dateCreation}) with them
+    """
     if not raw_items:
         return
 
-    df = preprocess_ft(raw_items)
+    with stage("preprocess", rows=len(raw_items)):
+        df = preprocess_ft(raw_items)
     conn = get_connection()
 
+    cache = DimensionCaches(max_size=settings.DIM_CACHE_MAX_SIZE)
+    dedup = default_index()
+
     try:
-        for _, row in df.iterrows():
-            company_name = row["company"] or "Unknown"
-            company_id = get_or_create_company(conn, company_name)
+        with stage("load", rows=len(df)):
+            cache.warm(conn)
+            links = LOADERS[loader](conn, df, cache=cache)
+        if dedup is not None:
+            with stage("dedup", rows=len(df)):
+                staged = tag_near_duplicates(conn, dedup, df["url"].tolist())
+        with stage("commit"):
+            for query_key, last_date_creation in (watermarks or {}).items():
+                set_watermark(conn, query_key, last_date_creation)
+            conn.commit()
+        if dedup is not None:
+            dedup.apply(staged)
+            save_default_index()
+        logger.info("skill links: %s", dict(links))
 
-            industry_id = get_or_create_industry(conn, row["industry"])
+    except Exception:
+        conn.rollback()
+        raise
 
-            contract_id = get_or_create_contract(conn, row["contract"])
+    finally:
+        conn.close()
+        for name, stats in cache.stats().items():
+            logger.info("dimension cache %s: %s", name, stats)
+        for name, stats in parser_cache_stats().items():
+            logger.debug("parser cache %s: %s", name, stats)
 
-            city = row["city"] if row["city"] else "Inconnue"
-            postal_code = row["postal_code"] if row["postal_code"] else "00"
 
-            location_id = get_or_create_location(
-                conn,
-                city=city,
-                postal_code=postal_code,
-                latitude=row["latitude"],
-                longitude=row["longitude"],
-            )
+def read_watermarks(query_keys: list[str]) -> dict[str, datetime | None]:
+    conn = get_connection()
+    try:
+        return {key: get_watermark(conn, key) for key in query_keys}
+    finally:
+        conn.close()
 
-            job_offer_id = get_or_create_job_offer(
-                conn,
-                {
-                    "company_id": company_id,
-                    "url": row["url"],
-                    "title": row["title"],
-                    "description": row["description"],
-                    "location_id": location_id,
-                    "contract_id": contract_id,
-                    "salary_min_annual": row["salary_min_annual"],
-                    "salary_max_annual": row["salary_max_annual"],
-                    "date_posted": row["date_posted"],
-                    "industry_id": industry_id,
-                    "experience": row["experience"],
-                    "education": row["education"],
-                },
-            )
 
-            for skill in row["skills_hard_required"]:
-                sid = get_or_create_skill(conn, skill, "hard")
-                link_job_offer_skill(conn, job_offer_id, sid, "required")
+def write_watermarks(watermarks: dict[str, str]) -> None:
+    conn = get_connection()
+    try:
+        for query_key, last_date_creation in watermarks.items():
+            set_watermark(conn, query_key, last_date_creation)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _track_watermark(pages: Iterator[list[dict]], query_key: str, marks: dict) -> Iterator[list[dict]]:
+    for page in pages:
+        last = max_date_creation(page)
+        if last and last > marks.get(query_key, ""):
+            marks[query_key] = last
+        yield page
+
 
-            for skill in row["skills_hard_optional"]:
-                sid = get_or_create_skill(conn, skill, "hard")
-                link_job_offer_skill(conn, job_offer_id, sid, "optional")
-            for skill in row["skills_soft"]:
-                sid = get_or_create_skill(conn, skill, "soft")
-                link_job_offer_skill(conn, job_offer_id, sid, "required")
+def _log_client_metrics(client: FranceTravailClient) -> None:
+    metrics = client.metrics()
+    record_http(metrics)
+    for endpoint, endpoint_metrics in metrics.items():
+        logger.info("france travail %s: %s", endpoint, endpoint_metrics)
 
-            for lang in row["languages_required"]:
-                sid = get_or_create_skill(conn, lang, "language")
-                link_job_offer_skill(conn, job_offer_id, sid, "required")
 
-            for lang in row["languages_optional"]:
-                sid = get_or_create_skill(conn, lang, "language")
-                link_job_offer_skill(conn, job_offer_id, sid, "optional")
+def ingest_ft_stream(
+    queries: list[Query],
+    max_results: int = 600,
+    loader: str = "batch",
+    incremental: bool = False,
+    spool_dir: str | None = settings.SPOOL_DIR,
+    client: FranceTravailClient | None = None,
+) -> dict:
+    """
+    Stream the pages of every query through preprocessing and loading,
+    committing fixed-size chunks as they arrive (bounded memory).
+    Queries run one after another; offers are deduped by id across them.
+    """
+    since = read_watermarks([q.key for q in queries]) if incremental else {}
+
+    client = client or default_client()
+    marks = {}
+    spool = SpoolWriter(spool_dir) if spool_dir else None
+
+    def query_pages(q: Query) -> Iterator[list[dict]]:
+        pages = iter_ft_pages(
+            ft_search_params(
+                q.keywords,
+                departement=q.departement,
+                contract_type=q.contract_type,
+                min_creation_date=since.get(q.key),
+            ),
+            max_results=max_results,
+            client=client,
+        )
+        if spool:
+            pages = spool.tee(pages, q.key)
+        return _track_watermark(pages, q.key, marks)
+
+    pages = dedupe_by_id(itertools.chain.from_iterable(query_pages(q) for q in queries))
+
+    with spool or contextlib.nullcontext():
+        try:
+            stats = run_pipeline(pages, preprocess_ft, loader=loader, dedup=default_index())
+        finally:
+            save_default_index()
+    _log_client_metrics(client)
+    # Only once every page is in: sort=1 returns newest offers first
+    write_watermarks(marks)
+    return stats
+
+
+def _open_run(
+    query_key: str,
+    search_params,
+    max_results: int,
+    incremental: bool,
+    resume: bool,
+) -> dict:
+    """
+    Resume the latest unfinished run of the query, or start a new one
+    """
+    conn = get_connection()
+    try:
+        run = get_resumable_run(conn, query_key) if resume else None
+        if run:
+            logger.info("resuming run %d of %s from offset %d", run["id"], query_key, run["next_offset"])
+        else:
+            since = get_watermark(conn, query_key) if incremental else None
+            # The date window is fixed at the start, incremental or not: a
+            # resumed run replays the same search, offers published since
+            # are left to the next run
+            until = datetime.now(timezone.utc)
+            params = {"search": search_params(since, until), "max_results": max_results}
+            run = {"id": create_ingest_run(conn, query_key, params), "params": params, "next_offset": 0}
         conn.commit()
+        return run
+    finally:
+        conn.close()
 
-    except Exception:
-        conn.rollback()
-        raise
 
+def _close_run(run_id: int, query_key: str, error: str | None = None) -> None:
+    """
+    Mark the run failed, or completed and move the query watermark with it
+    """
+    conn = get_connection()
+    try:
+        last = finish_ingest_run(conn, run_id, "failed" if error else "completed", error)
+        if last and not error:
+            set_watermark(conn, query_key, last)
+        conn.commit()
     finally:
         conn.close()
 
 
+def ingest_ft_to_postgres(
+    keywords: str,
+    location: str | None = None,
+    contract_type: str | None = None,
+    max_results: int = 600,
+    loader: str = "row",
+    incremental: bool = False,
+    spool_dir: str | None = settings.SPOOL_DIR,
+    departement: str | None = None,
+    client: FranceTravailClient | None = None,
+    resume: bool = False,
+    step: int = 150,
+    chunk_size: int = settings.PIPELINE_CHUNK_SIZE,
+) -> dict:
+    """
+    Load one search in committed chunks, checkpointed in the ingest_run
+    ledger. With `resume`, an interrupted run of the same query continues
+    from its last checkpoint (rewound to a page boundary), with the search
+    parameters it started with; offers loaded twice are upserted by URL,
+    so the result is the same as an uninterrupted run. The query
+    watermark only moves once the run completes.
+    """
+    query_key = Query(keywords, departement or location, contract_type).key
+    client = client or default_client()
+
+    run = _open_run(
+        query_key,
+        lambda since, until: ft_search_params(keywords, location, departement, contract_type, since, until),
+        max_results,
+        incremental,
+        resume,
+    )
+    start = run["next_offset"] - run["next_offset"] % step
+    offset = start
+
+    def checkpoint(conn, chunk: list[dict]) -> None:
+        nonlocal offset
+        offset += len(chunk)
+        checkpoint_ingest_run(conn, run["id"], offset, max_date_creation(chunk))
+
+    pages = iter_ft_pages(
+        run["params"]["search"],
+        step=step,
+        max_results=run["params"]["max_results"],
+        client=client,
+        start=start,
+    )
+
+    try:
+        with SpoolWriter(spool_dir) if spool_dir else contextlib.nullcontext() as spool:
+            if spool:
+                pages = spool.tee(pages, query_key)
+            stats = run_pipeline(
+                pages,
+                preprocess_ft,
+                loader=loader,
+                chunk_size=chunk_size,
+                on_commit=checkpoint,
+                dedup=default_index(),
+            )
+    except BaseException as e:
+        try:
+            _close_run(run["id"], query_key, error=repr(e))
+        except Exception:
+            # e.g. the database is down: keep raising the original error,
+            # the run stays "running" and is still resumable
+            logger.exception("could not mark run %d as failed", run["id"])
+        raise
+    finally:
+        # Only committed chunks were applied to the index
+        save_default_index()
+        _log_client_metrics(client)
+
+    _close_run(run["id"], query_key)
+    return {"run_id": run["id"], "start_offset": start, **stats}
+
+
+def ingest_ft_fanout(
+    queries: list[Query],
+    max_results: int = 600,
+    loader: str = "row",
+    concurrency: int = settings.FT_QUERY_CONCURRENCY,
+    incremental: bool = False,
+    spool_dir: str | None = settings.SPOOL_DIR,
+    client: FranceTravailClient | None = None,
+) -> list[dict]:
+    """
+    Run every query of the matrix, dedupe offers by id, load them once.
+    Return the per-query stats.
+    """
+    since = read_watermarks([q.key for q in queries]) if incremental else {}
+
+    # One client for the whole run: the API quota is per client, not per query
+    client = client or default_client()
+
+    with SpoolWriter(spool_dir) if spool_dir else contextlib.nullcontext() as spool, stage("fetch") as fetch:
+        raw_items, stats = fetch_fanout(
+            queries,
+            lambda q: fetch_all_ft_offers(
+                keywords=q.keywords,
+                departement=q.departement,
+                contract_type=q.contract_type,
+                max_results=max_results,
+                client=client,
+                min_creation_date=since.get(q.key),
+                spool=spool,
+            ),
+            concurrency=concurrency,
+        )
+        fetch.rows = len(raw_items)
+
+    _log_client_metrics(client)
+    for s in stats:
+        logger.info("query %s: %s", s["query"], s)
+    fetched = sum(s["fetched"] for s in stats)
+    logger.info(
+        "fan-out: %d queries, %d offers fetched, %d unique, %d duplicates removed",
+        len(queries), fetched, len(raw_items), fetched - len(raw_items),
+    )
+
+    watermarks = {s["query"]: s["max_date_creation"] for s in stats if s["max_date_creation"]}
+    load_ft_items(raw_items, loader=loader, watermarks=watermarks)
+    return stats
+
+
 # ==================================================
 # CLI
 # ==================================================
 
 if __name__ == "__main__":
-    ingest_ft_to_postgres(
-        keywords="data analyst",
-        max_results=settings.FT_MAX_RESULTS,
+    parser = argparse.ArgumentParser(description="France Travail → PostgreSQL ingestion")
+    parser.add_argument("--keywords", default="data analyst")
+    parser.add_argument("--max-results", type=int, default=settings.FT_MAX_RESULTS)
+    parser.add_argument(
+        "--loader",
+        choices=sorted(LOADERS),
+        default="row",
+        help=(
+            "row: get_or_create per offer, batch: multi-row upserts, copy: COPY staging + merge, "
+            "parallel: batch upserts sharded over LOAD_WORKERS connections"
+        ),
+    )
+    parser.add_argument("--queries", help="JSON query matrix (fan-out mode)")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="load pages in committed chunks while fetching (bounded memory)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only fetch offers created since the last run of each query",
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=settings.SPOOL_DIR,
+        help="also append every raw API page to this spool (see replay.py)",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last interrupted run of the query from its checkpoint (single query mode)",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        default=settings.METRICS_JSON_PATH,
+        help="write the run summary (stages, HTTP, SQL, rows) to this JSON file",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        default=settings.METRICS_PROM_PATH,
+        help="write the run metrics in Prometheus text format (textfile collector .prom file)",
+    )
+    args = parser.parse_args()
+    if args.resume and (args.stream or args.queries):
+        parser.error("--resume only applies to a single query")
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    mode = "stream" if args.stream else "fanout" if args.queries else "single"
+    with instrumentation.run(mode, json_path=args.metrics_json, prom_path=args.metrics_prom) as metrics:
+        ensure_before_ingest()
+        if args.stream:
+            ingest_ft_stream(
+                load_query_matrix(args.queries) if args.queries else [Query(args.keywords)],
+                max_results=args.max_results,
+                loader=args.loader,
+                incremental=args.incremental,
+                spool_dir=args.spool_dir,
+            )
+        elif args.queries:
+            ingest_ft_fanout(
+                load_query_matrix(args.queries),
+                max_results=args.max_results,
+                loader=args.loader,
+                incremental=args.incremental,
+                spool_dir=args.spool_dir,
+            )
+        else:
+            ingest_ft_to_postgres(
+                keywords=args.keywords,
+                max_results=args.max_results,
+                loader=args.loader,
+                incremental=args.incremental,
+                spool_dir=args.spool_dir,
+                resume=args.resume,
+            )
+        refresh_after_ingest()
+    logger.info("run summary: %s", json.dumps(metrics.summary(), default=str))
@@ -0,0 +1,267 @@
+"""
+Per-stage instrumentation of an ingestion run.
+
+One `RunMetrics` is active per run (`with run(name):`); the fetch / preprocess /
+load code records into it through the module-level helpers, which do
+nothing when no run is active:
+- `stage(name)`: wall time, call count and rows of a stage,
+- `record_http(metrics)`: France Travail calls / bytes / latency per endpoint,
+- `record_rows(table, counts)`: rows inserted / updated / unchanged per table,
+- SQL statements by command tag (SELECT, INSERT, ...), counted by
+  `InstrumentedCursor`, the default cursor of `db.get_connection`.
+
+At the end of the run the summary is written as JSON and in the Prometheus
+text exposition format, for the node_exporter textfile collector.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from psycopg2.extensions import cursor as _cursor
+
+
+class RunMetrics:
+    """
+    Thread-safe counters of one run (the fetch and parallel loaders use threads)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self.status = "running"
+        self._t0 = time.perf_counter()
+        self._seconds = None  # frozen when the run ends
+        self._lock = threading.Lock()
+        self.stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0, "rows": 0})
+        self.sql = defaultdict(lambda: {"statements": 0, "seconds": 0.0, "rows": 0})
+        self.rows = defaultdict(Counter)
+        self.http = {}
+
+    # ---------- recording ----------
+    def add_stage(self, name: str, seconds: float, rows: int = 0) -> None:
+        with self._lock:
+            s = self.stages[name]
+            s["seconds"] += seconds
+            s["calls"] += 1
+            s["rows"] += rows
+
+    def add_sql(self, command: str, seconds: float, rows: int) -> None:
+        with self._lock:
+            s = self.sql[command]
+            s["statements"] += 1
+            s["seconds"] += seconds
+            s["rows"] += max(rows, 0)
+
+    def add_rows(self, table: str, counts: dict[str, int]) -> None:
+        with self._lock:
+            self.rows[table].update(counts)
+
+    def set_http(self, metrics: dict[str, dict]) -> None:
+        # Client metrics are cumulative: the latest snapshot wins
+        with self._lock:
+            self.http = dict(metrics)
+
+    def elapsed(self) -> float:
+        return self._seconds if self._seconds is not None else time.perf_counter() - self._t0
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self._seconds = time.perf_counter() - self._t0
+
+    # ---------- export ----------
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "run": self.name,
+                "status": self.status,
+                "started_at": self.started_at.isoformat(),
+                "seconds": round(self.elapsed(), 3),
+                "stages": {
+                    name: {
+                        **s,
+                        "seconds": round(s["seconds"], 3),
+                        "rows_per_sec": round(s["rows"] / s["seconds"], 1) if s["seconds"] else None,
+                    }
+                    for name, s in self.stages.items()
+                },
+                "http": self.http,
+                "sql": {
+                    command: {**s, "seconds": round(s["seconds"], 3)}
+                    for command, s in sorted(self.sql.items())
+                },
+                "rows": {table: dict(c) for table, c in sorted(self.rows.items())},
+            }
+
+    def prometheus(self, prefix: str = "ingest") -> str:
+        summary = self.summary()
+        run = _label(summary["run"])
+        lines = []
+
+        def metric(name: str, kind: str, help_: str, samples: list[tuple[dict, float]]) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                labels = {"run": run, **labels}
+                text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{text}}} {value}")
+
+        metric("last_run_timestamp_seconds", "gauge", "Start of the last run.",
+               [({}, self.started_at.timestamp())])
+        metric("last_run_success", "gauge", "1 if the last run completed.",
+               [({}, int(summary["status"] == "success"))])
+        metric("run_duration_seconds", "gauge", "Wall time of the last run.",
+               [({}, summary["seconds"])])
+        metric("stage_duration_seconds", "gauge", "Wall time spent in each stage.",
+               [({"stage": n}, s["seconds"]) for n, s in summary["stages"].items()])
+        metric("stage_rows", "gauge", "Rows handled by each stage.",
+               [({"stage": n}, s["rows"]) for n, s in summary["stages"].items()])
+        metric("http_requests", "gauge", "France Travail calls per endpoint.",
+               [({"endpoint": e}, m["calls"]) for e, m in summary["http"].items()])
+        metric("http_errors", "gauge", "France Travail failed calls per endpoint.",
+               [({"endpoint": e}, m["errors"]) for e, m in summary["http"].items()])
+        metric("http_response_bytes", "gauge", "France Travail response bytes per endpoint.",
+               [({"endpoint": e}, m["bytes"]) for e, m in summary["http"].items()])
+        metric("sql_statements", "gauge", "SQL statements per command tag.",
+               [({"command": c}, s["statements"]) for c, s in summary["sql"].items()])
+        metric("sql_duration_seconds", "gauge", "Time spent in SQL statements per command tag.",
+               [({"command": c}, s["seconds"]) for c, s in summary["sql"].items()])
+        metric("rows", "gauge", "Rows written per table and outcome.",
+               [({"table": t, "outcome": o}, n) for t, c in summary["rows"].items() for o, n in sorted(c.items())])
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path: str | None = None, prom_path: str | None = None) -> None:
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.summary(), indent=2, ensure_ascii=False, default=str) + "\n")
+        if prom_path:
+            _write_atomic(prom_path, self.prometheus())
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, text: str) -> None:
+    # The textfile collector may read at any time: never expose a partial file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# ==================================================
+# Active run
+# ==================================================
+
+_current: RunMetrics | None = None
+
+
+def current() -> RunMetrics | None:
+    return _current
+
+
+@contextmanager
+def run(name: str, json_path: str | None = None, prom_path: str | None = None):
+    """
+    Make a new RunMetrics the active one; export it on exit, failed or not
+    """
+    global _current
+    previous, _current = _current, RunMetrics(name)
+    metrics = _current
+    try:
+        yield metrics
+        metrics.finish("success")
+    except BaseException:
+        metrics.finish("failed")
+        raise
+    finally:
+        _current = previous
+        metrics.export(json_path, prom_path)
+
+
+class _Stage:
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def stage(name: str, rows: int = 0):
+    """
+    Time a block as one call of stage `name`; the yielded object's `rows`
+    can be set inside the block when the count is known only at the end
+    """
+    s = _Stage()
+    s.rows = rows
+    t0 = time.perf_counter()
+    try:
+        yield s
+    finally:
+        if _current is not None:
+            _current.add_stage(name, time.perf_counter() - t0, s.rows)
+
+
+def timed_iter(name: str, iterable):
+    """
+    Yield from `iterable`, charging the time spent waiting for each item
+    (and its length) to stage `name`
+    """
+    it = iter(iterable)
+    while True:
+        with stage(name) as s:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            s.rows = len(item)
+        yield item
+
+
+def record_http(metrics: dict[str, dict]) -> None:
+    if _current is not None:
+        _current.set_http(metrics)
+
+
+def record_rows(table: str, **counts: int) -> None:
+    if _current is not None:
+        _current.add_rows(table, counts)
+
+
+# ==================================================
+# SQL statements
+# ==================================================
+
+class InstrumentedCursor(_cursor):
+    """
+    Cursor recording each statement's command tag (as reported by the
+    server: a WITH ... INSERT ... SELECT counts as SELECT), duration and
+    row count into the active run
+    """
+
+    def _record(self, t0: float, command: str | None = None) -> None:
+        if _current is None:
+            return
+        command = command or (self.statusmessage or "").split(" ", 1)[0] or "OTHER"
+        _current.add_sql(command, time.perf_counter() - t0, self.rowcount)
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        result = super().execute(query, vars)
+        self._record(t0)
+        return result
+
+    def executemany(self, query, vars_list):
+        t0 = time.perf_counter()
+        result = super().executemany(query, vars_list)
+        self._record(t0)
+        return result
+
+    def copy_expert(self, sql, file, size=8192):
+        t0 = time.perf_counter()
+        result = super().copy_expert(sql, file, size)
+        self._record(t0, "COPY")
+        return result
@@ -0,0 +1,64 @@
+"""
+Diff-based synchronization of job_offer_skill.
+
+For a batch of offers, the stored links are read in one query and compared
+in memory with the links the offers should have; only the differences are
+written (bulk insert, delete and requirement_level update). Skills removed
+from an offer are unlinked.
+"""
+from collections import Counter
+
+from bulk_repositories import (
+    delete_job_offer_skills,
+    fetch_job_offer_skills,
+    link_job_offer_skills,
+    update_job_offer_skill_levels,
+)
+from instrumentation import record_rows
+
+LinkKey = tuple[int, int]  # (job_offer_id, skill_id)
+
+
+def diff_links(
+    existing: dict[LinkKey, str],
+    desired: dict[LinkKey, str],
+) -> tuple[list[tuple[int, int, str]], list[LinkKey], list[tuple[int, int, str]]]:
+    """
+    Return (inserts, deletes, level updates)
+    """
+    inserts = [(*key, level) for key, level in desired.items() if key not in existing]
+    deletes = [key for key in existing if key not in desired]
+    updates = [
+        (*key, level)
+        for key, level in desired.items()
+        if key in existing and existing[key] != level
+    ]
+    return inserts, deletes, updates
+
+
+def sync_job_offer_skills(conn, desired: dict[int, dict[int, str]]) -> Counter:
+    """
+    desired: {job_offer_id: {skill_id: requirement_level}}, the complete
+    link set of every offer given (an empty dict unlinks everything).
+    Return the number of links inserted / deleted / updated / unchanged.
+    """
+    existing = fetch_job_offer_skills(conn, list(desired))
+    wanted = {
+        (job_offer_id, skill_id): level
+        for job_offer_id, skills in desired.items()
+        for skill_id, level in skills.items()
+    }
+
+    inserts, deletes, updates = diff_links(existing, wanted)
+    link_job_offer_skills(conn, inserts)
+    delete_job_offer_skills(conn, deletes)
+    update_job_offer_skill_levels(conn, updates)
+
+    counts = Counter(
+        inserted=len(inserts),
+        deleted=len(deletes),
+        updated=len(updates),
+        unchanged=len(wanted) - len(inserts) - len(updates),
+    )
+    record_rows("job_offer_skill", **counts)
+    return counts
@@ -0,0 +1,323 @@
+import logging
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from config import settings
+from db import get_connection, pool_capacity
+
+from offers import normalize_offer
+
+from repositories import (
+    get_or_create_company,
+    get_or_create_job_offer,
+    get_or_create_skill,
+    get_or_create_location,
+    get_or_create_industry,
+    get_or_create_contract,
+)
+
+from bulk_repositories import (
+    upsert_companies,
+    upsert_industries,
+    upsert_contracts,
+    upsert_locations,
+    upsert_skills,
+    upsert_job_offers,
+)
+
+from copy_loader import load_offers_copy
+from link_sync import sync_job_offer_skills
+
+logger = logging.getLogger(__name__)
+
+# Number of offers written per multi-row statement in batch mode
+BATCH_SIZE = 1000
+
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def _get_or_create(cache, dimension: str, key, create):
+    if not key:
+        return None
+    if cache is None:
+        return create()
+    return cache[dimension].get_or_create(key, create)
+
+
+def _resolve(cache, dimension: str, keys: set, create_many) -> dict:
+    if cache is None:
+        return create_many(keys)
+    return cache[dimension].resolve(keys, create_many)
+
+
+def _skill_links(offer: dict, skill_id) -> dict[int, str]:
+    """
+    {skill_id: requirement_level} of one offer; the first level seen wins
+    """
+    links = {}
+    for name, category, level in offer["skills"]:
+        links.setdefault(skill_id(name, category), level)
+    return links
+
+
+# ==================================================
+# Row-by-row loader
+# ==================================================
+
+def load_offers(conn, df: pd.DataFrame, cache=None) -> Counter:
+    """
+    Write offers one at a time through the `get_or_create_*` helpers,
+    behind the run's dimension cache when one is given; links are synced
+    once for the whole DataFrame. Return the link changes.
+    """
+    desired = {}
+    for record in df.to_dict("records"):
+        offer = normalize_offer(record)
+
+        company_id = _get_or_create(
+            cache, "company", offer["company"],
+            lambda: get_or_create_company(conn, offer["company"]),
+        )
+        industry_id = _get_or_create(
+            cache, "industry", offer["industry"],
+            lambda: get_or_create_industry(conn, offer["industry"]),
+        )
+        contract_id = _get_or_create(
+            cache, "contract", offer["contract"],
+            lambda: get_or_create_contract(conn, offer["contract"]),
+        )
+        location_id = _get_or_create(
+            cache, "location", (offer["city"], offer["postal_code"]),
+            lambda: get_or_create_location(
+                conn,
+                city=offer["city"],
+                postal_code=offer["postal_code"],
+                latitude=offer["latitude"],
+                longitude=offer["longitude"],
+            ),
+        )
+
+        job_offer_id, changed = get_or_create_job_offer(
+            conn,
+            {
+                "company_id": company_id,
+                "url": offer["url"],
+                "title": offer["title"],
+                "description": offer["description"],
+                "location_id": location_id,
+                "contract_id": contract_id,
+                "salary_min_annual": offer["salary_min_annual"],
+                "salary_max_annual": offer["salary_max_annual"],
+                "date_posted": offer["date_posted"],
+                "industry_id": industry_id,
+                "experience": offer["experience"],
+                "education": offer["education"],
+                "content_hash": offer["content_hash"],
+            },
+        )
+
+        # Same content as stored: no UPDATE, no re-linking
+        if not changed:
+            continue
+
+        # Last version of the offer wins
+        desired[job_offer_id] = _skill_links(
+            offer,
+            lambda name, category: _get_or_create(
+                cache, "skill", (name, category),
+                lambda: get_or_create_skill(conn, name, category),
+            ),
+        )
+
+    return sync_job_offer_skills(conn, desired)
+
+
+# ==================================================
+# Batch loader
+# ==================================================
+
+def load_offers_batch(
+    conn,
+    df: pd.DataFrame,
+    cache=None,
+    batch_size: int = BATCH_SIZE,
+) -> Counter:
+    """
+    Write offers chunk by chunk with one multi-row statement per table;
+    dimension values already in the cache are not sent to the database.
+    Return the link changes.
+    """
+    links = Counter()
+    records = df.to_dict("records")
+    for start in range(0, len(records), batch_size):
+        chunk = [normalize_offer(r) for r in records[start:start + batch_size]]
+        links.update(_load_chunk(conn, chunk, cache))
+    return links
+
+
+def _load_chunk(conn, offers: list[dict], cache=None) -> Counter:
+    return _write_offers(conn, offers, resolve_dimensions(conn, offers, cache))
+
+
+def resolve_dimensions(conn, offers: list[dict], cache=None) -> dict[str, dict]:
+    """
+    Upsert every dimension value the offers reference; return
+    {dimension: {key: id}}
+    """
+    coords = {(o["city"], o["postal_code"]): (o["latitude"], o["longitude"]) for o in offers}
+
+    return {
+        "company": _resolve(
+            cache, "company", {o["company"] for o in offers},
+            lambda keys: upsert_companies(conn, keys),
+        ),
+        "industry": _resolve(
+            cache, "industry", {o["industry"] for o in offers if o["industry"]},
+            lambda keys: upsert_industries(conn, keys),
+        ),
+        "contract": _resolve(
+            cache, "contract", {o["contract"] for o in offers if o["contract"]},
+            lambda keys: upsert_contracts(conn, keys),
+        ),
+        "location": _resolve(
+            cache, "location", set(coords),
+            lambda keys: upsert_locations(conn, {k: coords[k] for k in keys}),
+        ),
+        "skill": _resolve(
+            cache, "skill", {(name, category) for o in offers for name, category, _ in o["skills"]},
+            lambda keys: upsert_skills(conn, keys),
+        ),
+    }
+
+
+def _write_offers(conn, offers: list[dict], ids: dict[str, dict]) -> Counter:
+    """
+    Upsert the offers and sync their links; dimensions are already resolved
+    """
+    # Same URL twice in a chunk: the last occurrence wins, as in the row loader
+    latest = {o["url"]: o for o in offers}
+    by_url = {}
+    for o in latest.values():
+        by_url[o["url"]] = {
+            "title": o["title"],
+            "description": o["description"],
+            "salary_min_annual": o["salary_min_annual"],
+            "salary_max_annual": o["salary_max_annual"],
+            "experience": o["experience"],
+            "education": o["education"],
+            "date_posted": o["date_posted"],
+            "url": o["url"],
+            "company_id": ids["company"][o["company"]],
+            "contract_id": ids["contract"].get(o["contract"]),
+            "industry_id": ids["industry"].get(o["industry"]),
+            "location_id": ids["location"][(o["city"], o["postal_code"])],
+            "content_hash": o["content_hash"],
+        }
+    offer_ids = upsert_job_offers(conn, list(by_url.values()))
+
+    # Unchanged offers are not returned: nothing to re-link for them
+    skill_ids = ids["skill"]
+    desired = {
+        job_offer_id: _skill_links(latest[url], lambda name, category: skill_ids[(name, category)])
+        for url, job_offer_id in offer_ids.items()
+    }
+    return sync_job_offer_skills(conn, desired)
+
+
+# ==================================================
+# Parallel loader
+#
+# 1. The calling connection (coordinator) upserts every dimension value
+#    of the DataFrame, in key order, and commits. Workers never write to
+#    company / industry / contract / location / skill, so they cannot
+#    deadlock on those unique keys.
+# 2. Offers are sharded by a stable hash of their URL: an offer and its
+#    job_offer_skill rows always belong to one shard, so workers never
+#    touch the same rows.
+# 3. Each worker thread writes its shard on its own connection, in
+#    batches, committing after each one (short transactions, short locks).
+# ==================================================
+
+def shard_of(url: str, shards: int) -> int:
+    # crc32, not hash(): stable across processes and runs
+    return zlib.crc32(url.encode("utf-8")) % shards
+
+
+def _load_shard(shard: int, offers: list[dict], ids: dict[str, dict], batch_size: int) -> Counter:
+    links = Counter()
+    conn = get_connection()
+    try:
+        for start in range(0, len(offers), batch_size):
+            links.update(_write_offers(conn, offers[start:start + batch_size], ids))
+            conn.commit()
+        logger.debug("shard %d: %d offers committed", shard, len(offers))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return links
+
+
+def load_offers_parallel(
+    conn,
+    df: pd.DataFrame,
+    cache=None,
+    workers: int = settings.LOAD_WORKERS,
+    batch_size: int = settings.LOAD_BATCH_SIZE,
+) -> Counter:
+    """
+    Load `df` over `workers` connections. Unlike the other loaders this
+    one commits: `conn` right after the dimensions, then every shard batch.
+    A failing shard batch is rolled back and re-raised once every worker
+    has stopped; batches committed before it are kept. Needs `workers` + 1
+    pooled connections (the coordinator's and one per shard).
+    """
+    capacity = pool_capacity()
+    if capacity is not None and max(workers, 1) + 1 > capacity:
+        raise ValueError(
+            f"{workers} workers need {max(workers, 1) + 1} connections, "
+            f"the pool has {capacity} (DB_POOL_SIZE)"
+        )
+
+    offers = [normalize_offer(r) for r in df.to_dict("records")]
+    if not offers:
+        return Counter()
+
+    ids = resolve_dimensions(conn, offers, cache)
+    conn.commit()
+
+    shards = [[] for _ in range(max(workers, 1))]
+    for o in offers:
+        shards[shard_of(o["url"], len(shards))].append(o)
+
+    links = Counter()
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="load-shard") as pool:
+        futures = [
+            pool.submit(_load_shard, i, shard, ids, batch_size)
+            for i, shard in enumerate(shards)
+            if shard
+        ]
+        for future in futures:
+            try:
+                links.update(future.result())
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        raise errors[0]
+    return links
+
+
+LOADERS = {
+    "row": load_offers,
+    "batch": load_offers_batch,
+    "copy": load_offers_copy,
+    "parallel": load_offers_parallel,
+}
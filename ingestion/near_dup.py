@@ -0,0 +1,540 @@
+"""
+Near-duplicate offer detection (MinHash + LSH).
+
+The same job is often posted several times under different URLs (agency
+reposts, `francetravail:{id}` vs `urlOrigine`). Each offer's title +
+description is shingled into word 3-grams and summarized by a MinHash
+signature; an LSH index over signature bands returns, in sublinear time,
+the previously seen offers that may be near-duplicates, and the estimated
+Jaccard similarity decides. Every offer is tagged with the id of the first
+offer of its cluster (`job_offer.canonical_offer_id`, its own id if none).
+
+The index only holds canonical offers and is persisted between runs
+(numpy .npz). Updates from a batch are staged and only applied once the
+batch's transaction committed, so the index never references rolled back
+offers. Runs overlapping in time merge their additions into the file
+under an exclusive lock (`save_merged`) instead of overwriting each other. Memory: one row of `num_perm` uint32 per canonical offer plus one
+(uint64 key, int32 row) pair per band: about 230 MB for 500k offers with
+the defaults (the .npz is the same size), up to twice that while the
+band tables are merged.
+
+Usage (from ingestion/):
+    python near_dup.py --backfill     # tag every untagged offer, save the index
+    python near_dup.py --rebuild      # rebuild the index from the tagged offers
+"""
+import argparse
+import contextlib
+import fcntl
+import logging
+import os
+import re
+import zlib
+from itertools import chain
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_SHIFT = np.uint64(32)
+_MAX_HASH = np.uint32(2**32 - 1)
+_SHINGLE_MULT = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+
+# ==================================================
+# Shingles and signatures
+# ==================================================
+
+_TOKEN_HASHES: dict[str, int] = {}
+
+
+def _token_hashes(text: str) -> list[int]:
+    # crc32, not hash(): signatures must be stable across processes
+    cache = _TOKEN_HASHES
+    tokens = _TOKEN_RE.findall(text.lower())
+    hashes = list(map(cache.get, tokens))
+    if None in hashes:
+        if len(cache) > 1_000_000:
+            cache.clear()
+        for i, h in enumerate(hashes):
+            if h is None:
+                hashes[i] = cache[tokens[i]] = zlib.crc32(tokens[i].encode("utf-8"))
+    return hashes
+
+
+def shingle_batch(texts: list[str | None], k: int = 3) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Hashed word k-grams of every text, concatenated (uint32, repeats kept:
+    they do not change a MinHash), and the number of shingles of each text.
+    A text shorter than `k` words is shingled by word.
+    """
+    token_lists = [_token_hashes(t or "") for t in texts]
+    counts = np.array([len(t) for t in token_lists], dtype=np.int64)
+    tokens = np.fromiter(chain.from_iterable(token_lists), dtype=np.uint64, count=int(counts.sum()))
+
+    # k-gram starting at every token (those running past their text are dropped)
+    h = tokens.copy()
+    for i in range(1, k):
+        following = np.zeros(len(tokens), dtype=np.uint64)
+        following[: len(tokens) - i] = tokens[i:]
+        h = h * _SHINGLE_MULT[i % 2] + following
+
+    text_len = np.repeat(counts, counts)
+    position = np.arange(len(tokens)) - np.repeat(np.cumsum(counts) - counts, counts)
+    short = text_len < k
+    keep = short | (position <= text_len - k)
+    values = np.where(short, tokens, h)[keep]
+    lengths = np.where(counts < k, counts, counts - k + 1)
+    return (values ^ (values >> _SHIFT)).astype(np.uint32), lengths
+
+
+class MinHasher:
+    """
+    `num_perm` multiply-shift hash functions ((a*x + b) mod 2**64) >> 32
+    over 32-bit shingles (no modulo: the multiply wraps)
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, shingles: np.ndarray, lengths: np.ndarray, block: int = 100) -> np.ndarray:
+        """
+        (n, num_perm) uint32 signatures of the texts of `shingle_batch`;
+        a text without shingles gets the all-max signature
+        """
+        sigs = np.full((len(lengths), self.num_perm), _MAX_HASH, dtype=np.uint32)
+        rows = np.flatnonzero(lengths)
+        starts = (np.cumsum(lengths) - lengths)[rows]
+        a, b = self.a[:, None], self.b[:, None]
+
+        # A few texts at a time: the (num_perm, shingles) block stays in cache
+        for i in range(0, len(rows), block):
+            lo = starts[i]
+            hi = starts[i + block] if i + block < len(rows) else len(shingles)
+            hashed = a * shingles[lo:hi].astype(np.uint64)
+            hashed += b
+            hashed >>= _SHIFT
+            sigs[rows[i:i + block]] = np.minimum.reduceat(hashed, starts[i:i + block] - lo, axis=1).T
+        return sigs
+
+
+def offer_text(title: str | None, description: str | None) -> str:
+    return f"{title or ''} {description or ''}"
+
+
+# ==================================================
+# LSH index
+# ==================================================
+
+class NearDuplicateIndex:
+    """
+    Signatures of the canonical offers, and per band a sorted array of
+    band keys (+ a small unsorted tail, merged when it grows)
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        threshold: float = settings.DEDUP_THRESHOLD,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+
+        self._band_mult = np.random.default_rng(seed + 1).integers(
+            1, 2**63, size=self.rows_per_band, dtype=np.uint64
+        ) | np.uint64(1)
+
+        self._sigs = np.empty((0, num_perm), dtype=np.uint32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._row_of: dict[int, int] = {}
+        # per band: sorted keys / their rows, then the unsorted tail
+        self._keys = [np.empty(0, dtype=np.uint64) for _ in range(bands)]
+        self._key_rows = [np.empty(0, dtype=np.int32) for _ in range(bands)]
+        self._tail: list[dict[int, list[int]]] = [{} for _ in range(bands)]
+        self._tail_size = 0
+        # Applied since the index was loaded / last saved, and the file
+        # version it was loaded from / saved as (see save_merged)
+        self._unsaved: list[StagedOffers] = []
+        self._file_id: tuple | None = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ---------- keys ----------
+    def band_keys(self, sigs: np.ndarray) -> np.ndarray:
+        """
+        (n, bands) uint64 hash of each band of each signature
+        """
+        banded = sigs.reshape(len(sigs), self.bands, self.rows_per_band).astype(np.uint64)
+        return (banded * self._band_mult).sum(axis=2, dtype=np.uint64)
+
+    def _candidates(self, keys: np.ndarray) -> list[set[int]]:
+        """
+        Index rows sharing at least one band with each signature
+        """
+        found = [set() for _ in range(len(keys))]
+        for band in range(self.bands):
+            sorted_keys, key_rows = self._keys[band], self._key_rows[band]
+            lo = np.searchsorted(sorted_keys, keys[:, band], side="left")
+            hi = np.searchsorted(sorted_keys, keys[:, band], side="right")
+            for i in np.flatnonzero(hi > lo):
+                found[i].update(key_rows[lo[i]:hi[i]].tolist())
+            tail = self._tail[band]
+            if tail:
+                for i, key in enumerate(keys[:, band].tolist()):
+                    found[i].update(tail.get(key, ()))
+        return found
+
+    # ---------- query / update ----------
+    def assign(self, offer_ids: list[int], texts: list[str]) -> tuple[list[int], "StagedOffers"]:
+        """
+        Canonical id of every offer, in order (an offer may be the
+        near-duplicate of an earlier one of the same batch). Nothing is
+        added to the index until `apply(staged)`.
+        """
+        sigs = self.hasher.signatures(*shingle_batch(texts))
+        keys = self.band_keys(sigs)
+        candidates = self._candidates(keys)
+        empty = (sigs == _MAX_HASH).all(axis=1)
+
+        canonical = []
+        staged = StagedOffers()
+        batch_buckets: list[dict[int, list[int]]] = [{} for _ in range(self.bands)]
+
+        for i, offer_id in enumerate(offer_ids):
+            row = self._row_of.get(offer_id)
+            if row is not None or empty[i]:
+                # Already canonical (re-ingested), or nothing to compare
+                canonical.append(offer_id)
+                continue
+
+            best, best_sim = offer_id, self.threshold
+            for r in candidates[i]:
+                sim = float(np.mean(self._sigs[r] == sigs[i]))
+                if sim >= best_sim:
+                    best, best_sim = int(self._ids[r]), sim
+            for band in range(self.bands):
+                for j in batch_buckets[band].get(int(keys[i, band]), ()):
+                    sim = float(np.mean(sigs[j] == sigs[i]))
+                    if sim >= best_sim:
+                        best, best_sim = offer_ids[j], sim
+
+            canonical.append(best)
+            if best == offer_id:
+                staged.add(offer_id, sigs[i], keys[i])
+                for band in range(self.bands):
+                    batch_buckets[band].setdefault(int(keys[i, band]), []).append(i)
+
+        return canonical, staged
+
+    def apply(self, staged: "StagedOffers") -> None:
+        """
+        Add staged canonical offers (call once their transaction committed)
+        """
+        if not staged.ids:
+            return
+        self._unsaved.append(staged)
+        n = len(staged.ids)
+        if self._size + n > len(self._sigs):
+            capacity = max(2 * len(self._sigs), self._size + n, 1024)
+            self._sigs = np.resize(self._sigs, (capacity, self._sigs.shape[1]))
+            self._ids = np.resize(self._ids, capacity)
+
+        start = self._size
+        self._sigs[start:start + n] = np.array(staged.sigs)
+        self._ids[start:start + n] = staged.ids
+        for offset, (offer_id, keys) in enumerate(zip(staged.ids, staged.keys)):
+            row = start + offset
+            self._row_of[offer_id] = row
+            for band, key in enumerate(keys.tolist()):
+                self._tail[band].setdefault(key, []).append(row)
+        self._size += n
+        self._tail_size += n
+        if self._tail_size > max(10_000, self._size // 20):
+            self._merge_tail()
+
+    def _merge_tail(self) -> None:
+        for band in range(self.bands):
+            tail = self._tail[band]
+            if not tail:
+                continue
+            keys = np.fromiter((k for k, rows in tail.items() for _ in rows), dtype=np.uint64)
+            rows = np.fromiter((r for rs in tail.values() for r in rs), dtype=np.int32)
+            all_keys = np.concatenate([self._keys[band], keys])
+            all_rows = np.concatenate([self._key_rows[band], rows])
+            order = np.argsort(all_keys, kind="stable")
+            self._keys[band], self._key_rows[band] = all_keys[order], all_rows[order]
+            self._tail[band] = {}
+        self._tail_size = 0
+
+    # ---------- persistence ----------
+    def save(self, path: str) -> None:
+        """
+        Write the index to `path`, replacing what is there
+        """
+        with _locked(path):
+            self._write(path)
+
+    def save_merged(self, path: str) -> None:
+        """
+        Add the offers applied since this index was loaded to the index
+        currently at `path` (saved meanwhile by another run), write the
+        result and continue from it
+        """
+        if not self._unsaved:
+            return
+        with _locked(path):
+            if not os.path.exists(path) or _file_id(path) == self._file_id:
+                # Nobody saved since we did: nothing to merge
+                self._write(path)
+                return
+            merged = self.load(path)
+            if merged.params != self.params:
+                raise ValueError(f"{path}: index parameters {merged.params} differ from {self.params}")
+            for staged in self._unsaved:
+                missing = StagedOffers()
+                for offer_id, sig, keys in zip(staged.ids, staged.sigs, staged.keys):
+                    if offer_id not in merged._row_of:
+                        missing.add(offer_id, sig, keys)
+                merged.apply(missing)
+            merged._write(path)
+        self.__dict__.update(merged.__dict__)
+
+    @property
+    def params(self) -> tuple[int, int, int]:
+        return self.hasher.num_perm, self.bands, self.seed
+
+    def _write(self, path: str) -> None:
+        self._merge_tail()
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp,
+            params=np.array([self.hasher.num_perm, self.bands, self.seed], dtype=np.int64),
+            threshold=np.array([self.threshold]),
+            sigs=self._sigs[:self._size],
+            ids=self._ids[:self._size],
+            **{f"keys_{b}": self._keys[b] for b in range(self.bands)},
+            **{f"rows_{b}": self._key_rows[b] for b in range(self.bands)},
+        )
+        os.replace(tmp, path)
+        self._unsaved = []
+        self._file_id = _file_id(path)
+
+    @classmethod
+    def load(cls, path: str) -> "NearDuplicateIndex":
+        with np.load(path) as data:
+            num_perm, bands, seed = (int(v) for v in data["params"])
+            index = cls(num_perm=num_perm, bands=bands, threshold=float(data["threshold"][0]), seed=seed)
+            index._sigs = data["sigs"]
+            index._ids = data["ids"]
+            index._keys = [data[f"keys_{b}"] for b in range(bands)]
+            index._key_rows = [data[f"rows_{b}"] for b in range(bands)]
+        index._size = len(index._ids)
+        index._row_of = {int(i): r for r, i in enumerate(index._ids.tolist())}
+        index._file_id = _file_id(path)
+        return index
+
+    @classmethod
+    def open(cls, path: str) -> "NearDuplicateIndex":
+        """
+        The persisted index at `path`, or a new empty one
+        """
+        if os.path.exists(path):
+            return cls.load(path)
+        return cls()
+
+
+def _file_id(path: str) -> tuple:
+    # os.replace gives every saved version a new inode
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """
+    Exclusive lock of the index file (held by one saving process at a time)
+    """
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class StagedOffers:
+    """
+    Canonical offers of a batch, waiting for their commit
+    """
+
+    def __init__(self):
+        self.ids: list[int] = []
+        self.sigs: list[np.ndarray] = []
+        self.keys: list[np.ndarray] = []
+
+    def add(self, offer_id: int, sig: np.ndarray, keys: np.ndarray) -> None:
+        self.ids.append(offer_id)
+        self.sigs.append(sig)
+        self.keys.append(keys)
+
+
+_INDEX: NearDuplicateIndex | None = None
+
+
+def default_index() -> NearDuplicateIndex | None:
+    """
+    Process-wide index persisted at DEDUP_INDEX_PATH (None when unset)
+    """
+    global _INDEX
+    if _INDEX is None and settings.DEDUP_INDEX_PATH:
+        _INDEX = NearDuplicateIndex.open(settings.DEDUP_INDEX_PATH)
+    return _INDEX
+
+
+def save_default_index() -> None:
+    """
+    Merge this process's additions into the persisted index
+    """
+    if _INDEX is not None:
+        _INDEX.save_merged(settings.DEDUP_INDEX_PATH)
+
+
+# ==================================================
+# Database
+# ==================================================
+
+def tag_near_duplicates(conn, index: NearDuplicateIndex, urls: list[str]) -> StagedOffers:
+    """
+    Tag the untagged offers among `urls` (new, or whose content changed:
+    the upserts clear the tag) with their canonical offer id, in the
+    caller's transaction. Apply the returned staged offers to the
+    index once it committed.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, title, description
+            FROM public.job_offer
+            WHERE url = ANY(%s) AND canonical_offer_id IS NULL
+            ORDER BY id
+            """,
+            (list(urls),),
+        )
+        rows = cur.fetchall()
+    return _tag_rows(conn, index, rows)
+
+
+def _tag_rows(conn, index: NearDuplicateIndex, rows: list[tuple]) -> StagedOffers:
+    if not rows:
+        return StagedOffers()
+    ids = [r[0] for r in rows]
+    canonical, staged = index.assign(ids, [offer_text(title, desc) for _, title, desc in rows])
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            UPDATE public.job_offer jo
+            SET canonical_offer_id = t.canonical_offer_id
+            FROM (VALUES %s) AS t (id, canonical_offer_id)
+            WHERE jo.id = t.id
+            """,
+            list(zip(ids, canonical)),
+            page_size=len(ids),
+        )
+    duplicates = sum(1 for i, c in zip(ids, canonical) if i != c)
+    logger.debug("near-duplicates: %d of %d offers", duplicates, len(ids))
+    return staged
+
+
+def backfill(conn, index: NearDuplicateIndex, batch_size: int = 2000) -> int:
+    """
+    Tag every untagged offer, oldest first, committing each batch
+    """
+    tagged = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, title, description
+                FROM public.job_offer
+                WHERE canonical_offer_id IS NULL
+                ORDER BY id
+                LIMIT %s
+                """,
+                (batch_size,),
+            )
+            rows = cur.fetchall()
+        if not rows:
+            return tagged
+        staged = _tag_rows(conn, index, rows)
+        conn.commit()
+        index.apply(staged)
+        tagged += len(rows)
+        logger.info("near-duplicate backfill: %d offers tagged, %d canonical", tagged, len(index))
+
+
+def rebuild(conn, batch_size: int = 5000) -> NearDuplicateIndex:
+    """
+    New index holding every canonical offer already tagged in the database
+    """
+    index = NearDuplicateIndex()
+    with conn.cursor(name="near_dup_rebuild") as cur:
+        cur.itersize = batch_size
+        cur.execute(
+            """
+            SELECT id, title, description
+            FROM public.job_offer
+            WHERE canonical_offer_id = id
+            ORDER BY id
+            """
+        )
+        while rows := cur.fetchmany(batch_size):
+            staged = StagedOffers()
+            sigs = index.hasher.signatures(*shingle_batch([offer_text(t, d) for _, t, d in rows]))
+            for (offer_id, _, _), sig, keys in zip(rows, sigs, index.band_keys(sigs)):
+                staged.add(offer_id, sig, keys)
+            index.apply(staged)
+    return index
+
+
+if __name__ == "__main__":
+    from db import get_connection
+
+    parser = argparse.ArgumentParser(description="Near-duplicate offer tagging")
+    parser.add_argument("--index", default=settings.DEDUP_INDEX_PATH, required=not settings.DEDUP_INDEX_PATH)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--backfill", action="store_true", help="tag every untagged offer")
+    mode.add_argument("--rebuild", action="store_true", help="rebuild the index from the tagged offers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    conn = get_connection()
+    try:
+        index = rebuild(conn) if args.rebuild else NearDuplicateIndex.open(args.index)
+        if args.backfill:
+            backfill(conn, index)
+    finally:
+        conn.close()
+    # A rebuild replaces the index; a backfill adds to it, like the ingest runs
+    if args.rebuild:
+        index.save(args.index)
+    else:
+        index.save_merged(args.index)
+    logger.info("near-duplicate index: %d canonical offers saved to %s", len(index), args.index)
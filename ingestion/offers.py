@@ -0,0 +1,69 @@
+import hashlib
+import json
+import math
+
+# (DataFrame column, skill category, requirement level)
+SKILL_COLUMNS = [
+    ("skills_hard_required", "hard", "required"),
+    ("skills_hard_optional", "hard", "optional"),
+    ("skills_soft", "soft", "required"),
+    ("languages_required", "language", "required"),
+    ("languages_optional", "language", "optional"),
+]
+
+
+# ==================================================
+# Preprocessed offer → loader record
+# ==================================================
+
+def _none_if_nan(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def normalize_offer(record: dict) -> dict:
+    """
+    Apply the loader defaults to one preprocessed offer (a `preprocess_ft` row)
+    """
+    offer = {k: _none_if_nan(v) for k, v in record.items() if not isinstance(v, list)}
+    offer["company"] = offer.get("company") or "Unknown"
+    offer["city"] = offer.get("city") or "Inconnue"
+    offer["postal_code"] = offer.get("postal_code") or "00"
+    offer["skills"] = [
+        (name, category, level)
+        for column, category, level in SKILL_COLUMNS
+        for name in (record.get(column) or [])
+        if name
+    ]
+    offer["content_hash"] = offer_content_hash(offer)
+    return offer
+
+
+# Everything written for an offer, except its URL (the key)
+HASHED_FIELDS = (
+    "title",
+    "description",
+    "salary_min_annual",
+    "salary_max_annual",
+    "experience",
+    "education",
+    "date_posted",
+    "company",
+    "industry",
+    "contract",
+    "city",
+    "postal_code",
+    "latitude",
+    "longitude",
+)
+
+
+def offer_content_hash(offer: dict) -> str:
+    """
+    Stable digest of a normalized offer: unchanged hash = nothing to write
+    """
+    payload = [offer.get(f) for f in HASHED_FIELDS] + [sorted(offer["skills"])]
+    return hashlib.md5(
+        json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
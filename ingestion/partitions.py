@@ -0,0 +1,536 @@
+"""
+Monthly partitions of job_offer / job_offer_skill (sql/schema.sql, JOB OFFER)
+and archival of the expired months.
+
+Both tables are range-partitioned by date_posted, one partition per month
+(job_offer_p202501, job_offer_skill_p202501, ...); a link is stored in its
+offer's month. Offers dated in a month without a partition, and undated
+offers, land in the DEFAULT partitions.
+
+- ensure: create the partitions of the current and next months, and move
+  the rows of the default partitions to partitions created for their
+  month (run before each ingest run, see `ensure_before_ingest`),
+- archive: the months older than PARTITION_RETENTION_MONTHS are detached,
+  exported to zstd-compressed Parquet files under ARCHIVE_DIR (one file per
+  table and month, listed in `partition_archive`) and dropped. Detaching
+  does not touch the daily rollups: they keep the archived months' counts,
+- convert: one-off conversion of a database created before partitioning
+  (stop the ingestion first: both tables are locked for the whole copy).
+
+Usage (from ingestion/):
+    python partitions.py ensure
+    python partitions.py archive                 # months past the retention
+    python partitions.py archive --month 2024-01
+    python partitions.py convert
+"""
+import argparse
+import logging
+import os
+from datetime import date
+from pathlib import Path
+
+import psycopg2
+
+from analytics_views import refresh_views
+from config import settings
+from db import get_connection, run_ddl
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+OFFERS = "job_offer"
+LINKS = "job_offer_skill"
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "sql" / "schema.sql"
+# UNIQUE NULLS NOT DISTINCT (sql/schema.sql, JOB OFFER)
+MIN_SERVER_VERSION = 150000
+
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bounds(month: date) -> str:
+    return f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def _in_month(month: date) -> str:
+    return f"date_posted >= '{month.isoformat()}' AND date_posted < '{add_months(month, 1).isoformat()}'"
+
+
+def _columns(cur, table: str) -> str:
+    cur.execute(
+        """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+          AND is_generated = 'NEVER'  -- search_vector: computed on insert
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    )
+    return ", ".join(row[0] for row in cur.fetchall())
+
+
+def attached_months(conn, table: str = OFFERS) -> list[date]:
+    """
+    Months that have a partition of `table`
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+              AND c.relname ~ %s
+            ORDER BY c.relname
+            """,
+            (f"public.{table}", f"^{table}_p[0-9]{{6}}$"),
+        )
+        names = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return [date(int(name[-6:-2]), int(name[-2:]), 1) for name in names]
+
+
+def default_months(conn) -> list[date]:
+    """
+    Months of the dated offers stored in the default partition
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT DISTINCT DATE_TRUNC('month', date_posted)::date
+            FROM public.{OFFERS}_default
+            WHERE date_posted IS NOT NULL
+            ORDER BY 1
+            """
+        )
+        months = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return months
+
+
+def is_partitioned(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT relkind FROM pg_class WHERE oid = 'public.{OFFERS}'::regclass")
+        relkind = cur.fetchone()[0]
+    conn.rollback()
+    return relkind == "p"
+
+
+# ==================================================
+# Ensure
+# ==================================================
+
+def _create_partition_sql(cur, month: date) -> str:
+    """
+    DDL creating the partitions of `month` for both tables. Rows of that
+    month already in the default partitions are moved to the new ones
+    (a partition cannot be created while the default one holds its rows).
+    """
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM public.{OFFERS}_default WHERE {_in_month(month)})")
+    if not cur.fetchone()[0]:
+        return "".join(
+            f"CREATE TABLE IF NOT EXISTS public.{partition_name(table, month)} "
+            f"PARTITION OF public.{table} FOR VALUES {_bounds(month)};\n"
+            for table in (OFFERS, LINKS)
+        )
+
+    # Moved as plain tables: DML on partitions does not fire the rollup
+    # triggers of the parents, and the rows keep their ids
+    sql = ""
+    for table in (OFFERS, LINKS):
+        columns = _columns(cur, table)
+        sql += f"""
+        CREATE TABLE public.{partition_name(table, month)}
+            (LIKE public.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED INCLUDING STORAGE);
+        INSERT INTO public.{partition_name(table, month)} ({columns})
+        SELECT {columns} FROM public.{table}_default WHERE {_in_month(month)};
+        """
+    # Links first: they reference the offers
+    for table in (LINKS, OFFERS):
+        sql += f"DELETE FROM public.{table}_default WHERE {_in_month(month)};\n"
+    for table in (OFFERS, LINKS):
+        sql += (
+            f"ALTER TABLE public.{table} ATTACH PARTITION public.{partition_name(table, month)} "
+            f"FOR VALUES {_bounds(month)};\n"
+        )
+    return sql
+
+
+def ensure_partitions(conn, months) -> list[date]:
+    """
+    Create the missing partitions of `months` (any day of the month), one
+    transaction per month; return the months created
+    """
+    existing = set(attached_months(conn))
+    created = []
+    for month in sorted({month_start(m) for m in months} - existing):
+        with conn.cursor() as cur:
+            sql = _create_partition_sql(cur, month)
+        conn.rollback()
+        run_ddl(conn, sql)
+        created.append(month)
+        logger.info("partitions of %s created", f"{month:%Y-%m}")
+    return created
+
+
+def ensure_before_ingest() -> list[date]:
+    """
+    Start-of-run hook of the ingestion CLIs: partitions for this month and
+    the next one, and for the months left in the default partition (within
+    the retention). A failure is logged, not raised: the offers then go to
+    the default partition until the next run.
+    """
+    conn = get_connection()
+    try:
+        with stage("partitions"):
+            current = month_start(date.today())
+            cutoff = add_months(current, -settings.PARTITION_RETENTION_MONTHS)
+            months = [current, add_months(current, 1)]
+            months += [m for m in default_months(conn) if m >= cutoff]
+            return ensure_partitions(conn, months)
+    except (psycopg2.Error, RuntimeError):
+        conn.rollback()
+        logger.exception("partition maintenance failed, new offers may go to the default partition")
+        return []
+    finally:
+        conn.close()
+
+
+# ==================================================
+# Archive
+# ==================================================
+
+def _detach_sql(cur, month: date) -> str:
+    links = partition_name(LINKS, month)
+    cur.execute(
+        """
+        SELECT conname
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f' AND confrelid = %s::regclass
+        """,
+        (f"public.{links}", f"public.{OFFERS}"),
+    )
+    # Once detached, the links would still reference the offers they archive
+    drop_fks = "".join(
+        f'ALTER TABLE public.{links} DROP CONSTRAINT "{name}";\n' for (name,) in cur.fetchall()
+    )
+    return (
+        f"ALTER TABLE public.{LINKS} DETACH PARTITION public.{links};\n"
+        + drop_fks
+        + f"ALTER TABLE public.{OFFERS} DETACH PARTITION public.{partition_name(OFFERS, month)};\n"
+    )
+
+
+def _is_attached(cur, table: str) -> bool | None:
+    """
+    True if `table` is a partition, False if a standalone table, None if missing
+    """
+    cur.execute(
+        """
+        SELECT c.relispartition
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s
+        """,
+        (table,),
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _arrow_type(pa, type_code: int):
+    """
+    Parquet column type of a pg_type OID (TEXT for anything else)
+    """
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        23: pa.int32(),
+        701: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+    }.get(type_code, pa.string())
+
+
+def export_parquet(conn, table: str, path: Path, batch_size: int = 50_000) -> int:
+    """
+    Write every row of `table` (without its generated columns) to a
+    zstd-compressed Parquet file; return the number of rows. Written to a
+    temporary file renamed at the end.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tmp = path.with_suffix(".parquet.tmp")
+    rows = 0
+    writer = None
+    with conn.cursor() as cur:
+        columns = _columns(cur, table)
+    try:
+        with conn.cursor(name=f"export_{table}") as cur:
+            cur.itersize = batch_size
+            cur.execute(f"SELECT {columns} FROM public.{table} ORDER BY 1")
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if writer is None:
+                    schema = pa.schema([(col.name, _arrow_type(pa, col.type_code)) for col in cur.description])
+                    writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+                if not batch:
+                    break
+                arrays = [
+                    pa.array(
+                        [None if v is None else str(v) for v in values] if field.type == pa.string() else values,
+                        type=field.type,
+                    )
+                    for values, field in zip(zip(*batch), schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                rows += len(batch)
+        writer.close()
+        writer = None
+        os.replace(tmp, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        conn.rollback()
+        if tmp.exists():
+            tmp.unlink()
+    return rows
+
+
+def _archive_path(conn, directory: Path, table: str) -> Path:
+    """
+    First file name of `table` not listed in partition_archive: a month
+    archived again (offers re-ingested after archival) gets new files, a
+    file left by an interrupted run is overwritten
+    """
+    with conn.cursor() as cur:
+        for n in range(1000):
+            path = directory / (f"{table}.parquet" if n == 0 else f"{table}.{n}.parquet")
+            cur.execute(
+                "SELECT EXISTS (SELECT 1 FROM public.partition_archive WHERE %s IN (offers_path, links_path))",
+                (str(path),),
+            )
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return path
+    raise RuntimeError(f"no free archive file name for {table} in {directory}")
+
+
+def archive_month(conn, month: date, archive_dir: str) -> dict:
+    """
+    Detach the partitions of `month`, export them to Parquet, then drop
+    them. Resumable: a month already detached is exported again.
+    """
+    import pyarrow.parquet as pq
+
+    month = month_start(month)
+    if month in default_months(conn):
+        ensure_partitions(conn, [month])
+
+    offers_table, links_table = partition_name(OFFERS, month), partition_name(LINKS, month)
+    with conn.cursor() as cur:
+        attached = _is_attached(cur, offers_table)
+        sql = _detach_sql(cur, month) if attached else None
+    conn.rollback()
+    if attached is None:
+        logger.info("nothing to archive for %s", f"{month:%Y-%m}")
+        return {"month": month, "offers": 0, "links": 0}
+    if sql:
+        run_ddl(conn, sql)
+        logger.info("partitions of %s detached", f"{month:%Y-%m}")
+
+    directory = Path(archive_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    paths = {}
+    for table in (offers_table, links_table):
+        paths[table] = _archive_path(conn, directory, table)
+        counts[table] = export_parquet(conn, table, paths[table])
+        written = pq.ParquetFile(paths[table]).metadata.num_rows
+        if written != counts[table]:
+            raise RuntimeError(f"{paths[table]}: {written} rows written, {counts[table]} expected")
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO public.partition_archive (month, offers_path, links_path, offers, links)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (month, str(paths[offers_table]), str(paths[links_table]), counts[offers_table], counts[links_table]),
+        )
+        cur.execute(f"DROP TABLE public.{links_table}, public.{offers_table}")
+    conn.commit()
+    logger.info(
+        "%s archived: %d offers, %d links in %s",
+        f"{month:%Y-%m}", counts[offers_table], counts[links_table], directory,
+    )
+    return {"month": month, "offers": counts[offers_table], "links": counts[links_table]}
+
+
+def expired_months(conn, retention_months: int) -> list[date]:
+    """
+    Months before the retention window that still have rows: partitions,
+    rows in the default partition, or partitions left detached
+    """
+    cutoff = add_months(month_start(date.today()), -retention_months)
+    months = set(attached_months(conn)) | set(default_months(conn))
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT relname
+            FROM pg_class
+            WHERE relname ~ %s AND relkind = 'r' AND NOT relispartition
+            """,
+            (f"^{OFFERS}_p[0-9]{{6}}$",),
+        )
+        months |= {date(int(name[-6:-2]), int(name[-2:]), 1) for (name,) in cur.fetchall()}
+    conn.rollback()
+    return sorted(m for m in months if m < cutoff)
+
+
+def archive_expired(conn, archive_dir: str, retention_months: int) -> list[dict]:
+    return [archive_month(conn, month, archive_dir) for month in expired_months(conn, retention_months)]
+
+
+# ==================================================
+# Convert
+# ==================================================
+
+def convert(conn) -> None:
+    """
+    Replace the unpartitioned job_offer / job_offer_skill of an existing
+    database by the partitioned tables of sql/schema.sql, keeping every id,
+    in one transaction. The rollups are left as they are (their triggers
+    are disabled during the copy); the materialized views are refreshed.
+    """
+    from analytics_views import MATERIALIZED_VIEWS
+    from salary_migration import needs_migration
+
+    # Checked before anything is renamed or dropped
+    with conn.cursor() as cur:
+        cur.execute("SHOW server_version_num")
+        version = int(cur.fetchone()[0])
+    if version < MIN_SERVER_VERSION:
+        raise RuntimeError(f"the partitioned schema needs PostgreSQL 15+, the server runs {version}")
+    if is_partitioned(conn):
+        logger.info("job_offer is already partitioned")
+        return
+    if needs_migration(conn):
+        raise RuntimeError("salary columns are still TEXT: run salary_migration.py first")
+
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE public.{OFFERS}, public.{LINKS} IN ACCESS EXCLUSIVE MODE")
+        cur.execute(f"SELECT DISTINCT DATE_TRUNC('month', date_posted)::date FROM public.{OFFERS}")
+        months = sorted(m for (m,) in cur.fetchall() if m is not None)
+        old_columns = {table: set(_columns(cur, table).split(", ")) for table in (OFFERS, LINKS)}
+
+        # Dependent views and the old index names are recreated by schema.sql
+        cur.execute("DROP VIEW IF EXISTS public.job_offer_distinct")
+        for view in MATERIALIZED_VIEWS:
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS public.{view}")
+        cur.execute(
+            """
+            SELECT ci.relname
+            FROM pg_index i
+            JOIN pg_class ci ON ci.oid = i.indexrelid
+            WHERE i.indrelid IN ('public.job_offer'::regclass, 'public.job_offer_skill'::regclass)
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+            """
+        )
+        for (index,) in cur.fetchall():
+            cur.execute(f"DROP INDEX public.{index}")
+        for table in (OFFERS, LINKS):
+            cur.execute(f"ALTER TABLE public.{table} RENAME TO {table}_unpartitioned")
+
+        cur.execute(SCHEMA_PATH.read_text(encoding="utf-8"))
+        for month in months:
+            cur.execute(_create_partition_sql(cur, month))
+
+        columns = ", ".join(c for c in _columns(cur, OFFERS).split(", ") if c in old_columns[OFFERS])
+        cur.execute(f"ALTER TABLE public.{OFFERS} DISABLE TRIGGER rollup_job_offer_insert")
+        cur.execute(f"ALTER TABLE public.{LINKS} DISABLE TRIGGER rollup_job_offer_skill_insert")
+        cur.execute(
+            f"""
+            INSERT INTO public.{OFFERS} ({columns})
+            SELECT {columns} FROM public.{OFFERS}_unpartitioned
+            """
+        )
+        cur.execute(
+            f"""
+            INSERT INTO public.{LINKS} (job_offer_id, skill_id, requirement_level, date_posted)
+            SELECT l.job_offer_id, l.skill_id, l.requirement_level, jo.date_posted
+            FROM public.{LINKS}_unpartitioned l
+            JOIN public.{OFFERS}_unpartitioned jo ON jo.id = l.job_offer_id
+            """
+        )
+        cur.execute(f"ALTER TABLE public.{OFFERS} ENABLE TRIGGER rollup_job_offer_insert")
+        cur.execute(f"ALTER TABLE public.{LINKS} ENABLE TRIGGER rollup_job_offer_skill_insert")
+        cur.execute(
+            f"SELECT setval(pg_get_serial_sequence('public.{OFFERS}', 'id'), COALESCE(MAX(id), 0) + 1, false) "
+            f"FROM public.{OFFERS}"
+        )
+        cur.execute(f"DROP TABLE public.{LINKS}_unpartitioned, public.{OFFERS}_unpartitioned")
+        # SERIAL named it job_offer_id_seq1 while the old sequence existed
+        cur.execute(f"SELECT pg_get_serial_sequence('public.{OFFERS}', 'id')")
+        sequence = cur.fetchone()[0]
+        if sequence != f"public.{OFFERS}_id_seq":
+            cur.execute(f"ALTER SEQUENCE {sequence} RENAME TO {OFFERS}_id_seq")
+    conn.commit()
+    logger.info("job_offer and job_offer_skill partitioned (%d months)", len(months))
+
+    refresh_views(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"ANALYZE public.{OFFERS}")
+        cur.execute(f"ANALYZE public.{LINKS}")
+    conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly job_offer partitions and archival")
+    parser.add_argument("step", choices=["ensure", "archive", "convert"])
+    parser.add_argument(
+        "--month",
+        type=lambda value: date.fromisoformat(f"{value}-01"),
+        help="archive this month (YYYY-MM) only",
+    )
+    parser.add_argument("--retention-months", type=int, default=settings.PARTITION_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=settings.ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    conn = get_connection()
+    try:
+        if args.step == "convert":
+            convert(conn)
+        elif args.step == "ensure":
+            current = month_start(date.today())
+            ensure_partitions(conn, [current, add_months(current, 1), *default_months(conn)])
+        elif not args.archive_dir:
+            parser.error("archive needs --archive-dir or ARCHIVE_DIR")
+        elif args.month:
+            archive_month(conn, args.month, args.archive_dir)
+        else:
+            archive_expired(conn, args.archive_dir, args.retention_months)
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,166 @@
+"""
+Streaming fetch → preprocess → load pipeline.
+
+Pages are fetched in a background thread and handed over through a bounded
+queue (back-pressure: fetching pauses while the queue is full). The loading
+side regroups them into fixed-size chunks, preprocesses each chunk and
+commits it, so memory stays flat whatever the run size and the first rows
+land while later pages are still downloading.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+
+from config import settings
+from db import get_connection
+from dimension_cache import DimensionCaches
+from instrumentation import stage, timed_iter
+from loaders import LOADERS
+from near_dup import NearDuplicateIndex, tag_near_duplicates
+from preprocessing import parser_cache_stats
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+# ==================================================
+# Stages
+# ==================================================
+
+def iter_prefetched(pages: Iterable[list[dict]], maxsize: int = 4) -> Iterator[list[dict]]:
+    """
+    Consume `pages` in a background thread, at most `maxsize` pages ahead
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_DONE)
+        except BaseException as e:  # re-raised on the consumer side
+            put(e)
+
+    thread = threading.Thread(target=produce, name="ft-fetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join(timeout=1)
+
+
+def iter_chunks(pages: Iterable[list[dict]], chunk_size: int) -> Iterator[list[dict]]:
+    """
+    Regroup pages into lists of exactly `chunk_size` items (last one shorter)
+    """
+    chunk = []
+    for page in pages:
+        chunk.extend(page)
+        while len(chunk) >= chunk_size:
+            yield chunk[:chunk_size]
+            chunk = chunk[chunk_size:]
+    if chunk:
+        yield chunk
+
+
+def dedupe_by_id(pages: Iterable[list[dict]]) -> Iterator[list[dict]]:
+    """
+    Drop offers already seen in this run (only ids are kept in memory)
+    """
+    seen = set()
+    for page in pages:
+        fresh = [i for i in page if i.get("id") not in seen]
+        seen.update(i.get("id") for i in fresh)
+        yield fresh
+
+
+# ==================================================
+# Pipeline
+# ==================================================
+
+def run_pipeline(
+    pages: Iterable[list[dict]],
+    preprocess: Callable[[list[dict]], pd.DataFrame],
+    loader: str = "batch",
+    chunk_size: int = settings.PIPELINE_CHUNK_SIZE,
+    queue_size: int = settings.PIPELINE_QUEUE_SIZE,
+    on_commit: Callable[[object, list[dict]], None] | None = None,
+    dedup: NearDuplicateIndex | None = None,
+) -> dict:
+    """
+    Load `pages` chunk by chunk, one transaction per chunk.
+    A failing chunk is rolled back; chunks committed before it are kept.
+    `on_commit(conn, chunk)` runs in each chunk's transaction, just before
+    its commit (checkpoints). With a `dedup` index, new offers are tagged
+    with their canonical offer in the same transaction.
+    """
+    stats = {"chunks": 0, "offers": 0, "first_commit_seconds": None}
+    links = Counter()
+    t0 = time.perf_counter()
+
+    conn = get_connection()
+    cache = DimensionCaches(max_size=settings.DIM_CACHE_MAX_SIZE)
+
+    try:
+        cache.warm(conn)
+        # "fetch" is the time spent waiting for pages, not the download time
+        for chunk in iter_chunks(timed_iter("fetch", iter_prefetched(pages, queue_size)), chunk_size):
+            with stage("preprocess", rows=len(chunk)):
+                df = preprocess(chunk)
+            with stage("load", rows=len(df)):
+                links.update(LOADERS[loader](conn, df, cache=cache))
+            if dedup is not None and len(df):
+                with stage("dedup", rows=len(df)):
+                    staged = tag_near_duplicates(conn, dedup, df["url"].tolist())
+            with stage("commit"):
+                if on_commit:
+                    on_commit(conn, chunk)
+                conn.commit()
+            if dedup is not None and len(df):
+                dedup.apply(staged)
+
+            stats["chunks"] += 1
+            stats["offers"] += len(chunk)
+            if stats["first_commit_seconds"] is None:
+                stats["first_commit_seconds"] = round(time.perf_counter() - t0, 3)
+            logger.debug("chunk %d committed (%d offers)", stats["chunks"], stats["offers"])
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+        stats["links"] = dict(links)
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        logger.info("pipeline: %s", stats)
+        for name, cache_stats in cache.stats().items():
+            logger.info("dimension cache %s: %s", name, cache_stats)
+        for name, cache_stats in parser_cache_stats().items():
+            logger.debug("parser cache %s: %s", name, cache_stats)
+
+    return stats
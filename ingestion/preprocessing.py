@@ -1,20 +1,69 @@
+import csv
+import math
 import os
+import pickle
 import re
 import unicodedata
-from typing import Optional, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 
 import pandas as pd
 
+from config import settings
+
+
+# ==================================================
+# COMPILED PATTERNS & MEMO CACHES
+# ==================================================
+_WS_RE = re.compile(r"\s+")
+_PARENS_RE = re.compile(r"\(.*?\)")
+_TITLE_CHARS_RE = re.compile(r"[^a-zàâçéèêëîïôûùüÿñæœ\s]")
+_NUMBER_RE = re.compile(r"\d+(?:[\.,]\d+)?")
+_ARRONDISSEMENT_RE = re.compile(r"\s+\d{1,2}(er|e)?\s+arrondissement.*$", re.IGNORECASE)
+_LOCATION_RE = re.compile(r"^\s*(2[AB]|\d{1,3})\s*-\s*(.+)$")
+
+# The same few hundred labels repeat across every run: parsers are memoized
+# on the raw string (bounded LRU). Results are immutable (str / tuples).
+_memoized = lru_cache(maxsize=settings.PARSER_CACHE_SIZE)
+_MEMOIZED = {}
+
+
+def _register(fn):
+    _MEMOIZED[fn.__name__] = fn
+    return fn
+
+
+def parser_cache_stats() -> dict[str, dict]:
+    stats = {}
+    for name, fn in _MEMOIZED.items():
+        info = fn.cache_info()
+        calls = info.hits + info.misses
+        stats[name] = {
+            "size": info.currsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": round(info.hits / calls, 3) if calls else None,
+        }
+    return stats
+
+
+def clear_parser_caches() -> None:
+    for fn in _MEMOIZED.values():
+        fn.cache_clear()
+
 
 # ==================================================
 # TEXT NORMALIZATION
 # ==================================================
+@_register
+@_memoized
 def normalize_text(text: str) -> str:
     if not isinstance(text, str):
         return ""
     text = text.lower()
     text = text.replace("\u00a0", " ")
-    text = re.sub(r"\s+", " ", text)
+    text = _WS_RE.sub(" ", text)
     return text.strip()
 
 
@@ -22,9 +71,9 @@ def normalize_job_title(title: str) -> str:
     if not isinstance(title, str):
         return ""
     title = title.lower()
-    title = re.sub(r"\(.*?\)", "", title)
-    title = re.sub(r"[^a-zàâçéèêëîïôûùüÿñæœ\s]", " ", title)
-    title = re.sub(r"\s+", " ", title)
+    title = _PARENS_RE.sub("", title)
+    title = _TITLE_CHARS_RE.sub(" ", title)
+    title = _WS_RE.sub(" ", title)
     return title.strip()
 
 
@@ -34,7 +83,7 @@ def normalize_job_title(title: str) -> str:
 def extract_numbers(text: str) -> list[float]:
     if not text:
         return []
-    nums = re.findall(r"\d+(?:[\.,]\d+)?", text)
+    nums = _NUMBER_RE.findall(text)
     return [float(n.replace(",", ".")) for n in nums]
 
 
@@ -54,6 +103,8 @@ def to_annual(amount: float, unit: str) -> float:
     return amount
 
 
+@_register
+@_memoized
 def parse_salary_france_travail(
     salary_text: str,
 ) -> Tuple[Optional[float], Optional[float]]:
@@ -78,9 +129,48 @@ def parse_salary_france_travail(
     return to_annual(min(numbers), unit), to_annual(max(numbers), unit)
 
 
+def parse_salary_series(salary_text: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Vectorized `parse_salary_france_travail`: (salary_min, salary_max) Series
+    """
+    text = (
+        salary_text.where(salary_text.map(type) == str, "")
+        .str.lower()
+        .str.replace("\u00a0", " ", regex=False)
+        .str.replace(_WS_RE, " ", regex=True)
+        .str.strip()
+    )
+
+    numbers = (
+        text.str.extractall(f"({_NUMBER_RE.pattern})")[0]
+        .str.replace(",", ".", regex=False)
+        .astype(float)
+        .groupby(level=0)
+    )
+    low = numbers.min().reindex(text.index)
+    high = numbers.max().reindex(text.index)
+
+    hourly = text.str.contains("horaire", regex=False) | text.str.contains("/h", regex=False)
+    monthly = ~hourly & (text.str.contains("mois", regex=False) | text.str.contains("mensuel", regex=False))
+    annual = ~hourly & ~monthly
+
+    thousands = annual & (high < 1000)
+    low = low.mask(thousands, low * 1000)
+    high = high.mask(thousands, high * 1000)
+
+    for col in (low, high):
+        col[monthly] = col[monthly] * 12
+        col[hourly] = col[hourly] * 151.67 * 12
+
+    empty = high.isna() | (high == 0)
+    return low.mask(empty), high.mask(empty)
+
+
 # ==================================================
 # LOCATION PREPROCESSING (BY DEPARTMENT)
 # ==================================================
+@_register
+@_memoized
 def normalize_unicode(text: str) -> str:
     if not isinstance(text, str):
         return ""
@@ -90,19 +180,62 @@ def normalize_unicode(text: str) -> str:
 
 
 # ---------- Load department referential ----------
-_DEPT_GEO = None
+# dep_code ("01" … "95", "2A", "2B", "971" …) → (dep_nom, latitude, longitude)
+DeptGeo = Mapping[str, Tuple[str, Optional[float], Optional[float]]]
+
+_DEPT_GEO: Optional[DeptGeo] = None
+_DEPT_GEO_CACHE_VERSION = 1
 
 
-def load_dept_geo(csv_path: str) -> pd.DataFrame:
-    df = pd.read_csv(csv_path)
+def _float_or_none(value: str) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
 
-    # Normalize department code → "01", "02", ..., "75"
-    df["dep_code"] = df["dep_code"].astype(str).str.zfill(2)
 
-    return df.set_index("dep_code")
+def compile_dept_geo(csv_path: str) -> DeptGeo:
+    geo = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            # Normalize department code → "01", "02", ..., "75", "2A", "974"
+            dep_code = row["dep_code"].strip().zfill(2)
+            geo[dep_code] = (
+                row["dep_nom"],
+                _float_or_none(row["latitude_mairie"]),
+                _float_or_none(row["longitude_mairie"]),
+            )
+    return MappingProxyType(geo)
 
 
-def get_dept_geo() -> Optional[pd.DataFrame]:
+def load_dept_geo(csv_path: str) -> DeptGeo:
+    """
+    Compiled referential, cached next to the CSV (``<csv>.pickle``) and
+    rebuilt whenever the CSV changes
+    """
+    stat = os.stat(csv_path)
+    key = (_DEPT_GEO_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+    cache_path = f"{csv_path}.pickle"
+
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, geo = pickle.load(f)
+        if cached_key == key:
+            return MappingProxyType(geo)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    geo = compile_dept_geo(csv_path)
+    try:
+        with open(cache_path, "wb") as f:
+            pickle.dump((key, dict(geo)), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # read-only data directory: compile on every start
+    return geo
+
+
+def get_dept_geo() -> Optional[DeptGeo]:
     global _DEPT_GEO
     if _DEPT_GEO is not None:
         return _DEPT_GEO
@@ -112,10 +245,33 @@ def get_dept_geo() -> Optional[pd.DataFrame]:
         return None
 
     _DEPT_GEO = load_dept_geo(path)
+    # Memoized locations were resolved without the referential
+    clear_parser_caches()
     return _DEPT_GEO
 
 
+def attach_dept_geo(dep_code: pd.Series, city: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized referential join for a batch of offers: columns city
+    (department name when empty), latitude, longitude
+    """
+    out = pd.DataFrame({"city": city, "latitude": float("nan"), "longitude": float("nan")}, index=dep_code.index)
+
+    dept_geo = get_dept_geo()
+    if dept_geo is None:
+        return out
+
+    names = {code: name for code, (name, _, _) in dept_geo.items()}
+    known = dep_code.isin(names)
+    out["city"] = city.mask(known & (city == ""), dep_code.map(names))
+    out["latitude"] = dep_code.map({code: lat for code, (_, lat, _) in dept_geo.items()}).astype(float)
+    out["longitude"] = dep_code.map({code: lon for code, (_, _, lon) in dept_geo.items()}).astype(float)
+    return out
+
+
 # ---------- Main parser ----------
+@_register
+@_memoized
 def clean_city_name(city: str) -> str:
     """
     Remove arrondissement / district info from city names
@@ -129,18 +285,15 @@ def clean_city_name(city: str) -> str:
     city = city.strip()
 
     # Remove arrondissement patterns
-    city = re.sub(
-        r"\s+\d{1,2}(er|e)?\s+arrondissement.*$",
-        "",
-        city,
-        flags=re.IGNORECASE,
-    )
+    city = _ARRONDISSEMENT_RE.sub("", city)
 
     # Safety: remove trailing commas or spaces
     city = city.rstrip(", ").strip()
 
     return city
 
+@_register
+@_memoized
 def parse_location(
     location: str,
 ) -> Tuple[Optional[str], Optional[str], Optional[float], Optional[float]]:
@@ -155,27 +308,45 @@ def parse_location(
     location = normalize_unicode(location)
 
     # Extract department code and raw city before "-"
-    match = re.match(r"^\s*(\d{1,3})\s*-\s*(.+)$", location)
+    match = _LOCATION_RE.match(location)
     if not match:
         return None, None, None, None
 
     dep_code = match.group(1).zfill(2)
     city_raw = clean_city_name(match.group(2))
 
-    dept_geo = get_dept_geo()
+    geo = (get_dept_geo() or {}).get(dep_code)
 
     # If no referential → keep FT city, no GPS
-    if dept_geo is None or dep_code not in dept_geo.index:
+    if geo is None:
         return dep_code, city_raw, None, None
 
-    row = dept_geo.loc[dep_code]
+    dep_nom, latitude, longitude = geo
 
     # Fallback city: FT city first, else department name
-    city = city_raw if city_raw else row["dep_nom"]
-
-    return (
-        dep_code,
-        city,
-        float(row["latitude_mairie"]) if pd.notna(row["latitude_mairie"]) else None,
-        float(row["longitude_mairie"]) if pd.notna(row["longitude_mairie"]) else None,
-    )
\ No newline at end of file
+    return dep_code, city_raw or dep_nom, latitude, longitude
+
+
+def parse_location_series(location: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized `parse_location`: columns dep_code, city, latitude, longitude
+    """
+    text = (
+        location.where(location.map(type) == str, "")
+        .str.encode("latin1", errors="ignore")
+        .str.decode("utf-8", errors="ignore")
+        .str.normalize("NFKC")
+        .str.strip()
+    )
+    parts = text.str.extract(_LOCATION_RE)
+    dep_code = parts[0].str.zfill(2)
+    city = (
+        parts[1].str.strip()
+        .str.replace(_ARRONDISSEMENT_RE, "", regex=True)
+        .str.rstrip(", ")
+        .str.strip()
+    )
+
+    out = attach_dept_geo(dep_code, city)
+    out.insert(0, "dep_code", dep_code)
+    return out
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""
+Offline replay of the raw page spool (no France Travail API calls).
+
+Usage (from ingestion/):
+    python replay.py --spool-dir spool --from 2026-10-01 --to 2026-10-31 --workers 4
+
+Each spool file is streamed through `preprocess_ft` and the loader by its
+own worker process, with its own database connection.
+"""
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from analytics_views import refresh_after_ingest
+from config import settings
+from db import get_connection
+from ingest import preprocess_ft
+from loaders import LOADERS
+from near_dup import backfill, default_index, save_default_index
+from partitions import ensure_before_ingest
+from pipeline import dedupe_by_id, run_pipeline
+from spool import iter_spool_pages, list_spool_files
+
+logger = logging.getLogger(__name__)
+
+
+def replay_file(path: str | Path, loader: str = "batch") -> dict:
+    stats = run_pipeline(dedupe_by_id(iter_spool_pages(path)), preprocess_ft, loader=loader)
+    return {"file": str(path), **stats}
+
+
+def replay(
+    spool_dir: str | Path,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    workers: int = 1,
+    loader: str = "batch",
+) -> list[dict]:
+    files = list_spool_files(spool_dir, date_from, date_to)
+    logger.info("replaying %d spool files with %d workers", len(files), workers)
+
+    if workers <= 1:
+        stats = [replay_file(f, loader) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stats = list(pool.map(replay_file, files, [loader] * len(files)))
+
+    # Workers do not share the near-duplicate index: tag once everything is in
+    if default_index() is not None:
+        conn = get_connection()
+        try:
+            backfill(conn, default_index())
+        finally:
+            conn.close()
+            save_default_index()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay spooled France Travail pages")
+    parser.add_argument("--spool-dir", default=settings.SPOOL_DIR or "spool")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--loader", choices=sorted(LOADERS), default="batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    ensure_before_ingest()
+    for stats in replay(args.spool_dir, args.date_from, args.date_to, args.workers, args.loader):
+        logger.info("replayed %s", stats)
+    refresh_after_ingest()
@@ -1,41 +1,49 @@
+from psycopg2.extras import Json
+
+from config import settings
+from db import execute_prepared
+from instrumentation import record_rows
+
+
 # ==================================================
 # Company
 # ==================================================
 
 def get_or_create_company(conn, name: str) -> int:
+    """
+    Id of the canonical company of `name` (sql/schema.sql, NAME CANONICALIZATION)
+    """
     with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "company_resolve",
             """
-            SELECT id FROM public.company
-            WHERE name = %s
+            SELECT company_id, inserted
+            FROM public.resolve_companies(ARRAY[%s::text], %s::real)
             """,
-            (name,),
+            (name, settings.COMPANY_MATCH_THRESHOLD),
         )
-        row = cur.fetchone()
-        if row:
-            return row[0]
-
-        cur.execute(
-            """
-            INSERT INTO public.company (name)
-            VALUES (%s)
-            RETURNING id
-            """,
-            (name,),
-        )
-        return cur.fetchone()[0]
+        company_id, inserted = cur.fetchone()
+        record_rows("company", inserted=int(inserted), unchanged=int(not inserted))
+        return company_id
 
 
 # ==================================================
 # Job offer
 # ==================================================
 
-def get_or_create_job_offer(conn, data: dict) -> int:
+def get_or_create_job_offer(conn, data: dict) -> tuple[int, bool]:
+    """
+    Return (job_offer_id, changed). An existing offer whose content_hash
+    matches `data["content_hash"]` is left untouched (changed=False).
+    """
     with conn.cursor() as cur:
         # 1. Check existence via URL
-        cur.execute(
+        execute_prepared(
+            cur,
+            "job_offer_select",
             """
-            SELECT id
+            SELECT id, content_hash, date_posted
             FROM public.job_offer
             WHERE url = %s
             """,
@@ -43,10 +51,16 @@ def get_or_create_job_offer(conn, data: dict) -> int:
         )
         row = cur.fetchone()
 
-        # 2. UPDATE si existe
+        # 2. UPDATE si existe et a changé
         if row:
-            job_offer_id = row[0]
-            cur.execute(
+            job_offer_id, content_hash, date_posted = row
+            if content_hash is not None and content_hash == data.get("content_hash"):
+                record_rows("job_offer", unchanged=1)
+                return job_offer_id, False
+
+            execute_prepared(
+                cur,
+                "job_offer_update",
                 """
                 UPDATE public.job_offer
                 SET
@@ -61,6 +75,9 @@ def get_or_create_job_offer(conn, data: dict) -> int:
                     contract_id = %s,
                     industry_id = %s,
                     location_id = %s,
+                    content_hash = %s,
+                    -- new content: tagged again (near_dup.tag_near_duplicates)
+                    canonical_offer_id = NULL,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id = %s
                 """,
@@ -76,13 +93,31 @@ def get_or_create_job_offer(conn, data: dict) -> int:
                     data.get("contract_id"),
                     data.get("industry_id"),
                     data.get("location_id"),
+                    data.get("content_hash"),
                     job_offer_id,
                 ),
             )
-            return job_offer_id
+            # Links of an undated offer do not reference it (MATCH SIMPLE):
+            # the ON UPDATE CASCADE does not give them the new date
+            if date_posted is None and data["date_posted"] is not None:
+                execute_prepared(
+                    cur,
+                    "job_offer_skill_date",
+                    """
+                    UPDATE public.job_offer_skill
+                    SET date_posted = %s
+                    WHERE job_offer_id = %s
+                      AND date_posted IS NULL
+                    """,
+                    (data["date_posted"], job_offer_id),
+                )
+            record_rows("job_offer", updated=1)
+            return job_offer_id, True
 
         # 3. INSERT si nouveau
-        cur.execute(
+        execute_prepared(
+            cur,
+            "job_offer_insert",
             """
             INSERT INTO public.job_offer (
                 title,
@@ -96,9 +131,10 @@ def get_or_create_job_offer(conn, data: dict) -> int:
                 company_id,
                 contract_id,
                 industry_id,
-                location_id
+                location_id,
+                content_hash
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
             """,
             (
@@ -114,52 +150,33 @@ def get_or_create_job_offer(conn, data: dict) -> int:
                 data.get("contract_id"),
                 data.get("industry_id"),
                 data.get("location_id"),
+                data.get("content_hash"),
             ),
         )
-        return cur.fetchone()[0]
+        record_rows("job_offer", inserted=1)
+        return cur.fetchone()[0], True
     
 # ==================================================
 # Skills
 # ==================================================
 
 def get_or_create_skill(conn, name: str, category: str) -> int:
+    """
+    Id of the canonical skill of `name` in `category`
+    """
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id FROM public.skill
-            WHERE name = %s AND category = %s
-            """,
-            (name, category),
-        )
-        row = cur.fetchone()
-        if row:
-            return row[0]
-
-        cur.execute(
-            """
-            INSERT INTO public.skill (name, category)
-            VALUES (%s, %s)
-            RETURNING id
-            """,
-            (name, category),
-        )
-        return cur.fetchone()[0]
-
-
-def link_job_offer_skill(conn, job_offer_id: int, skill_id: int, requirement_level: str):
-    with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "skill_resolve",
             """
-            INSERT INTO public.job_offer_skill (
-                job_offer_id,
-                skill_id,
-                requirement_level
-            )
-            VALUES (%s, %s, %s)
-            ON CONFLICT DO NOTHING
+            SELECT skill_id, inserted
+            FROM public.resolve_skills(ARRAY[%s::text], ARRAY[%s::text], %s::real)
             """,
-            (job_offer_id, skill_id, requirement_level),
+            (name, category, settings.SKILL_MATCH_THRESHOLD),
         )
+        skill_id, inserted = cur.fetchone()
+        record_rows("skill", inserted=int(inserted), unchanged=int(not inserted))
+        return skill_id
 
 
 # ==================================================
@@ -175,7 +192,9 @@ def get_or_create_location(
 ) -> int:
     with conn.cursor() as cur:
         # 1. Check existence
-        cur.execute(
+        execute_prepared(
+            cur,
+            "location_select",
             """
             SELECT id
             FROM location
@@ -186,10 +205,13 @@ def get_or_create_location(
         row = cur.fetchone()
 
         if row:
+            record_rows("location", unchanged=1)
             return row[0]
 
         # 2. Insert new location
-        cur.execute(
+        execute_prepared(
+            cur,
+            "location_insert",
             """
             INSERT INTO public.location (
                 ville,
@@ -202,6 +224,7 @@ def get_or_create_location(
             """,
             (city, postal_code, latitude, longitude),
         )
+        record_rows("location", inserted=1)
         return cur.fetchone()[0]
     
 # ==================================================
@@ -213,7 +236,9 @@ def get_or_create_industry(conn, name: str | None) -> int | None:
         return None
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "industry_select",
             """
             SELECT id
             FROM industry
@@ -224,9 +249,12 @@ def get_or_create_industry(conn, name: str | None) -> int | None:
         row = cur.fetchone()
 
         if row:
+            record_rows("industry", unchanged=1)
             return row[0]
 
-        cur.execute(
+        execute_prepared(
+            cur,
+            "industry_insert",
             """
             INSERT INTO public.industry (name)
             VALUES (%s)
@@ -234,6 +262,7 @@ def get_or_create_industry(conn, name: str | None) -> int | None:
             """,
             (name,),
         )
+        record_rows("industry", inserted=1)
         return cur.fetchone()[0]
     
 # ==================================================
@@ -245,7 +274,9 @@ def get_or_create_contract(conn, label: str | None) -> int | None:
         return None
 
     with conn.cursor() as cur:
-        cur.execute(
+        execute_prepared(
+            cur,
+            "contract_select",
             """
             SELECT id
             FROM contract
@@ -256,9 +287,12 @@ def get_or_create_contract(conn, label: str | None) -> int | None:
         row = cur.fetchone()
 
         if row:
+            record_rows("contract", unchanged=1)
             return row[0]
 
-        cur.execute(
+        execute_prepared(
+            cur,
+            "contract_insert",
             """
             INSERT INTO public.contract (type_contrat)
             VALUES (%s)
@@ -266,4 +300,122 @@ def get_or_create_contract(conn, label: str | None) -> int | None:
             """,
             (label,),
         )
-        return cur.fetchone()[0]
\ No newline at end of file
+        record_rows("contract", inserted=1)
+        return cur.fetchone()[0]
+
+
+# ==================================================
+# Ingestion high-water marks
+# ==================================================
+
+def get_watermark(conn, query_key: str):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT last_date_creation
+            FROM public.ingest_watermark
+            WHERE query_key = %s
+            """,
+            (query_key,),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def set_watermark(conn, query_key: str, last_date_creation) -> None:
+    """
+    Move the mark forward only (never back)
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO public.ingest_watermark (query_key, last_date_creation)
+            VALUES (%s, %s)
+            ON CONFLICT (query_key) DO UPDATE SET
+                last_date_creation = GREATEST(
+                    public.ingest_watermark.last_date_creation,
+                    EXCLUDED.last_date_creation
+                ),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (query_key, last_date_creation),
+        )
+
+
+# ==================================================
+# Ingestion run ledger
+# ==================================================
+
+def create_ingest_run(conn, query_key: str, params: dict) -> int:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO public.ingest_run (query_key, params)
+            VALUES (%s, %s)
+            RETURNING id
+            """,
+            (query_key, Json(params)),
+        )
+        return cur.fetchone()[0]
+
+
+def get_resumable_run(conn, query_key: str) -> dict | None:
+    """
+    Latest run of the query, if it did not complete
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id, params, status, next_offset, max_date_creation
+            FROM public.ingest_run
+            WHERE query_key = %s
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (query_key,),
+        )
+        row = cur.fetchone()
+    if not row or row[2] == "completed":
+        return None
+    return dict(zip(("id", "params", "status", "next_offset", "max_date_creation"), row))
+
+
+def checkpoint_ingest_run(conn, run_id: int, next_offset: int, max_date_creation: str | None) -> None:
+    """
+    Record that every offer before `next_offset` is loaded; call it in the
+    transaction that writes them
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE public.ingest_run
+            SET
+                status = 'running',
+                next_offset = GREATEST(next_offset, %s),
+                max_date_creation = GREATEST(max_date_creation, %s::timestamptz),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            (next_offset, max_date_creation, run_id),
+        )
+
+
+def finish_ingest_run(conn, run_id: int, status: str, error: str | None = None):
+    """
+    Mark the run completed / failed; return its max_date_creation
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE public.ingest_run
+            SET
+                status = %s,
+                error = %s,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            RETURNING max_date_creation
+            """,
+            (status, error, run_id),
+        )
+        return cur.fetchone()[0]
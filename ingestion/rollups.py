@@ -0,0 +1,184 @@
+"""
+Daily rollups of offers and skill links (sql/schema.sql, DAILY ROLLUPS).
+
+The triggers keep `rollup_offer_daily` (day, location, contract) and
+`rollup_skill_daily` (+ skill, requirement level) up to date in the
+loaders' own transactions (deltas are folded in at commit, so parallel
+workers do not deadlock on the rollup rows); the time series below read
+them instead of the fact tables (a few rows per day instead of every offer).
+
+Usage (from ingestion/):
+    python rollups.py --check     # compare the rollups with a recount of the facts
+    python rollups.py --rebuild   # recompute them from the facts
+    python rollups.py --prune     # delete the keys whose count fell to 0
+"""
+import argparse
+import logging
+from datetime import date
+
+from config import settings
+from db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Keys of the rollups whose count differs from a recount of the facts
+# (rows at 0 are the same as missing rows)
+CHECK_SQL = """
+WITH facts AS (
+    SELECT date_posted AS day, location_id, contract_id, COUNT(*) AS offers
+    FROM public.job_offer
+    WHERE public.rollup_counted(date_posted, id, canonical_offer_id)
+      AND NOT public.rollup_archived(date_posted)
+    GROUP BY 1, 2, 3
+)
+SELECT COUNT(*)
+FROM facts f
+FULL JOIN (
+    SELECT * FROM public.rollup_offer_daily WHERE offers <> 0 AND NOT public.rollup_archived(day)
+) r
+    ON r.day = f.day
+   AND r.location_id IS NOT DISTINCT FROM f.location_id
+   AND r.contract_id IS NOT DISTINCT FROM f.contract_id
+WHERE r.offers IS DISTINCT FROM f.offers;
+
+WITH facts AS (
+    SELECT jo.date_posted AS day, jo.location_id, jo.contract_id, jos.skill_id, jos.requirement_level,
+           COUNT(*) AS offers
+    FROM public.job_offer jo
+    JOIN public.job_offer_skill jos ON jos.job_offer_id = jo.id AND jos.date_posted = jo.date_posted
+    WHERE public.rollup_counted(jo.date_posted, jo.id, jo.canonical_offer_id)
+      AND NOT public.rollup_archived(jo.date_posted)
+    GROUP BY 1, 2, 3, 4, 5
+)
+SELECT COUNT(*)
+FROM facts f
+FULL JOIN (
+    SELECT * FROM public.rollup_skill_daily WHERE offers <> 0 AND NOT public.rollup_archived(day)
+) r
+    ON r.day = f.day
+   AND r.location_id IS NOT DISTINCT FROM f.location_id
+   AND r.contract_id IS NOT DISTINCT FROM f.contract_id
+   AND r.skill_id = f.skill_id
+   AND r.requirement_level = f.requirement_level
+WHERE r.offers IS DISTINCT FROM f.offers;
+"""
+
+
+def check(conn) -> dict[str, int]:
+    """
+    Number of rollup keys that disagree with the facts, archived months
+    excepted. Offers deleted since the last rebuild show up here: the
+    rollups keep counting them.
+    """
+    result = {}
+    with conn.cursor() as cur:
+        for table, sql in zip(("rollup_offer_daily", "rollup_skill_daily"), CHECK_SQL.split(";")):
+            cur.execute(sql)
+            result[table] = cur.fetchone()[0]
+    conn.rollback()
+    return result
+
+
+def rebuild(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT public.rollup_rebuild()")
+    conn.commit()
+
+
+def prune(conn) -> int:
+    """
+    Delete the keys left at 0 by re-categorized offers; return their number.
+    Safe alongside the loaders: a key incremented meanwhile is re-checked
+    and kept, a key pruned meanwhile is inserted again.
+    """
+    deleted = 0
+    with conn.cursor() as cur:
+        for table in ("rollup_offer_daily", "rollup_skill_daily"):
+            cur.execute(f"DELETE FROM public.{table} WHERE offers = 0")
+            deleted += cur.rowcount
+    conn.commit()
+    return deleted
+
+
+# ==================================================
+# Time series
+# ==================================================
+
+def offers_per_month(
+    conn,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    location_id: int | None = None,
+    contract_id: int | None = None,
+) -> list[tuple[date, int]]:
+    """
+    [(month, offers)] of the distinct dated offers, optionally for one
+    location / contract
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT DATE_TRUNC('month', day)::date AS month, SUM(offers)::bigint
+            FROM public.rollup_offer_daily
+            WHERE (%(date_from)s::date IS NULL OR day >= %(date_from)s)
+              AND (%(date_to)s::date IS NULL OR day <= %(date_to)s)
+              AND (%(location_id)s::int IS NULL OR location_id = %(location_id)s)
+              AND (%(contract_id)s::int IS NULL OR contract_id = %(contract_id)s)
+            GROUP BY 1
+            HAVING SUM(offers) <> 0
+            ORDER BY 1
+            """,
+            {"date_from": date_from, "date_to": date_to, "location_id": location_id, "contract_id": contract_id},
+        )
+        return cur.fetchall()
+
+
+def skill_offers_per_month(
+    conn,
+    skill_id: int,
+    requirement_level: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> list[tuple[date, int]]:
+    """
+    [(month, offers)] of the distinct dated offers asking for a skill
+    (at `requirement_level`, or at any level)
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT DATE_TRUNC('month', day)::date AS month, SUM(offers)::bigint
+            FROM public.rollup_skill_daily
+            WHERE skill_id = %(skill_id)s
+              AND (%(level)s::text IS NULL OR requirement_level = %(level)s)
+              AND (%(date_from)s::date IS NULL OR day >= %(date_from)s)
+              AND (%(date_to)s::date IS NULL OR day <= %(date_to)s)
+            GROUP BY 1
+            HAVING SUM(offers) <> 0
+            ORDER BY 1
+            """,
+            {"skill_id": skill_id, "level": requirement_level, "date_from": date_from, "date_to": date_to},
+        )
+        return cur.fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Daily rollups maintenance")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--check", action="store_true", help="count the keys that disagree with the facts")
+    mode.add_argument("--rebuild", action="store_true", help="recompute the rollups from the facts")
+    mode.add_argument("--prune", action="store_true", help="delete the keys whose count fell to 0")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    conn = get_connection()
+    try:
+        if args.rebuild:
+            rebuild(conn)
+            logger.info("rollups rebuilt")
+        elif args.prune:
+            logger.info("%d rollup keys at 0 deleted", prune(conn))
+        logger.info("rollup keys differing from the facts: %s", check(conn))
+    finally:
+        conn.close()
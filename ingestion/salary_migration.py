@@ -0,0 +1,235 @@
+"""
+Online migration of job_offer.salary_min_annual / salary_max_annual from
+TEXT to DOUBLE PRECISION (databases created before the columns were numeric).
+
+`ALTER COLUMN ... TYPE` would rewrite the table under an ACCESS EXCLUSIVE
+lock, blocking ingestion and the API for the whole rewrite. Instead:
+1. prepare: add the numeric shadow columns (no rewrite) and a trigger
+   filling them on every insert / update of the TEXT columns,
+2. backfill: convert the existing rows by id range, one short
+   transaction per batch (row locks only, resumable, throttled),
+3. swap: a last catch-up pass, then one short transaction drops the TEXT
+   columns and renames the shadows in their place,
+4. index: build the salary indexes with CREATE INDEX CONCURRENTLY.
+Every DDL statement runs with a lock_timeout and is retried, so it never
+queues behind a long query and blocks everything behind it in turn.
+
+Stop the ingestion during the swap (or restart it after): statements
+prepared on pooled connections before it still expect TEXT parameters.
+
+Usage (from ingestion/):
+    python salary_migration.py                  # every step, in order
+    python salary_migration.py backfill --batch-size 5000 --pause 0.1
+"""
+import argparse
+import logging
+import time
+
+import psycopg2
+
+from config import settings
+from db import get_connection, run_ddl
+
+logger = logging.getLogger(__name__)
+
+# Text written by the TEXT-era loaders: str(float), e.g. "42000.0" or "1e+16"
+TO_NUMERIC_SQL = """
+CREATE OR REPLACE FUNCTION public.salary_text_to_float(value TEXT)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN btrim(value) ~ '^-?[0-9]+(\\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+        THEN btrim(value)::double precision
+    END
+$$;
+"""
+
+SYNC_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION public.job_offer_salary_sync()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.salary_min_annual_num := public.salary_text_to_float(NEW.salary_min_annual);
+    NEW.salary_max_annual_num := public.salary_text_to_float(NEW.salary_max_annual);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS job_offer_salary_sync ON public.job_offer;
+CREATE TRIGGER job_offer_salary_sync
+    BEFORE INSERT OR UPDATE OF salary_min_annual, salary_max_annual ON public.job_offer
+    FOR EACH ROW EXECUTE FUNCTION public.job_offer_salary_sync();
+"""
+
+SWAP_SQL = """
+DROP TRIGGER job_offer_salary_sync ON public.job_offer;
+-- SELECT * view (sql/schema.sql): depends on the dropped columns
+DROP VIEW IF EXISTS public.job_offer_distinct;
+ALTER TABLE public.job_offer
+    DROP COLUMN salary_min_annual,
+    DROP COLUMN salary_max_annual;
+ALTER TABLE public.job_offer RENAME COLUMN salary_min_annual_num TO salary_min_annual;
+ALTER TABLE public.job_offer RENAME COLUMN salary_max_annual_num TO salary_max_annual;
+CREATE VIEW public.job_offer_distinct AS
+SELECT *
+FROM public.job_offer
+WHERE canonical_offer_id IS NULL OR canonical_offer_id = id;
+DROP FUNCTION public.job_offer_salary_sync();
+DROP FUNCTION public.salary_text_to_float(TEXT);
+"""
+
+# Same definitions as sql/schema.sql
+INDEXES = {
+    "idx_job_offer_salary_min": "job_offer (salary_min_annual) WHERE salary_min_annual IS NOT NULL",
+    "idx_job_offer_salary_max": "job_offer (salary_max_annual) WHERE salary_max_annual IS NOT NULL",
+}
+
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def column_type(conn, column: str) -> str | None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'job_offer' AND column_name = %s
+            """,
+            (column,),
+        )
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def needs_migration(conn) -> bool:
+    return column_type(conn, "salary_min_annual") == "text"
+
+
+# ==================================================
+# Steps
+# ==================================================
+
+def prepare(conn) -> None:
+    run_ddl(
+        conn,
+        """
+        ALTER TABLE public.job_offer
+            ADD COLUMN IF NOT EXISTS salary_min_annual_num DOUBLE PRECISION,
+            ADD COLUMN IF NOT EXISTS salary_max_annual_num DOUBLE PRECISION;
+        """
+        + TO_NUMERIC_SQL
+        + SYNC_TRIGGER_SQL,
+    )
+    logger.info("shadow columns and sync trigger in place")
+
+
+def backfill(conn, batch_size: int = 5000, pause: float = 0.0) -> int:
+    """
+    Convert every row whose shadow columns are still empty, by id range;
+    return the number of rows updated. Safe to interrupt and rerun.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), -1) FROM public.job_offer")
+        first, last = cur.fetchone()
+    conn.commit()
+
+    updated = 0
+    for low in range(first, last + 1, batch_size):
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE public.job_offer
+                SET
+                    salary_min_annual_num = public.salary_text_to_float(salary_min_annual),
+                    salary_max_annual_num = public.salary_text_to_float(salary_max_annual)
+                WHERE id >= %s AND id < %s
+                  AND (
+                      (salary_min_annual_num IS NULL AND public.salary_text_to_float(salary_min_annual) IS NOT NULL)
+                      OR (salary_max_annual_num IS NULL AND public.salary_text_to_float(salary_max_annual) IS NOT NULL)
+                  )
+                """,
+                (low, low + batch_size),
+            )
+            updated += cur.rowcount
+        conn.commit()
+        if pause:
+            time.sleep(pause)
+        logger.debug("backfilled ids < %d (%d rows so far)", low + batch_size, updated)
+
+    logger.info("salary backfill: %d rows converted", updated)
+    return updated
+
+
+def swap(conn, batch_size: int = 5000) -> None:
+    # Rows written since the last backfill are covered by the trigger;
+    # this pass catches up on an interrupted or skipped backfill
+    backfill(conn, batch_size)
+    run_ddl(conn, SWAP_SQL)
+    logger.info("job_offer salary columns are now DOUBLE PRECISION")
+
+
+def create_indexes(conn) -> None:
+    conn.autocommit = True  # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    try:
+        with conn.cursor() as cur:
+            for name, definition in INDEXES.items():
+                # A failed concurrent build leaves an INVALID index behind
+                cur.execute(
+                    """
+                    SELECT NOT i.indisvalid
+                    FROM pg_index i
+                    JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = %s
+                    """,
+                    (name,),
+                )
+                row = cur.fetchone()
+                if row and row[0]:
+                    cur.execute(f"DROP INDEX CONCURRENTLY public.{name}")
+                cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON public.{definition}")
+                logger.info("index %s ready", name)
+    finally:
+        conn.autocommit = False
+
+
+def migrate(conn, batch_size: int = 5000, pause: float = 0.0) -> None:
+    if needs_migration(conn):
+        prepare(conn)
+        backfill(conn, batch_size, pause)
+        swap(conn, batch_size)
+    else:
+        logger.info("salary columns already numeric")
+    create_indexes(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the job_offer salary columns to numeric")
+    parser.add_argument("step", nargs="?", default="all", choices=["all", "prepare", "backfill", "swap", "index"])
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds between backfill batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.LOG_LEVEL)
+
+    conn = get_connection()
+    try:
+        if args.step == "all":
+            migrate(conn, args.batch_size, args.pause)
+        elif args.step == "index":
+            create_indexes(conn)
+        elif not needs_migration(conn):
+            logger.info("salary columns already numeric")
+        elif args.step == "prepare":
+            prepare(conn)
+        elif args.step == "backfill":
+            backfill(conn, args.batch_size, args.pause)
+        else:
+            swap(conn, args.batch_size)
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,104 @@
+"""
+Append-only spool of raw France Travail pages.
+
+Each run appends to ``<root>/run_date=YYYY-MM-DD/<run_id>.jsonl.gz``; every
+line is one API page: ``{"query": ..., "fetched_at": ..., "resultats": [...]}``.
+The spool can be replayed through preprocessing and loading with no network
+(see replay.py).
+"""
+import gzip
+import json
+import logging
+import threading
+import zlib
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_PREFIX = "run_date="
+
+
+class SpoolWriter:
+    def __init__(self, root: str | Path, run_id: str | None = None):
+        now = datetime.now(timezone.utc)
+        self.run_id = run_id or now.strftime("%Y%m%dT%H%M%SZ")
+        self.path = Path(root) / f"{_PARTITION_PREFIX}{now:%Y-%m-%d}" / f"{self.run_id}.jsonl.gz"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.pages = 0
+        self._lock = threading.Lock()
+        # "a": a new gzip member per run, the file stays one valid stream
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+
+    def write(self, query_key: str, page: list[dict]) -> None:
+        line = json.dumps(
+            {
+                "query": query_key,
+                "fetched_at": datetime.now(timezone.utc).isoformat(),
+                "resultats": page,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            # Sync-flush each page: a crash loses at most the page being written
+            self._file.flush()
+            self.pages += 1
+
+    def tee(self, pages: Iterable[list[dict]], query_key: str) -> Iterator[list[dict]]:
+        """
+        Spool every page while passing it through
+        """
+        for page in pages:
+            self.write(query_key, page)
+            yield page
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        logger.info("spooled %d pages to %s", self.pages, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==================================================
+# Reading
+# ==================================================
+
+def list_spool_files(
+    root: str | Path,
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> list[Path]:
+    """
+    Spool files whose run_date partition is within [date_from, date_to]
+    """
+    files = []
+    for partition in sorted(Path(root).glob(f"{_PARTITION_PREFIX}*")):
+        run_date = date.fromisoformat(partition.name[len(_PARTITION_PREFIX):])
+        if date_from and run_date < date_from:
+            continue
+        if date_to and run_date > date_to:
+            continue
+        files.extend(sorted(partition.glob("*.jsonl.gz")))
+    return files
+
+
+def iter_spool_pages(path: str | Path) -> Iterator[list[dict]]:
+    """
+    Yield the pages of one spool file; a truncated tail (crashed run) is skipped
+    """
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)["resultats"]
+                except json.JSONDecodeError:
+                    logger.warning("%s: skipping truncated page", path)
+    except (EOFError, zlib.error):
+        logger.warning("%s: truncated gzip stream, stopping", path)
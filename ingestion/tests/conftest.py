@@ -0,0 +1,36 @@
+"""
+Tests of the ingestion package (run from ingestion/: python -m pytest tests).
+
+The database tests truncate the job market tables: they only run when
+TEST_DB_NAME names a scratch database with sql/schema.sql applied
+(DB_HOST / DB_USER / DB_PASSWORD / DB_SSLMODE as for the ingestion).
+"""
+import os
+import sys
+
+import pytest
+
+# Flat imports, as when running the ingestion scripts from ingestion/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if os.getenv("TEST_DB_NAME"):
+    os.environ["DB_NAME"] = os.environ["TEST_DB_NAME"]
+
+
+@pytest.fixture
+def db():
+    """
+    Connection to the emptied scratch database
+    """
+    if not os.getenv("TEST_DB_NAME"):
+        pytest.skip("TEST_DB_NAME is not set (scratch database)")
+    from benchmarks.runner import reset_tables
+    from db import get_connection
+
+    reset_tables()
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
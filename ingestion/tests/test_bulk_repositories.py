@@ -0,0 +1,51 @@
+import threading
+
+from bulk_repositories import upsert_contracts, upsert_industries, upsert_locations
+from db import get_connection
+
+
+def _upsert_behind_concurrent_insert(db, upsert, keys, insert_sql, params):
+    """
+    Run `upsert(keys)` while another transaction holds an uncommitted
+    insert of the same key, committed once the upsert waits on it
+    """
+    other = get_connection()
+    result = {}
+    try:
+        with other.cursor() as cur:
+            cur.execute(insert_sql, params)
+        worker = threading.Thread(target=lambda: result.update(ids=upsert(db, keys)))
+        worker.start()
+        # The upsert waits on the conflicting row lock until `other` commits
+        worker.join(timeout=1)
+        assert worker.is_alive()
+        other.commit()
+        worker.join(timeout=10)
+        assert not worker.is_alive()
+    finally:
+        other.close()
+    return result["ids"]
+
+
+def test_upsert_industries_returns_keys_committed_concurrently(db):
+    ids = _upsert_behind_concurrent_insert(
+        db, upsert_industries, {"Conseil", "Banque"},
+        "INSERT INTO public.industry (name) VALUES (%s)", ("Conseil",),
+    )
+    assert set(ids) == {"Conseil", "Banque"}
+
+
+def test_upsert_contracts_returns_keys_committed_concurrently(db):
+    ids = _upsert_behind_concurrent_insert(
+        db, upsert_contracts, {"CDI"},
+        "INSERT INTO public.contract (type_contrat) VALUES (%s)", ("CDI",),
+    )
+    assert set(ids) == {"CDI"}
+
+
+def test_upsert_locations_returns_keys_committed_concurrently(db):
+    ids = _upsert_behind_concurrent_insert(
+        db, upsert_locations, {("Lyon", "69001"): (45.76, 4.83), ("Nantes", "44000"): (None, None)},
+        "INSERT INTO public.location (ville, code_postal) VALUES (%s, %s)", ("Lyon", "69001"),
+    )
+    assert set(ids) == {("Lyon", "69001"), ("Nantes", "44000")}
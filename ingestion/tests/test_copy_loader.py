@@ -0,0 +1,31 @@
+import threading
+
+from benchmarks.synthetic import generate_ft_items
+from copy_loader import STAGING_DDL, load_offers_copy
+from db import get_connection
+from ingest import preprocess_ft
+
+
+def test_copy_load_does_not_wait_for_another_staging_transaction(db):
+    other = get_connection()
+    try:
+        # Another load in progress: staging tables in use, not committed yet
+        with other.cursor() as cur:
+            cur.execute(STAGING_DDL)
+            cur.execute("INSERT INTO stg_job_offer (seq, url, company, city, postal_code) VALUES (0, 'u', 'c', 'v', '00')")
+
+        worker = threading.Thread(target=load_offers_copy, args=(db, preprocess_ft(generate_ft_items(50))))
+        worker.start()
+        worker.join(timeout=30)
+        assert not worker.is_alive()
+        db.commit()
+    finally:
+        other.rollback()
+        other.close()
+
+    with db.cursor() as cur:
+        cur.execute("SELECT count(*) FROM public.job_offer")
+        assert cur.fetchone()[0] == 50
+        # Dropped at commit
+        cur.execute("SELECT to_regclass('stg_job_offer')")
+        assert cur.fetchone()[0] is None
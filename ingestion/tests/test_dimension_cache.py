@@ -0,0 +1,47 @@
+from dimension_cache import DimensionCaches
+from repositories import get_or_create_company, get_or_create_skill
+
+
+def _legacy_duplicates(conn) -> None:
+    """
+    Rows created before the aliases, canonicalized like sql/schema.sql does:
+    the oldest row of each key is canonical
+    """
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO public.company (name) VALUES ('ACME'), ('Acme SAS'), ('Globex')")
+        cur.execute(
+            "INSERT INTO public.skill (name, category) VALUES "
+            "('Node.js', 'hard'), ('NodeJS', 'hard'), ('Anglais', 'language')"
+        )
+        cur.execute(
+            """
+            INSERT INTO public.company_alias (alias, company_id, similarity)
+            SELECT DISTINCT ON (company_key(name)) company_key(name), id, 1
+            FROM public.company
+            ORDER BY company_key(name), id
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO public.skill_alias (alias, category, skill_id, similarity)
+            SELECT DISTINCT ON (skill_key(name), category) skill_key(name), category, id, 1
+            FROM public.skill
+            ORDER BY skill_key(name), category, id
+            """
+        )
+
+
+def test_warmed_names_resolve_to_their_canonical_row(db):
+    _legacy_duplicates(db)
+
+    caches = DimensionCaches()
+    caches.warm(db)
+    companies, skills = caches["company"], caches["skill"]
+
+    for name in ("ACME", "Acme SAS", "Globex"):
+        assert companies.get(name) == get_or_create_company(db, name)
+    assert companies.get("Acme SAS") == companies.get("ACME")
+
+    for key in (("Node.js", "hard"), ("NodeJS", "hard"), ("Anglais", "language")):
+        assert skills.get(key) == get_or_create_skill(db, *key)
+    assert skills.get(("NodeJS", "hard")) == skills.get(("Node.js", "hard"))
@@ -0,0 +1,108 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from benchmarks.stub_ft_api import StubFranceTravail
+from benchmarks.synthetic import generate_ft_items
+from ft_client import FranceTravailClient
+
+
+class _CountingBucket:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self) -> None:
+        self.acquired += 1
+
+
+def _client(stub: StubFranceTravail, url: str) -> FranceTravailClient:
+    client = FranceTravailClient(
+        client_id="id", client_secret="secret", token_url=stub.token_url, search_url=url,
+    )
+    client.limiter = _CountingBucket()
+    return client
+
+
+def _search(client: FranceTravailClient) -> list[dict]:
+    return [o for page in client.search_pages({}, max_results=100, concurrency=1) for o in page]
+
+
+def test_revoked_token_is_refreshed_and_the_request_resent():
+    with StubFranceTravail(generate_ft_items(100), token_ttl=3600) as stub:
+        url = stub.start()
+        client = _client(stub, url)
+        assert len(_search(client)) == 100
+
+        stub._tokens.clear()
+        assert len(_search(client)) == 100
+
+    assert stub.unauthorized == 1
+    assert stub.token_requests == 2
+
+
+def test_401_retry_goes_through_the_limiter_and_the_metrics():
+    with StubFranceTravail(generate_ft_items(100), token_ttl=3600) as stub:
+        url = stub.start()
+        client = _client(stub, url)
+        client.access_token()
+        stub._tokens.clear()
+
+        assert len(_search(client)) == 100
+
+    # 401 + resent request, each recorded once and each paying a token
+    assert client.limiter.acquired == 2
+    assert client.metrics()["search"]["calls"] == 2
+    assert client.metrics()["search"]["errors"] == 1
+    assert client.metrics()["token"]["calls"] == 2
+
+
+def test_second_401_is_returned_not_retried_again():
+    with StubFranceTravail(generate_ft_items(10), token_ttl=0) as stub:
+        url = stub.start()
+        client = _client(stub, url)
+        with pytest.raises(requests.HTTPError) as e:
+            _search(client)
+
+    assert e.value.response.status_code == 401
+    assert stub.unauthorized == 2
+
+
+class _ChunkedGzipHandler(BaseHTTPRequestHandler):
+    """
+    Gzipped body sent in chunks: no Content-Length
+    """
+    protocol_version = "HTTP/1.1"
+    body = b'{"resultats": []}' * 200
+
+    def do_GET(self):
+        data = gzip.compress(self.body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(data), 16):
+            part = data[i:i + 16]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_chunked_response_bytes_are_counted():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChunkedGzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+    try:
+        client = FranceTravailClient(client_id="id", client_secret="secret", search_url=url)
+        resp = client.session.get(url)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "Content-Length" not in resp.headers
+    assert client.metrics()["search"]["bytes"] == len(_ChunkedGzipHandler.body)
@@ -0,0 +1,113 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+import preprocessing
+from benchmarks.synthetic import generate_ft_items
+from ft_columnar import preprocess_ft_columnar
+from ingest import preprocess_ft_rows
+
+
+def _offer(n: int, **fields) -> dict:
+    item = {
+        "id": f"T{n:03d}",
+        "intitule": f"Offre {n}",
+        "description": "Description",
+        "dateCreation": "2024-03-05T10:00:00.000Z",
+        "entreprise": {"nom": "ACME"},
+        "typeContratLibelle": "CDI",
+        "salaire": {"libelle": "Annuel de 40000 Euros à 50000 Euros"},
+        "lieuTravail": {"libelle": "75 - Paris"},
+    }
+    item.update(fields)
+    return {k: v for k, v in item.items() if v is not ...}
+
+
+EDGE_CASES = [
+    # Missing nested objects
+    _offer(1, salaire=...),
+    _offer(2, lieuTravail=...),
+    _offer(3, salaire={}, lieuTravail={}),
+    _offer(4, origineOffre={"urlOrigine": "https://example.org/4"}, entreprise=...),
+    # Salaries
+    _offer(5, salaire={"libelle": "0"}),
+    _offer(6, salaire={"libelle": "Mensuel de 0 Euros"}),
+    _offer(7, salaire={"libelle": "Horaire de 11.65 Euros sur 35 heures"}),
+    _offer(8, salaire={"libelle": "Mensuel de 2000.00 Euros à 2500.00 Euros sur 12 mois"}),
+    _offer(9, salaire={"libelle": "Mensuel de 1800 Euros sur 13.5 mois"}),
+    _offer(10, salaire={"libelle": "Annuel de 35k€ à 45k€"}),
+    _offer(11, salaire={"libelle": "45 k€"}),
+    _offer(12, salaire={"libelle": "Selon profil"}),
+    _offer(13, salaire={"libelle": ""}),
+    # Locations: Corsica, overseas departments, arrondissements
+    _offer(14, lieuTravail={"libelle": "2A - Ajaccio"}),
+    _offer(15, lieuTravail={"libelle": "2B - BASTIA"}),
+    _offer(16, lieuTravail={"libelle": "971 - Pointe-à-Pitre"}),
+    _offer(17, lieuTravail={"libelle": "974 - Saint-Denis"}),
+    _offer(18, lieuTravail={"libelle": "976 - Mamoudzou"}),
+    _offer(19, lieuTravail={"libelle": "69 - Lyon 3e Arrondissement"}),
+    _offer(20, lieuTravail={"libelle": "13 - Arrondissement"}),
+    _offer(21, lieuTravail={"libelle": "75 - "}),
+    _offer(22, lieuTravail={"libelle": "75 - ,"}),
+    _offer(23, lieuTravail={"libelle": "75 - Paris 9e Arrondissement"}),
+    _offer(24, lieuTravail={"libelle": "Île-de-France"}),
+    # Skills and languages
+    _offer(25, competences=[
+        {"libelle": "Python", "exigence": "E"},
+        {"libelle": "SQL", "exigence": "S"},
+        {"libelle": "Docker", "exigence": "X"},
+        {"libelle": "Git"},
+    ]),
+    _offer(26, langues=[{"libelle": "Anglais", "exigence": "E"}, {"libelle": "Allemand", "exigence": None}]),
+    _offer(27, competences=None, langues="Anglais", qualitesProfessionnelles=[{"libelle": "Rigueur"}]),
+    _offer(28, formations=[{"libelle": "Bac+5"}, {"niveauLibelle": "Bac"}]),
+    # Dates
+    _offer(29, dateCreation=None),
+    _offer(30, dateCreation=...),
+]
+
+
+@pytest.fixture
+def dept_geo(tmp_path, monkeypatch):
+    """
+    Small department referential (one department without coordinates)
+    """
+    csv_path = tmp_path / "departements.csv"
+    csv_path.write_text(
+        "dep_code,dep_nom,latitude_mairie,longitude_mairie\n"
+        "75,Paris,48.8566,2.3522\n"
+        "2A,Corse-du-Sud,41.9192,8.7386\n"
+        "971,Guadeloupe,,\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setenv("DEPT_GEO_CSV", str(csv_path))
+    monkeypatch.setattr(preprocessing, "_DEPT_GEO", None)
+    yield
+    preprocessing.clear_parser_caches()
+
+
+def _assert_same(items: list[dict]) -> None:
+    assert_frame_equal(preprocess_ft_columnar(items), preprocess_ft_rows(items))
+
+
+@pytest.mark.parametrize("item", EDGE_CASES, ids=lambda item: item["id"])
+def test_columnar_matches_rows_on_edge_case(item):
+    _assert_same([item])
+
+
+def test_columnar_matches_rows_on_mixed_batch():
+    # Same values at several positions: exercises the parse-once broadcast
+    _assert_same(EDGE_CASES + EDGE_CASES[::-1])
+
+
+def test_columnar_matches_rows_with_dept_referential(dept_geo):
+    # Coordinates joined, empty cities replaced by the department name
+    _assert_same(EDGE_CASES)
+    assert preprocess_ft_columnar([_offer(1, lieuTravail={"libelle": "75 - ,"})])["city"].tolist() == ["Paris"]
+
+
+def test_columnar_matches_rows_on_synthetic_offers():
+    _assert_same(generate_ft_items(500, seed=7))
+
+
+def test_empty_batch():
+    assert_frame_equal(preprocess_ft_columnar([]), preprocess_ft_rows([]))
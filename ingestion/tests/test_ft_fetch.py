@@ -0,0 +1,158 @@
+import time
+from dataclasses import replace
+
+import pytest
+import requests
+
+import ft_fetch
+from benchmarks.stub_ft_api import StubFranceTravail
+from benchmarks.synthetic import generate_ft_items
+from ft_fetch import TokenBucket, fetch_ranges, new_session, request_with_retry
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Backoff waits of request_with_retry (recorded, not slept)
+    """
+    waits = []
+    monkeypatch.setattr(ft_fetch.time, "sleep", waits.append)
+    return waits
+
+
+def _stub(n: int = 10, **kwargs) -> tuple[StubFranceTravail, str]:
+    stub = StubFranceTravail(generate_ft_items(n), **kwargs)
+    return stub, stub.start()
+
+
+# ==================================================
+# Retries
+# ==================================================
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_transient_429_and_503_are_retried_until_every_page_is_fetched(seed, sleeps):
+    stub, url = _stub(1000, fail_rate=0.3, retry_after=0.01, seed=seed)
+    with stub:
+        items = fetch_ranges(
+            new_session(), url, params={}, headers={}, step=150, max_results=1000,
+            concurrency=4, max_retries=10,
+        )
+    assert stub.failures > 0
+    assert len(sleeps) == stub.failures
+    assert [i["id"] for i in items] == [i["id"] for i in stub.items]
+
+
+def test_retry_after_is_honored(sleeps):
+    stub, url = _stub(fail_rate=1.0, retry_after=2.5)
+    with stub, pytest.raises(requests.HTTPError) as exc:
+        request_with_retry(new_session(), "GET", url, max_retries=3, backoff=0.01, params={"range": "0-9"})
+    assert exc.value.response.status_code in (429, 503)
+    # One wait per retry, never shorter than Retry-After
+    assert len(sleeps) == 3
+    assert all(w >= 2.5 for w in sleeps)
+
+
+def test_retries_give_up_after_max_retries(sleeps):
+    stub, url = _stub(fail_rate=1.0, retry_after=0)
+    with stub, pytest.raises(requests.HTTPError):
+        request_with_retry(new_session(), "GET", url, max_retries=2, params={"range": "0-9"})
+    assert stub.requests == 3
+
+
+def test_backoff_is_capped_exponential_jitter(sleeps):
+    stub, url = _stub(fail_rate=1.0, retry_after=0)
+    with stub, pytest.raises(requests.HTTPError):
+        request_with_retry(
+            new_session(), "GET", url, max_retries=6, backoff=0.5, max_backoff=4.0, params={"range": "0-9"},
+        )
+    assert [w <= min(4.0, 0.5 * 2 ** attempt) for attempt, w in enumerate(sleeps)] == [True] * 6
+
+
+def test_client_errors_are_not_retried(sleeps):
+    stub, url = _stub()
+    with stub, pytest.raises(requests.HTTPError) as exc:
+        request_with_retry(new_session(), "GET", url, params={"range": "0-500"})
+    assert exc.value.response.status_code == 400
+    assert stub.requests == 1
+    assert sleeps == []
+
+
+def test_retry_after_http_date():
+    resp = requests.Response()
+    resp.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert ft_fetch._retry_after(resp) == 0.0
+    resp.headers["Retry-After"] = "not a date"
+    assert ft_fetch._retry_after(resp) is None
+
+
+# ==================================================
+# Timeouts
+# ==================================================
+
+def test_stalled_request_times_out_and_is_retried():
+    stub, url = _stub(stall=5.0, stalled_requests=1)
+    with stub:
+        t0 = time.monotonic()
+        resp = request_with_retry(new_session(), "GET", url, backoff=0.01, timeout=0.2, params={"range": "0-9"})
+        elapsed = time.monotonic() - t0
+    assert resp.status_code == 200
+    assert stub.requests == 2
+    assert elapsed < 2.0
+
+
+def test_stalled_requests_raise_after_the_last_retry():
+    stub, url = _stub(stall=5.0, stalled_requests=10)
+    with stub, pytest.raises(requests.Timeout):
+        request_with_retry(new_session(), "GET", url, max_retries=1, backoff=0.01, timeout=0.2, params={"range": "0-9"})
+    assert stub.requests == 2
+
+
+def test_default_timeout_comes_from_settings(monkeypatch):
+    seen = {}
+
+    class Session:
+        def request(self, method, url, **kwargs):
+            seen.update(kwargs)
+            resp = requests.Response()
+            resp.status_code = 200
+            return resp
+
+    monkeypatch.setattr(ft_fetch, "settings", replace(ft_fetch.settings, FT_CONNECT_TIMEOUT=1.5, FT_READ_TIMEOUT=7.0))
+    request_with_retry(Session(), "GET", "http://stub")
+    assert seen["timeout"] == (1.5, 7.0)
+
+
+# ==================================================
+# Rate limit
+# ==================================================
+
+def test_token_bucket_spaces_requests_at_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    t0 = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    # The first token is there, the next ten take 1/20 s each
+    assert 0.45 <= time.monotonic() - t0 < 1.0
+
+
+def test_token_bucket_allows_a_burst_up_to_capacity():
+    bucket = TokenBucket(rate=1, capacity=5)
+    t0 = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - t0 < 0.1
+
+
+def test_concurrent_pages_stay_under_the_rate_limit():
+    stub, url = _stub(1500)
+    with stub:
+        t0 = time.monotonic()
+        items = fetch_ranges(
+            new_session(), url, params={}, headers={}, step=150, max_results=1500,
+            concurrency=8, limiter=TokenBucket(rate=20, capacity=1),
+        )
+        elapsed = time.monotonic() - t0
+    assert len(items) == 1500
+    # 10 pages, 1 token in the bucket: 9 waits of 1/20 s
+    assert stub.requests == 10
+    assert elapsed >= 0.45
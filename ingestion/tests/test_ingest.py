@@ -0,0 +1,94 @@
+import psycopg2
+import pytest
+
+import ingest
+
+
+@pytest.fixture
+def failing_run(monkeypatch):
+    """
+    ingest_ft_to_postgres with a pipeline failing mid-run, no database
+    """
+    closed = []
+
+    def run_pipeline(*args, **kwargs):
+        raise ValueError("chunk rejected")
+
+    run = {"id": 7, "params": {"search": {}, "max_results": 10}, "next_offset": 0}
+    monkeypatch.setattr(ingest, "_open_run", lambda *args: run)
+    monkeypatch.setattr(ingest, "iter_ft_pages", lambda *args, **kwargs: iter(()))
+    monkeypatch.setattr(ingest, "run_pipeline", run_pipeline)
+    monkeypatch.setattr(ingest, "default_index", lambda: None)
+    monkeypatch.setattr(ingest, "save_default_index", lambda: None)
+    monkeypatch.setattr(ingest, "_log_client_metrics", lambda client: None)
+    monkeypatch.setattr(ingest, "_close_run", lambda *args, **kwargs: closed.append((args, kwargs)))
+    return closed
+
+
+def test_failed_run_is_closed_with_the_error(failing_run):
+    with pytest.raises(ValueError, match="chunk rejected"):
+        ingest.ingest_ft_to_postgres("data", spool_dir=None, client=object())
+
+    [(args, kwargs)] = failing_run
+    assert args[0] == 7
+    assert kwargs == {"error": "ValueError('chunk rejected')"}
+
+
+def test_ledger_failure_does_not_mask_the_original_error(failing_run, monkeypatch, caplog):
+    def close_run(*args, **kwargs):
+        raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    monkeypatch.setattr(ingest, "_close_run", close_run)
+
+    with pytest.raises(ValueError, match="chunk rejected"):
+        ingest.ingest_ft_to_postgres("data", spool_dir=None, client=object())
+
+    assert "could not mark run 7 as failed" in caplog.text
+
+
+@pytest.fixture
+def recorded_pages(db, monkeypatch):
+    """
+    Arguments of each iter_ft_pages call of ingest_ft_to_postgres, which
+    loads nothing; the query's ledger starts empty
+    """
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM public.ingest_run WHERE query_key = %s", (ingest.Query("data").key,))
+    db.commit()
+
+    calls = []
+
+    def iter_ft_pages(search, **kwargs):
+        calls.append((search, kwargs))
+        return iter(())
+
+    monkeypatch.setattr(ingest, "iter_ft_pages", iter_ft_pages)
+    monkeypatch.setattr(ingest, "default_index", lambda: None)
+    monkeypatch.setattr(ingest, "save_default_index", lambda: None)
+    monkeypatch.setattr(ingest, "_log_client_metrics", lambda client: None)
+    return calls
+
+
+def test_resumed_run_replays_the_recorded_search(db, recorded_pages, monkeypatch):
+    # A non-incremental run fixes its date window too
+    def search_params(since, until):
+        return ingest.ft_search_params("data", min_creation_date=since, max_creation_date=until)
+
+    run = ingest._open_run(ingest.Query("data").key, search_params, 600, False, False)
+    search = run["params"]["search"]
+    assert search["maxCreationDate"] and search["minCreationDate"]
+
+    ingest.checkpoint_ingest_run(db, run["id"], 170, None)
+    db.commit()
+
+    # Offers published since the interruption: a fresh window would differ
+    later = ingest.datetime(2099, 1, 1, tzinfo=ingest.timezone.utc)
+    monkeypatch.setattr(ingest, "datetime", type("datetime", (), {"now": staticmethod(lambda tz: later)}))
+
+    stats = ingest.ingest_ft_to_postgres("data", max_results=300, spool_dir=None, client=object(), resume=True)
+
+    [(params, kwargs)] = recorded_pages
+    assert stats["run_id"] == run["id"]
+    assert params == search
+    assert kwargs["max_results"] == 600
+    assert kwargs["start"] == stats["start_offset"] == 150
@@ -0,0 +1,87 @@
+import pytest
+
+import link_sync
+from link_sync import diff_links, sync_job_offer_skills
+
+
+@pytest.mark.parametrize(
+    "existing, desired, expected",
+    [
+        pytest.param({}, {}, ([], [], []), id="nothing"),
+        pytest.param(
+            {(1, 10): "required"},
+            {(1, 10): "required"},
+            ([], [], []),
+            id="unchanged",
+        ),
+        pytest.param(
+            {},
+            {(1, 10): "required", (1, 11): "optional"},
+            ([(1, 10, "required"), (1, 11, "optional")], [], []),
+            id="added",
+        ),
+        pytest.param(
+            {(1, 10): "required", (2, 10): "optional"},
+            {},
+            ([], [(1, 10), (2, 10)], []),
+            id="removed",
+        ),
+        pytest.param(
+            {(1, 10): "required"},
+            {(1, 10): "optional"},
+            ([], [], [(1, 10, "optional")]),
+            id="level changed",
+        ),
+        pytest.param(
+            {(1, 10): "required", (1, 11): "optional", (2, 12): "required"},
+            {(1, 10): "required", (1, 11): "required", (1, 13): "optional"},
+            ([(1, 13, "optional")], [(2, 12)], [(1, 11, "required")]),
+            id="mixed",
+        ),
+    ],
+)
+def test_diff_links(existing, desired, expected):
+    assert diff_links(existing, desired) == expected
+
+
+@pytest.fixture
+def links(monkeypatch):
+    """
+    In-memory job_offer_skill behind sync_job_offer_skills, no database
+    """
+    table = {(1, 10): "required", (1, 11): "optional", (2, 12): "required", (3, 13): "required"}
+
+    def fetch(conn, job_offer_ids):
+        return {key: level for key, level in table.items() if key[0] in job_offer_ids}
+
+    def link(conn, rows):
+        for job_offer_id, skill_id, level in rows:
+            assert (job_offer_id, skill_id) not in table
+            table[job_offer_id, skill_id] = level
+
+    def delete(conn, keys):
+        for key in keys:
+            del table[key]
+
+    def update(conn, rows):
+        for job_offer_id, skill_id, level in rows:
+            table[job_offer_id, skill_id] = level
+
+    monkeypatch.setattr(link_sync, "fetch_job_offer_skills", fetch)
+    monkeypatch.setattr(link_sync, "link_job_offer_skills", link)
+    monkeypatch.setattr(link_sync, "delete_job_offer_skills", delete)
+    monkeypatch.setattr(link_sync, "update_job_offer_skill_levels", update)
+    return table
+
+
+def test_sync_job_offer_skills(links):
+    counts = sync_job_offer_skills(None, {1: {10: "required", 11: "required", 14: "optional"}, 2: {}})
+
+    assert counts == {"inserted": 1, "deleted": 1, "updated": 1, "unchanged": 1}
+    assert links == {
+        (1, 10): "required",
+        (1, 11): "required",
+        (1, 14): "optional",
+        # Offers not given keep their links
+        (3, 13): "required",
+    }
@@ -0,0 +1,76 @@
+import pytest
+
+import rollups
+from benchmarks.synthetic import generate_ft_items
+from ingest import preprocess_ft
+from db import get_connection, pool_capacity, resize_pool
+from loaders import LOADERS, load_offers_parallel
+
+MISDATED_LINKS_SQL = """
+SELECT count(*)
+FROM public.job_offer_skill jos
+JOIN public.job_offer jo ON jo.id = jos.job_offer_id
+WHERE jos.date_posted IS DISTINCT FROM jo.date_posted
+"""
+
+
+def _load(conn, loader: str, items: list[dict]) -> None:
+    LOADERS[loader](conn, preprocess_ft(items))
+    conn.commit()
+
+
+def _assert_links_follow_offers(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(MISDATED_LINKS_SQL)
+        assert cur.fetchone()[0] == 0
+    assert rollups.check(conn) == {"rollup_offer_daily": 0, "rollup_skill_daily": 0}
+    conn.commit()
+
+
+@pytest.mark.parametrize("loader", sorted(LOADERS))
+def test_links_move_with_an_offer_that_gets_a_date(db, loader):
+    items = generate_ft_items(40, seed=3)
+    undated = [{**item, "dateCreation": None} for item in items]
+
+    _load(db, loader, undated)
+    with db.cursor() as cur:
+        cur.execute("SELECT count(*) FROM public.job_offer_skill WHERE date_posted IS NULL")
+        assert cur.fetchone()[0] > 0
+    db.commit()
+
+    # NULL -> date: the foreign key does not cascade from a NULL date
+    _load(db, loader, items)
+    _assert_links_follow_offers(db)
+
+    # date -> NULL -> date again
+    _load(db, loader, undated)
+    _assert_links_follow_offers(db)
+    _load(db, loader, items)
+    _assert_links_follow_offers(db)
+
+
+@pytest.fixture
+def pool_of():
+    """
+    Resize the process pool for one test, then restore its size
+    """
+    size = pool_capacity()
+    yield resize_pool
+    resize_pool(size)
+
+
+def test_parallel_loader_fails_fast_on_a_too_small_pool(pool_of):
+    pool_of(8)
+    with pytest.raises(ValueError, match="8 workers need 9 connections"):
+        load_offers_parallel(None, preprocess_ft(generate_ft_items(10)), workers=8)
+
+
+def test_parallel_loader_fits_in_workers_plus_one_connections(db, pool_of):
+    # The fixture's connection belongs to the replaced pool
+    pool_of(5)
+    conn = get_connection()
+    try:
+        load_offers_parallel(conn, preprocess_ft(generate_ft_items(200, seed=5)), workers=4, batch_size=20)
+        _assert_links_follow_offers(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,177 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_ft_items
+from ingest import preprocess_ft
+from loaders import LOADERS
+from near_dup import MinHasher, NearDuplicateIndex, StagedOffers, shingle_batch, tag_near_duplicates
+
+TEXTS = [
+    "Data engineer H/F Nous recherchons un data engineer pour construire nos pipelines Spark et Airflow",
+    "Développeur Python Django pour une équipe produit à Lyon, télétravail partiel possible",
+    "Comptable expérimenté pour un cabinet d'expertise à Bordeaux, CDI temps plein",
+]
+
+
+def _index_with(offer_ids: list[int], texts: list[str]) -> NearDuplicateIndex:
+    index = NearDuplicateIndex(threshold=0.5)
+    _, staged = index.assign(offer_ids, texts)
+    index.apply(staged)
+    return index
+
+
+# ==================================================
+# Signatures and assignment
+# ==================================================
+
+def test_signatures_are_deterministic():
+    first = MinHasher(seed=1).signatures(*shingle_batch(TEXTS))
+    again = MinHasher(seed=1).signatures(*shingle_batch(list(TEXTS)))
+    assert first.dtype == np.uint32 and first.shape == (3, 64)
+    assert np.array_equal(first, again)
+    # One text alone, or in a batch: same signature
+    assert np.array_equal(MinHasher(seed=1).signatures(*shingle_batch(TEXTS[1:2]))[0], first[1])
+    assert not np.array_equal(MinHasher(seed=2).signatures(*shingle_batch(TEXTS)), first)
+
+
+def test_signature_of_short_and_empty_texts():
+    sigs = MinHasher().signatures(*shingle_batch(["Python", "", None, "Python"]))
+    assert np.array_equal(sigs[0], sigs[3])
+    assert (sigs[1] == np.iinfo(np.uint32).max).all()
+    assert (sigs[2] == np.iinfo(np.uint32).max).all()
+
+
+def test_near_identical_text_maps_to_the_earlier_offer():
+    index = _index_with([10, 11], TEXTS[:2])
+    repost = TEXTS[0] + " Poste à pourvoir rapidement"
+
+    canonical, staged = index.assign([20, 21], [repost, TEXTS[2]])
+    assert canonical == [10, 21]
+    assert staged.ids == [21]
+
+
+def test_duplicates_within_one_batch():
+    index = NearDuplicateIndex(threshold=0.5)
+    canonical, staged = index.assign([1, 2, 3], [TEXTS[0], TEXTS[1], TEXTS[0] + " (H/F)"])
+    assert canonical == [1, 2, 1]
+    assert staged.ids == [1, 2]
+
+
+def test_nothing_is_indexed_before_apply():
+    index = NearDuplicateIndex(threshold=0.5)
+    index.assign([1], TEXTS[:1])
+    assert len(index) == 0
+    assert index.assign([2], TEXTS[:1])[0] == [2]
+
+
+def test_canonical_offer_seen_again_stays_canonical():
+    index = _index_with([10], TEXTS[:1])
+    assert index.assign([10], [TEXTS[1]])[0] == [10]
+
+
+# ==================================================
+# Persistence
+# ==================================================
+
+def test_save_open_round_trip(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = _index_with(list(range(1, 4)), TEXTS)
+    index.save(path)
+
+    loaded = NearDuplicateIndex.open(path)
+    assert len(loaded) == 3
+    assert loaded.params == index.params
+    assert loaded.threshold == index.threshold
+    assert np.array_equal(loaded._sigs[:3], index._sigs[:3])
+    repost = TEXTS[1] + " Poste à pourvoir rapidement"
+    assert loaded.assign([9], [repost])[0] == index.assign([9], [repost])[0] == [2]
+
+
+def test_open_missing_file_gives_an_empty_index(tmp_path):
+    assert len(NearDuplicateIndex.open(str(tmp_path / "missing.npz"))) == 0
+
+
+def test_concurrent_runs_merge_their_additions(tmp_path):
+    path = str(tmp_path / "index.npz")
+    _index_with([1], TEXTS[:1]).save(path)
+
+    # Two runs started from the same file
+    first, second = NearDuplicateIndex.open(path), NearDuplicateIndex.open(path)
+    _, staged = first.assign([2], TEXTS[1:2])
+    first.apply(staged)
+    _, staged = second.assign([3], TEXTS[2:3])
+    second.apply(staged)
+
+    first.save_merged(path)
+    second.save_merged(path)
+
+    saved = NearDuplicateIndex.open(path)
+    assert sorted(saved._ids.tolist()) == [1, 2, 3]
+    # The second run continues from the merged index
+    assert len(second) == 3
+
+
+def test_save_merged_without_additions_keeps_the_file(tmp_path):
+    path = str(tmp_path / "index.npz")
+    _index_with([1, 2], TEXTS[:2]).save(path)
+    stale = NearDuplicateIndex()
+
+    stale.save_merged(path)
+    assert len(NearDuplicateIndex.open(path)) == 2
+
+
+def test_offer_added_by_both_runs_is_stored_once(tmp_path):
+    path = str(tmp_path / "index.npz")
+    first, second = NearDuplicateIndex.open(path), NearDuplicateIndex.open(path)
+    sig = first.hasher.signatures(*shingle_batch(TEXTS[:1]))
+    for index in (first, second):
+        staged = StagedOffers()
+        staged.add(1, sig[0], index.band_keys(sig)[0])
+        index.apply(staged)
+
+    first.save_merged(path)
+    second.save_merged(path)
+    assert NearDuplicateIndex.open(path)._ids.tolist() == [1]
+
+
+# ==================================================
+# Tagging (database)
+# ==================================================
+
+def _load_and_tag(conn, loader: str, index: NearDuplicateIndex, items: list[dict]) -> dict[str, str]:
+    """
+    {url: url of its canonical offer} after loading and tagging `items`
+    """
+    df = preprocess_ft(items)
+    LOADERS[loader](conn, df)
+    staged = tag_near_duplicates(conn, index, df["url"].tolist())
+    conn.commit()
+    index.apply(staged)
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT jo.url, c.url
+            FROM public.job_offer jo
+            LEFT JOIN public.job_offer c ON c.id = jo.canonical_offer_id
+            """
+        )
+        canonical = dict(cur.fetchall())
+    conn.commit()
+    return canonical
+
+
+@pytest.mark.parametrize("loader", ["row", "batch", "copy"])
+def test_edited_offer_is_tagged_again(db, loader):
+    original, repost = generate_ft_items(2, seed=11)
+    repost = {**repost, "intitule": original["intitule"], "description": original["description"]}
+    index = NearDuplicateIndex()
+
+    canonical = _load_and_tag(db, loader, index, [original, repost])
+    url, repost_url = (preprocess_ft([item])["url"][0] for item in (original, repost))
+    assert canonical[repost_url] == url
+
+    # The repost is rewritten into another job: no longer a duplicate
+    edited = {**repost, "description": TEXTS[2]}
+    canonical = _load_and_tag(db, loader, index, [edited])
+    assert canonical[repost_url] == repost_url
+    assert canonical[url] == url
@@ -0,0 +1,34 @@
+import pytest
+
+import partitions
+
+
+class _OldServer:
+    """
+    Connection to a PostgreSQL 14 server, recording the statements run
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchone(self):
+        return ("140011",)
+
+
+def test_convert_refuses_a_server_older_than_15():
+    conn = _OldServer()
+    with pytest.raises(RuntimeError, match="needs PostgreSQL 15"):
+        partitions.convert(conn)
+    assert conn.statements == ["SHOW server_version_num"]
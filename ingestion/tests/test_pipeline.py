@@ -0,0 +1,89 @@
+import itertools
+import threading
+
+import pytest
+
+from pipeline import dedupe_by_id, iter_chunks, iter_prefetched
+
+
+def _pages(*sizes: int) -> list[list[dict]]:
+    ids = itertools.count()
+    return [[{"id": next(ids)} for _ in range(size)] for size in sizes]
+
+
+def _fetch_threads() -> list[threading.Thread]:
+    return [t for t in threading.enumerate() if t.name == "ft-fetch"]
+
+
+# ==================================================
+# iter_chunks / dedupe_by_id
+# ==================================================
+
+@pytest.mark.parametrize(
+    "sizes, chunk_size, expected",
+    [
+        pytest.param((3, 3, 3), 4, [4, 4, 1], id="short last chunk"),
+        pytest.param((5, 5), 5, [5, 5], id="pages of the chunk size"),
+        pytest.param((10,), 3, [3, 3, 3, 1], id="page split in several chunks"),
+        pytest.param((1, 0, 1, 1), 2, [2, 1], id="empty page"),
+        pytest.param((), 3, [], id="no pages"),
+    ],
+)
+def test_iter_chunks(sizes, chunk_size, expected):
+    pages = _pages(*sizes)
+    chunks = list(iter_chunks(pages, chunk_size))
+
+    assert [len(c) for c in chunks] == expected
+    # Same offers, same order
+    assert [i for c in chunks for i in c] == [i for p in pages for i in p]
+
+
+def test_dedupe_by_id_across_pages():
+    pages = [
+        [{"id": "a"}, {"id": "b"}],
+        [{"id": "b"}, {"id": "c"}],
+        [{"id": "a"}],
+    ]
+    assert list(dedupe_by_id(pages)) == [
+        [{"id": "a"}, {"id": "b"}],
+        [{"id": "c"}],
+        [],
+    ]
+
+
+# ==================================================
+# iter_prefetched
+# ==================================================
+
+def test_prefetched_pages_keep_their_order():
+    pages = _pages(2, 0, 3, 1)
+    assert list(iter_prefetched(iter(pages), maxsize=2)) == pages
+
+
+def test_producer_error_is_raised_to_the_consumer():
+    def pages():
+        yield [{"id": 1}]
+        raise ConnectionError("API down")
+
+    received = []
+    with pytest.raises(ConnectionError, match="API down"):
+        for page in iter_prefetched(pages()):
+            received.append(page)
+    assert received == [[{"id": 1}]]
+    assert not _fetch_threads()
+
+
+def test_early_exit_stops_the_producer():
+    produced = itertools.count()
+
+    def endless():
+        for n in produced:
+            yield [{"id": n}]
+
+    prefetched = iter_prefetched(endless(), maxsize=2)
+    assert next(prefetched) == [{"id": 0}]
+    prefetched.close()
+
+    assert not _fetch_threads()
+    # The producer stopped at most a queue ahead of the consumer
+    assert next(produced) <= 5
@@ -6,8 +6,8 @@ class JobOffer(models.Model):
     title = models.TextField()
     description = models.TextField(null=True)
 
-    salary_min_annual = models.TextField(null=True)
-    salary_max_annual = models.TextField(null=True)
+    salary_min_annual = models.FloatField(null=True)
+    salary_max_annual = models.FloatField(null=True)
     experience = models.TextField(null=True)
     education = models.TextField(null=True)
 
@@ -22,6 +22,9 @@ class JobOffer(models.Model):
     industry_id = models.IntegerField(null=True)
     location_id = models.IntegerField(null=True)
 
+    # First offer of its near-duplicate cluster (see ingestion/near_dup.py)
+    canonical_offer_id = models.IntegerField(null=True)
+
     class Meta:
         managed = False
         db_table = "job_offer"
\ No newline at end of file
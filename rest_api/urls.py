@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import JobOfferListView
+from .views import AnalyticsFreshnessView, AnalyticsView, JobOfferListView, JobOfferSearchView
 
 urlpatterns = [
     path("jobs/", JobOfferListView.as_view(), name="jobs-list"),
+    path("jobs/search/", JobOfferSearchView.as_view(), name="jobs-search"),
+    path("analytics/freshness/", AnalyticsFreshnessView.as_view(), name="analytics-freshness"),
+    path("analytics/<str:name>/", AnalyticsView.as_view(), name="analytics"),
 ]
\ No newline at end of file
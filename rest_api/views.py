@@ -1,9 +1,135 @@
+from django.db import connection
+from django.http import Http404
 from django.shortcuts import render
 
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import JobOffer
 from .serializers import JobOfferSerializer
 
+
+def _salary_param(request, name: str) -> float | None:
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValidationError({name: "must be a number (annual EUR)"})
+
+
 class JobOfferListView(ListAPIView):
-    queryset = JobOffer.objects.all().order_by("-date_posted")
-    serializer_class = JobOfferSerializer
\ No newline at end of file
+    serializer_class = JobOfferSerializer
+
+    def get_queryset(self):
+        """
+        ?salary_min= / ?salary_max=: offers whose salary range overlaps
+        [salary_min, salary_max] (served by the salary indexes)
+        """
+        queryset = JobOffer.objects.all().order_by("-date_posted")
+        salary_min = _salary_param(self.request, "salary_min")
+        salary_max = _salary_param(self.request, "salary_max")
+        if salary_min is not None:
+            queryset = queryset.filter(salary_max_annual__gte=salary_min)
+        if salary_max is not None:
+            queryset = queryset.filter(salary_min_annual__lte=salary_max)
+        return queryset
+
+
+def _int_param(request, name: str, default: int, low: int, high: int) -> int:
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValidationError({name: "must be an integer"})
+    if not low <= number <= high:
+        raise ValidationError({name: f"must be between {low} and {high}"})
+    return number
+
+
+# Matches ranked per search: the most recent ones (search_job_offers)
+SEARCH_CANDIDATES = 1000
+
+
+class JobOfferSearchView(APIView):
+    """
+    French full-text search: GET /api/jobs/search/?q=<words>[&limit=20&offset=0]
+    q uses the web search syntax ("exact phrase", or, -excluded). Only the
+    SEARCH_CANDIDATES most recent matches are ranked (title matches first),
+    so offset + limit cannot go past them. Titles and description fragments
+    are HTML-escaped, matched words wrapped in <mark></mark>.
+    """
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": "required"})
+        limit = _int_param(request, "limit", 20, 1, 100)
+        offset = _int_param(request, "offset", 0, 0, SEARCH_CANDIDATES - limit)
+        results = _fetch_dicts(
+            "SELECT * FROM search_job_offers(%s, %s, %s, %s)",
+            (query, limit, offset, SEARCH_CANDIDATES),
+        )
+        return Response({
+            "query": query,
+            "limit": limit,
+            "offset": offset,
+            # Ranking covers the most recent matches only
+            "ranked_among": SEARCH_CANDIDATES,
+            "results": results,
+        })
+
+
+# Materialized views of sql/schema.sql (refreshed by ingestion/analytics_views.py)
+ANALYTICS_VIEWS = {
+    "market": ("mv_market_summary", "id"),
+    "skills": ("mv_skill_share", "job_count DESC, category, name, requirement_level"),
+    "locations": ("mv_location_offers", "nb_offres DESC, location_id"),
+    "contracts": ("mv_contract_offers", "nb_offres DESC, type_contrat"),
+    "monthly": ("mv_monthly_offers", "period"),
+}
+
+
+def _fetch_dicts(sql: str, params=()) -> list[dict]:
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        columns = [c.name for c in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+class AnalyticsView(APIView):
+    """
+    Pre-aggregated analytics: GET /api/analytics/<market|skills|locations|contracts|monthly>/
+    """
+
+    def get(self, request, name: str):
+        if name not in ANALYTICS_VIEWS:
+            raise Http404(f"unknown analytics view: {name}")
+        view, order_by = ANALYTICS_VIEWS[name]
+        return Response(_fetch_dicts(f"SELECT * FROM {view} ORDER BY {order_by}"))
+
+
+class AnalyticsFreshnessView(APIView):
+    """
+    Last refresh of each analytics view: data as of, age, duration, rows
+    """
+
+    def get(self, request):
+        return Response(_fetch_dicts(
+            """
+            SELECT
+                v.view_name,
+                r.refreshed_at,
+                EXTRACT(EPOCH FROM now() - r.refreshed_at)::float AS age_seconds,
+                r.duration_ms,
+                r.row_count
+            FROM unnest(%s::text[]) AS v(view_name)
+            LEFT JOIN analytics_refresh r ON r.view_name = v.view_name
+            ORDER BY v.view_name
+            """,
+            ([view for view, _ in ANALYTICS_VIEWS.values()],),
+        ))
@@ -1,12 +1,15 @@
 -- ============================================================
 -- Requêtes Analyses descriptives reproductibles
 -- Source : tables canoniques PostgreSQL
+-- Les quasi-doublons (reposts) sont exclus via la vue job_offer_distinct
+-- Versions pré-agrégées (requêtes 0 à 8) : vues matérialisées mv_* de schema.sql
+-- Séries temporelles (requêtes 12 et 13) : tables de rollup quotidiennes de schema.sql
 -- ============================================================
 
 
 -- 0) Volume global du corpus
 SELECT COUNT(*) AS nb_offres
-FROM job_offer;
+FROM job_offer_distinct;
 
 
 -- 1) Compétences les plus fréquentes 
@@ -15,6 +18,7 @@ SELECT
     s.name,
     COUNT(*) AS frequency
 FROM job_offer_skill jos
+JOIN job_offer_distinct jo ON jo.id = jos.job_offer_id
 JOIN skill s ON s.id = jos.skill_id
 GROUP BY s.category, s.name
 ORDER BY frequency DESC;
@@ -22,7 +26,7 @@ ORDER BY frequency DESC;
 
 -- 2) Hard skills : required vs optional + % des offres
 WITH total_jobs AS (
-    SELECT COUNT(*) AS total FROM job_offer
+    SELECT COUNT(*) AS total FROM job_offer_distinct
 )
 SELECT
     s.name AS skill,
@@ -33,6 +37,7 @@ SELECT
         2
     ) AS pct_jobs
 FROM job_offer_skill jos
+JOIN job_offer_distinct jo ON jo.id = jos.job_offer_id
 JOIN skill s ON s.id = jos.skill_id
 CROSS JOIN total_jobs t
 WHERE s.category = 'hard'
@@ -42,7 +47,7 @@ ORDER BY pct_jobs DESC;
 
 -- 3) Soft skills : % des offres
 WITH total_jobs AS (
-    SELECT COUNT(*) AS total FROM job_offer
+    SELECT COUNT(*) AS total FROM job_offer_distinct
 )
 SELECT
     s.name AS skill,
@@ -52,6 +57,7 @@ SELECT
         2
     ) AS pct_jobs
 FROM job_offer_skill jos
+JOIN job_offer_distinct jo ON jo.id = jos.job_offer_id
 JOIN skill s ON s.id = jos.skill_id
 CROSS JOIN total_jobs t
 WHERE s.category = 'soft'
@@ -63,7 +69,7 @@ ORDER BY pct_jobs DESC;
 SELECT
     l.ville,
     COUNT(*) AS nb_offres
-FROM job_offer jo
+FROM job_offer_distinct jo
 JOIN location l ON l.id = jo.location_id
 GROUP BY l.ville
 ORDER BY nb_offres DESC;
@@ -75,7 +81,7 @@ SELECT
     l.latitude,
     l.longitude,
     COUNT(*) AS nb_offres
-FROM job_offer jo
+FROM job_offer_distinct jo
 JOIN location l ON l.id = jo.location_id
 WHERE l.latitude IS NOT NULL
   AND l.longitude IS NOT NULL
@@ -97,7 +103,7 @@ SELECT
         / NULLIF(COUNT(*), 0),
         2
     ) AS pct_with_gps
-FROM job_offer jo
+FROM job_offer_distinct jo
 LEFT JOIN location l ON l.id = jo.location_id;
 
 
@@ -105,7 +111,7 @@ LEFT JOIN location l ON l.id = jo.location_id;
 SELECT
     c.type_contrat,
     COUNT(*) AS nb_offres
-FROM job_offer jo
+FROM job_offer_distinct jo
 JOIN contract c ON c.id = jo.contract_id
 GROUP BY c.type_contrat
 ORDER BY nb_offres DESC;
@@ -115,7 +121,7 @@ ORDER BY nb_offres DESC;
 SELECT
   DATE_TRUNC('month', jo.date_posted) AS period,
   COUNT(*) AS nb_offres
-FROM job_offer jo
+FROM job_offer_distinct jo
 WHERE jo.date_posted IS NOT NULL
 GROUP BY 1
 ORDER BY 1;
@@ -133,7 +139,55 @@ SELECT
     ) AS pct_avec_salaire,
     MIN(salary_min_annual) AS salaire_min,
     MAX(salary_max_annual) AS salaire_max
-FROM job_offer jo
+FROM job_offer_distinct jo
 JOIN location l ON l.id = jo.location_id
 WHERE l.ville LIKE 'Paris';
 
+
+
+-- 10) Salary : quartiles par type de contrat (salaires annuels numériques)
+SELECT
+    c.type_contrat,
+    COUNT(*) AS offres_avec_salaire,
+    PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY jo.salary_min_annual) AS q1,
+    PERCENTILE_CONT(0.50) WITHIN GROUP (ORDER BY jo.salary_min_annual) AS mediane,
+    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY jo.salary_min_annual) AS q3
+FROM job_offer_distinct jo
+JOIN contract c ON c.id = jo.contract_id
+WHERE jo.salary_min_annual IS NOT NULL
+GROUP BY c.type_contrat
+ORDER BY mediane DESC;
+
+
+-- 11) Salary : offres dont la fourchette recoupe [40 000 ; 55 000] €/an
+-- (index idx_job_offer_salary_min / idx_job_offer_salary_max)
+SELECT jo.id, jo.title, jo.salary_min_annual, jo.salary_max_annual
+FROM job_offer_distinct jo
+WHERE jo.salary_min_annual <= 55000
+  AND jo.salary_max_annual >= 40000
+ORDER BY jo.salary_min_annual DESC;
+
+
+-- 12) Séries temporelles : offres par mois et par type de contrat
+-- (tables de rollup quotidiennes rollup_*_daily, sans parcourir job_offer)
+SELECT
+    DATE_TRUNC('month', r.day)::date AS mois,
+    c.type_contrat,
+    SUM(r.offers) AS nb_offres
+FROM rollup_offer_daily r
+LEFT JOIN contract c ON c.id = r.contract_id
+GROUP BY 1, 2
+HAVING SUM(r.offers) <> 0
+ORDER BY 1, 3 DESC;
+
+
+-- 13) Séries temporelles : offres par mois demandant Python (toute exigence)
+SELECT
+    DATE_TRUNC('month', r.day)::date AS mois,
+    SUM(r.offers) AS nb_offres
+FROM rollup_skill_daily r
+JOIN skill s ON s.id = r.skill_id
+WHERE s.name = 'Python'
+GROUP BY 1
+HAVING SUM(r.offers) <> 0
+ORDER BY 1;
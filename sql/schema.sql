@@ -38,20 +38,29 @@ CREATE TABLE IF NOT EXISTS skill (
 
 -- =========================
 -- JOB OFFER
+-- Range-partitioned by date_posted month (job_offer_pYYYYMM, created and
+-- archived by ingestion/partitions.py; undated offers and months without a
+-- partition go to job_offer_default). Unique keys of a partitioned table
+-- must contain date_posted: an offer's URL is unique per date_posted, and
+-- the loaders move an offer whose date changed before upserting it.
+-- No primary key (it could not include the nullable date_posted): the
+-- UNIQUE NULLS NOT DISTINCT keys replace it, and need PostgreSQL 15+.
+-- Databases created before partitioning: ingestion/partitions.py convert
 -- =========================
 CREATE TABLE IF NOT EXISTS job_offer (
-    id SERIAL PRIMARY KEY,
+    id SERIAL NOT NULL,
 
     title TEXT NOT NULL,
     description TEXT,
 
-    salary_min_annual TEXT,
-    salary_max_annual TEXT,
+    -- annual EUR; databases created with TEXT columns: ingestion/salary_migration.py
+    salary_min_annual DOUBLE PRECISION,
+    salary_max_annual DOUBLE PRECISION,
     experience TEXT,
     education TEXT,
 
     date_posted DATE,
-    url TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
 
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -59,18 +68,88 @@ CREATE TABLE IF NOT EXISTS job_offer (
     contract_id INTEGER REFERENCES contract(id),
     company_id INTEGER REFERENCES company(id),
     industry_id INTEGER REFERENCES industry(id),
-    location_id INTEGER REFERENCES location(id)
-);
+    location_id INTEGER REFERENCES location(id),
+
+    UNIQUE NULLS NOT DISTINCT (id, date_posted),
+    UNIQUE NULLS NOT DISTINCT (url, date_posted)
+) PARTITION BY RANGE (date_posted);
+
+CREATE TABLE IF NOT EXISTS job_offer_default PARTITION OF job_offer DEFAULT;
+
+-- Digest of the offer content, used to skip unchanged offers on re-ingestion
+ALTER TABLE job_offer ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- First offer of its near-duplicate cluster (itself if none, NULL = not checked yet).
+-- No foreign key: it would need the canonical offer's date_posted too.
+ALTER TABLE job_offer ADD COLUMN IF NOT EXISTS canonical_offer_id INTEGER;
+
+-- French full-text document (stemmed, stop words removed): the title
+-- weighs more than the description in the search ranking (search_job_offers)
+ALTER TABLE job_offer ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('french', title), 'A')
+        || setweight(to_tsvector('french', COALESCE(description, '')), 'B')
+    ) STORED;
+-- Kept in the row (compressed) rather than in TOAST: matching and ranking
+-- read it for every candidate. Rows written before keep their storage.
+ALTER TABLE job_offer ALTER COLUMN search_vector SET STORAGE MAIN;
 
 -- =========================
 -- JOB OFFER <-> SKILL
+-- Partitioned like job_offer: date_posted is the offer's, kept in step by
+-- the foreign key (a date change moves the links with their offer), except
+-- for the links of an undated offer, which the loaders move themselves
 -- =========================
 CREATE TABLE IF NOT EXISTS job_offer_skill (
-    job_offer_id INTEGER REFERENCES job_offer(id) ON DELETE CASCADE,
-    skill_id INTEGER REFERENCES skill(id) ON DELETE CASCADE,
+    job_offer_id INTEGER NOT NULL,
+    skill_id INTEGER NOT NULL REFERENCES skill(id) ON DELETE CASCADE,
     requirement_level TEXT NOT NULL
         CHECK (requirement_level IN ('required', 'optional')),
-    PRIMARY KEY (job_offer_id, skill_id)
+    date_posted DATE,
+    UNIQUE NULLS NOT DISTINCT (job_offer_id, skill_id, date_posted),
+    FOREIGN KEY (job_offer_id, date_posted) REFERENCES job_offer(id, date_posted)
+        ON DELETE CASCADE ON UPDATE CASCADE
+) PARTITION BY RANGE (date_posted);
+
+CREATE TABLE IF NOT EXISTS job_offer_skill_default PARTITION OF job_offer_skill DEFAULT;
+
+-- =========================
+-- ARCHIVED MONTHS (detached partitions exported to Parquet, ingestion/partitions.py)
+-- =========================
+CREATE TABLE IF NOT EXISTS partition_archive (
+    month DATE NOT NULL,
+    offers_path TEXT PRIMARY KEY,
+    links_path TEXT NOT NULL,
+    offers BIGINT NOT NULL,
+    links BIGINT NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =========================
+-- INGESTION HIGH-WATER MARKS
+-- =========================
+CREATE TABLE IF NOT EXISTS ingest_watermark (
+    query_key TEXT PRIMARY KEY,
+    last_date_creation TIMESTAMPTZ NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- =========================
+-- INGESTION RUN LEDGER (checkpoints of resumable runs)
+-- =========================
+CREATE TABLE IF NOT EXISTS ingest_run (
+    id BIGSERIAL PRIMARY KEY,
+    query_key TEXT NOT NULL,
+    params JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running'
+        CHECK (status IN ('running', 'completed', 'failed')),
+    -- every offer before this search offset is committed
+    next_offset INTEGER NOT NULL DEFAULT 0,
+    max_date_creation TIMESTAMPTZ,
+    error TEXT,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
 );
 
 -- =========================
@@ -80,6 +159,805 @@ CREATE INDEX IF NOT EXISTS idx_job_offer_date ON job_offer(date_posted);
 CREATE INDEX IF NOT EXISTS idx_job_offer_company ON job_offer(company_id);
 CREATE INDEX IF NOT EXISTS idx_job_offer_location ON job_offer(location_id);
 CREATE INDEX IF NOT EXISTS idx_job_offer_skill ON job_offer_skill(skill_id);
+CREATE INDEX IF NOT EXISTS idx_ingest_run_query ON ingest_run(query_key, id);
+CREATE INDEX IF NOT EXISTS idx_job_offer_canonical ON job_offer(canonical_offer_id);
+-- Salary range filters (min <= x AND max >= y) and ordered scans for percentiles
+CREATE INDEX IF NOT EXISTS idx_job_offer_salary_min ON job_offer(salary_min_annual)
+    WHERE salary_min_annual IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_job_offer_salary_max ON job_offer(salary_max_annual)
+    WHERE salary_max_annual IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_job_offer_search ON job_offer USING GIN (search_vector);
+
+-- =========================
+-- VIEWS
+-- =========================
+-- One row per near-duplicate cluster (untagged offers count as distinct)
+CREATE OR REPLACE VIEW job_offer_distinct AS
+SELECT *
+FROM job_offer
+WHERE canonical_offer_id IS NULL OR canonical_offer_id = id;
+
+-- =========================
+-- FULL-TEXT SEARCH (GET /api/jobs/search/)
+-- Distinct offers matching a web-style query ("exact phrase", or, -word),
+-- best ranked first, with the matched words highlighted between
+-- <mark></mark> in the title and in a few description fragments (the
+-- offer's own text HTML-escaped, so only the <mark> tags are markup).
+-- Ranking reads each match's whole search_vector: only the `candidates`
+-- most recent matches are ranked, collected partition by partition from
+-- the newest month (each partition through its idx_job_offer_search), so
+-- a word found in every offer costs about as much as a rare one. Pages
+-- past `candidates` (skip + max_results > candidates) are cut short.
+-- =========================
+CREATE OR REPLACE FUNCTION html_escape(t TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT replace(replace(replace(replace(replace(
+        t, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'), '"', '&quot;'), '''', '&#39;')
+$$;
+
+CREATE OR REPLACE FUNCTION search_job_offers(
+    query TEXT,
+    max_results INTEGER DEFAULT 20,
+    skip INTEGER DEFAULT 0,
+    candidates INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+    id INTEGER,
+    title TEXT,
+    date_posted DATE,
+    url TEXT,
+    company_id INTEGER,
+    location_id INTEGER,
+    contract_id INTEGER,
+    rank REAL,
+    title_highlight TEXT,
+    description_highlight TEXT
+)
+LANGUAGE plpgsql STABLE AS $$
+DECLARE
+    tsq tsquery := websearch_to_tsquery('french', query);
+    part regclass;
+    found_ids INTEGER[] := '{}';
+    found_dates DATE[] := '{}';
+    found_ranks REAL[] := '{}';
+    ids INTEGER[];
+    dates DATE[];
+    ranks REAL[];
+BEGIN
+    -- job_offer_pYYYYMM newest first, then job_offer_default (undated offers)
+    FOR part IN
+        SELECT c.oid::regclass
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'job_offer'::regclass
+        ORDER BY c.relname DESC
+    LOOP
+        EXIT WHEN cardinality(found_ids) >= candidates;
+        -- Ranked after the LIMIT: only the kept rows are read in full
+        EXECUTE format(
+            $sql$
+            SELECT array_agg(m.id), array_agg(m.date_posted), array_agg(ts_rank_cd(m.search_vector, $1))
+            FROM (
+                SELECT jo.id, jo.date_posted, jo.search_vector
+                FROM %s jo
+                WHERE jo.search_vector @@ $1
+                  AND (jo.canonical_offer_id IS NULL OR jo.canonical_offer_id = jo.id)
+                ORDER BY jo.date_posted DESC
+                LIMIT $2
+            ) m
+            $sql$,
+            part
+        )
+        INTO ids, dates, ranks
+        USING tsq, candidates - cardinality(found_ids);
+        found_ids := found_ids || COALESCE(ids, '{}');
+        found_dates := found_dates || COALESCE(dates, '{}');
+        found_ranks := found_ranks || COALESCE(ranks, '{}');
+    END LOOP;
+
+    -- Highlighting re-parses the text: only for the returned page
+    RETURN QUERY
+    SELECT
+        jo.id, jo.title, jo.date_posted, jo.url, jo.company_id, jo.location_id, jo.contract_id, r.rank,
+        ts_headline('french', html_escape(jo.title), tsq, 'HighlightAll=true, StartSel=<mark>, StopSel=</mark>'),
+        ts_headline(
+            'french', html_escape(COALESCE(jo.description, '')), tsq,
+            'MaxFragments=2, MinWords=8, MaxWords=20, FragmentDelimiter=" … ", StartSel=<mark>, StopSel=</mark>'
+        )
+    FROM (
+        SELECT *
+        FROM unnest(found_ids, found_dates, found_ranks) AS f(id, date_posted, rank)
+        ORDER BY f.rank DESC, f.date_posted DESC NULLS LAST, f.id
+        LIMIT max_results OFFSET skip
+    ) r
+    JOIN job_offer jo ON jo.id = r.id AND jo.date_posted IS NOT DISTINCT FROM r.date_posted
+    ORDER BY r.rank DESC, r.date_posted DESC NULLS LAST, r.id;
+END
+$$;
+
+-- =========================
+-- MATERIALIZED ANALYTICS VIEWS (sql/analytics.sql, pre-aggregated)
+-- Refreshed CONCURRENTLY after each ingest run (ingestion/analytics_views.py);
+-- each needs a unique index on plain columns for that. They read job_offer
+-- with the job_offer_distinct filter inlined, not the view itself, so that
+-- the view can be dropped and recreated (ingestion/salary_migration.py).
+-- =========================
+CREATE TABLE IF NOT EXISTS analytics_refresh (
+    view_name TEXT PRIMARY KEY,
+    -- start of the refreshing transaction: the data is as of this time
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    row_count BIGINT NOT NULL
+);
+
+-- One row: corpus volume and GPS coverage
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_market_summary AS
+SELECT
+    1 AS id,
+    COUNT(*) AS nb_offres,
+    COUNT(*) FILTER (WHERE l.latitude IS NOT NULL AND l.longitude IS NOT NULL) AS with_gps,
+    ROUND(
+        100.0
+        * COUNT(*) FILTER (WHERE l.latitude IS NOT NULL AND l.longitude IS NOT NULL)
+        / NULLIF(COUNT(*), 0),
+        2
+    ) AS pct_with_gps
+FROM job_offer jo
+LEFT JOIN location l ON l.id = jo.location_id
+WHERE jo.canonical_offer_id IS NULL OR jo.canonical_offer_id = jo.id;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_market_summary ON mv_market_summary(id);
+
+-- Offers per skill and requirement level ('any' = whatever the level)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_skill_share AS
+WITH jo AS (
+    SELECT id
+    FROM job_offer
+    WHERE canonical_offer_id IS NULL OR canonical_offer_id = id
+),
+total_jobs AS (
+    SELECT COUNT(*) AS total FROM jo
+)
+SELECT
+    s.category,
+    s.name,
+    COALESCE(jos.requirement_level, 'any') AS requirement_level,
+    COUNT(DISTINCT jos.job_offer_id) AS job_count,
+    ROUND(
+        100.0 * COUNT(DISTINCT jos.job_offer_id) / NULLIF(MAX(t.total), 0),
+        2
+    ) AS pct_jobs
+FROM job_offer_skill jos
+JOIN jo ON jo.id = jos.job_offer_id
+JOIN skill s ON s.id = jos.skill_id
+CROSS JOIN total_jobs t
+GROUP BY GROUPING SETS ((s.category, s.name, jos.requirement_level), (s.category, s.name));
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_skill_share ON mv_skill_share(category, name, requirement_level);
+
+-- Offers per location (top cities: SUM by ville)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_location_offers AS
+SELECT
+    l.id AS location_id,
+    l.ville,
+    l.code_postal,
+    l.latitude,
+    l.longitude,
+    COUNT(*) AS nb_offres
+FROM job_offer jo
+JOIN location l ON l.id = jo.location_id
+WHERE jo.canonical_offer_id IS NULL OR jo.canonical_offer_id = jo.id
+GROUP BY l.id;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_location_offers ON mv_location_offers(location_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_contract_offers AS
+SELECT
+    c.type_contrat,
+    COUNT(*) AS nb_offres
+FROM job_offer jo
+JOIN contract c ON c.id = jo.contract_id
+WHERE jo.canonical_offer_id IS NULL OR jo.canonical_offer_id = jo.id
+GROUP BY c.type_contrat;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_contract_offers ON mv_contract_offers(type_contrat);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_monthly_offers AS
+SELECT
+    DATE_TRUNC('month', jo.date_posted)::date AS period,
+    COUNT(*) AS nb_offres
+FROM job_offer jo
+WHERE jo.date_posted IS NOT NULL
+  AND (jo.canonical_offer_id IS NULL OR jo.canonical_offer_id = jo.id)
+GROUP BY 1;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mv_monthly_offers ON mv_monthly_offers(period);
+
+-- =========================
+-- DAILY ROLLUPS (market time series without scanning the facts)
+-- Maintained by statement-level triggers, in the transaction that writes
+-- the offers / links, whatever the loader. An offer counts on its
+-- date_posted if it is dated and distinct (the job_offer_distinct filter);
+-- changing its date, location, contract or near-duplicate tag moves its
+-- counts. An offer's keys and its links must change in separate
+-- statements (see copy_loader.py). Deleting offers (purge, archival) does
+-- not decrement: the rollups keep the history. rollup_rebuild() recomputes
+-- them from the facts, except for the archived months.
+-- =========================
+CREATE TABLE IF NOT EXISTS rollup_offer_daily (
+    day DATE NOT NULL,
+    location_id INTEGER,
+    contract_id INTEGER,
+    offers INTEGER NOT NULL,
+    UNIQUE NULLS NOT DISTINCT (day, location_id, contract_id)
+);
+
+CREATE TABLE IF NOT EXISTS rollup_skill_daily (
+    day DATE NOT NULL,
+    location_id INTEGER,
+    contract_id INTEGER,
+    skill_id INTEGER NOT NULL,
+    requirement_level TEXT NOT NULL,
+    offers INTEGER NOT NULL,
+    UNIQUE NULLS NOT DISTINCT (day, location_id, contract_id, skill_id, requirement_level)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_skill_daily_skill ON rollup_skill_daily(skill_id, day);
+
+CREATE OR REPLACE FUNCTION rollup_counted(date_posted DATE, id INTEGER, canonical_offer_id INTEGER)
+RETURNS BOOLEAN
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT date_posted IS NOT NULL AND (canonical_offer_id IS NULL OR canonical_offer_id = id)
+$$;
+
+-- Months whose facts were archived: their rollup counts are kept as they are
+CREATE OR REPLACE FUNCTION rollup_archived(day DATE)
+RETURNS boolean
+LANGUAGE sql STABLE AS $$
+    SELECT EXISTS (SELECT 1 FROM partition_archive WHERE month = DATE_TRUNC('month', day)::date)
+$$;
+
+-- The triggers append their deltas to the pending tables, which take no
+-- lock; one deferred trigger per transaction folds them into the rollups
+-- at commit, in a single key-ordered statement per table. Applying them
+-- statement by statement would lock rollup rows in several batches per
+-- transaction, and concurrent loaders (parallel workers) could deadlock.
+CREATE UNLOGGED TABLE IF NOT EXISTS rollup_offer_pending (
+    day DATE NOT NULL,
+    location_id INTEGER,
+    contract_id INTEGER,
+    offers INTEGER NOT NULL
+);
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rollup_skill_pending (
+    day DATE NOT NULL,
+    location_id INTEGER,
+    contract_id INTEGER,
+    skill_id INTEGER NOT NULL,
+    requirement_level TEXT NOT NULL,
+    offers INTEGER NOT NULL
+);
+
+-- One row per transaction with pending deltas
+CREATE UNLOGGED TABLE IF NOT EXISTS rollup_fold_queue (
+    txid BIGINT PRIMARY KEY
+);
+
+-- Pending rows are never committed: a transaction only sees (and folds) its own
+CREATE OR REPLACE FUNCTION rollup_fold()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM rollup_fold_queue WHERE txid = NEW.txid;
+
+    WITH pending AS (
+        DELETE FROM rollup_offer_pending RETURNING *
+    )
+    INSERT INTO rollup_offer_daily AS r (day, location_id, contract_id, offers)
+    SELECT day, location_id, contract_id, SUM(offers)
+    FROM pending
+    GROUP BY 1, 2, 3
+    HAVING SUM(offers) <> 0
+    ORDER BY 1, 2, 3
+    ON CONFLICT (day, location_id, contract_id)
+    DO UPDATE SET offers = r.offers + EXCLUDED.offers;
+
+    WITH pending AS (
+        DELETE FROM rollup_skill_pending RETURNING *
+    )
+    INSERT INTO rollup_skill_daily AS r (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT day, location_id, contract_id, skill_id, requirement_level, SUM(offers)
+    FROM pending
+    GROUP BY 1, 2, 3, 4, 5
+    HAVING SUM(offers) <> 0
+    ORDER BY 1, 2, 3, 4, 5
+    ON CONFLICT (day, location_id, contract_id, skill_id, requirement_level)
+    DO UPDATE SET offers = r.offers + EXCLUDED.offers;
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION rollup_enqueue_fold()
+RETURNS void
+LANGUAGE sql AS $$
+    INSERT INTO rollup_fold_queue (txid) VALUES (txid_current()) ON CONFLICT DO NOTHING;
+$$;
+
+DROP TRIGGER IF EXISTS rollup_fold ON rollup_fold_queue;
+CREATE CONSTRAINT TRIGGER rollup_fold
+    AFTER INSERT ON rollup_fold_queue
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION rollup_fold();
+
+CREATE OR REPLACE FUNCTION rollup_job_offer_insert()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rollup_offer_pending (day, location_id, contract_id, offers)
+    SELECT date_posted, location_id, contract_id, COUNT(*)
+    FROM new_rows
+    WHERE rollup_counted(date_posted, id, canonical_offer_id)
+    GROUP BY 1, 2, 3;
+    PERFORM rollup_enqueue_fold();
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION rollup_job_offer_update()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- -1 at the old keys, +1 at the new ones, netted per offer: unchanged
+    -- offers cancel out (no join of the two transition tables, which
+    -- have no index)
+    WITH deltas AS (
+        SELECT id, day, location_id, contract_id, SUM(sign) AS sign
+        FROM (
+            SELECT id, date_posted AS day, location_id, contract_id, -1 AS sign
+            FROM old_rows
+            WHERE rollup_counted(date_posted, id, canonical_offer_id)
+            UNION ALL
+            SELECT id, date_posted, location_id, contract_id, 1
+            FROM new_rows
+            WHERE rollup_counted(date_posted, id, canonical_offer_id)
+        ) d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(sign) <> 0
+    ),
+    offers AS (
+        INSERT INTO rollup_offer_pending (day, location_id, contract_id, offers)
+        SELECT day, location_id, contract_id, SUM(sign)
+        FROM deltas
+        GROUP BY 1, 2, 3
+        HAVING SUM(sign) <> 0
+    )
+    -- The offer's links move with it
+    INSERT INTO rollup_skill_pending (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT d.day, d.location_id, d.contract_id, jos.skill_id, jos.requirement_level, SUM(d.sign)
+    FROM deltas d
+    JOIN job_offer_skill jos ON jos.job_offer_id = d.id
+    GROUP BY 1, 2, 3, 4, 5
+    HAVING SUM(d.sign) <> 0;
+    PERFORM rollup_enqueue_fold();
+    RETURN NULL;
+END
+$$;
+
+-- Links count at their offer's current keys (links of deleted offers: not at all)
+CREATE OR REPLACE FUNCTION rollup_job_offer_skill_insert()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rollup_skill_pending (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT jo.date_posted, jo.location_id, jo.contract_id, l.skill_id, l.requirement_level, COUNT(*)
+    FROM new_rows l
+    JOIN job_offer jo ON jo.id = l.job_offer_id AND jo.date_posted = l.date_posted
+    WHERE rollup_counted(jo.date_posted, jo.id, jo.canonical_offer_id)
+    GROUP BY 1, 2, 3, 4, 5;
+    PERFORM rollup_enqueue_fold();
+    RETURN NULL;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION rollup_job_offer_skill_delete()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rollup_skill_pending (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT jo.date_posted, jo.location_id, jo.contract_id, l.skill_id, l.requirement_level, -COUNT(*)
+    FROM old_rows l
+    JOIN job_offer jo ON jo.id = l.job_offer_id AND jo.date_posted = l.date_posted
+    WHERE rollup_counted(jo.date_posted, jo.id, jo.canonical_offer_id)
+    GROUP BY 1, 2, 3, 4, 5;
+    PERFORM rollup_enqueue_fold();
+    RETURN NULL;
+END
+$$;
+
+-- requirement_level changes: -1 at the old level, +1 at the new one
+CREATE OR REPLACE FUNCTION rollup_job_offer_skill_update()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rollup_skill_pending (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT jo.date_posted, jo.location_id, jo.contract_id, l.skill_id, l.requirement_level, SUM(l.sign)
+    FROM (
+        SELECT job_offer_id, skill_id, requirement_level, -1 AS sign FROM old_rows
+        UNION ALL
+        SELECT job_offer_id, skill_id, requirement_level, 1 FROM new_rows
+    ) l
+    -- not on date_posted: links moved with their offer (ON UPDATE CASCADE)
+    -- must net to 0, both versions joining the offer at its new date
+    JOIN job_offer jo ON jo.id = l.job_offer_id
+    WHERE rollup_counted(jo.date_posted, jo.id, jo.canonical_offer_id)
+    GROUP BY 1, 2, 3, 4, 5
+    HAVING SUM(l.sign) <> 0;
+    PERFORM rollup_enqueue_fold();
+    RETURN NULL;
+END
+$$;
+
+-- Recompute both rollups from the facts (writers wait until it commits)
+CREATE OR REPLACE FUNCTION rollup_rebuild()
+RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    LOCK TABLE job_offer, job_offer_skill IN SHARE MODE;
+    DELETE FROM rollup_offer_daily WHERE NOT rollup_archived(day);
+    DELETE FROM rollup_skill_daily WHERE NOT rollup_archived(day);
+    -- this transaction's own deltas: already in the recount
+    DELETE FROM rollup_offer_pending;
+    DELETE FROM rollup_skill_pending;
+
+    INSERT INTO rollup_offer_daily (day, location_id, contract_id, offers)
+    SELECT date_posted, location_id, contract_id, COUNT(*)
+    FROM job_offer
+    WHERE rollup_counted(date_posted, id, canonical_offer_id)
+      AND NOT rollup_archived(date_posted)
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO rollup_skill_daily (day, location_id, contract_id, skill_id, requirement_level, offers)
+    SELECT jo.date_posted, jo.location_id, jo.contract_id, jos.skill_id, jos.requirement_level, COUNT(*)
+    FROM job_offer jo
+    JOIN job_offer_skill jos ON jos.job_offer_id = jo.id AND jos.date_posted = jo.date_posted
+    WHERE rollup_counted(jo.date_posted, jo.id, jo.canonical_offer_id)
+      AND NOT rollup_archived(jo.date_posted)
+    GROUP BY 1, 2, 3, 4, 5;
+END
+$$;
+
+-- First application on an existing database: populate before the triggers exist
+SELECT rollup_rebuild()
+WHERE NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'rollup_job_offer_insert');
+
+CREATE OR REPLACE TRIGGER rollup_job_offer_insert
+    AFTER INSERT ON job_offer
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_job_offer_insert();
+
+CREATE OR REPLACE TRIGGER rollup_job_offer_update
+    AFTER UPDATE ON job_offer
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_job_offer_update();
+
+CREATE OR REPLACE TRIGGER rollup_job_offer_skill_insert
+    AFTER INSERT ON job_offer_skill
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_job_offer_skill_insert();
+
+CREATE OR REPLACE TRIGGER rollup_job_offer_skill_delete
+    AFTER DELETE ON job_offer_skill
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_job_offer_skill_delete();
+
+CREATE OR REPLACE TRIGGER rollup_job_offer_skill_update
+    AFTER UPDATE ON job_offer_skill
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_job_offer_skill_update();
+
+-- Conflict targets for the batch loader (INSERT ... ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_company_name ON company(name);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_location_ville_code_postal ON location(ville, code_postal);
+
+-- =========================
+-- NAME CANONICALIZATION
+-- Offers spell the same company or skill in many ways ("SOPRA STERIA",
+-- "Sopra Steria Group", "python (programmation)"). A name is reduced to a
+-- key (company_key / skill_key); company_alias / skill_alias map every
+-- key seen to one canonical row. A key without an alias is matched to the
+-- closest canonical row by trigram similarity (pg_trgm, through the
+-- trigram indexes below) and becomes an alias of it when the similarity
+-- reaches the loader's threshold; otherwise a new canonical row is created.
+-- The loaders resolve whole batches of names with resolve_companies /
+-- resolve_skills: one indexed similarity query per batch (and one more
+-- when new names of the batch are similar to each other).
+-- =========================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Lower case without accents, qualifiers in parentheses and dots dropped
+-- (S.A., Node.js), other punctuation (but + and #: C++, C#) collapsed to
+-- single spaces
+CREATE OR REPLACE FUNCTION name_key(name TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT btrim(regexp_replace(
+        replace(regexp_replace(
+            -- accented capitals too: lower() leaves them as is under the C locale
+            lower(replace(replace(replace(replace(translate(
+                name,
+                'àáâãäåçèéêëìíîïñòóôõöùúûüýÿÀÁÂÃÄÅÇÈÉÊËÌÍÎÏÑÒÓÔÕÖÙÚÛÜÝ',
+                'aaaaaaceeeeiiiinooooouuuuyyAAAAAACEEEEIIIINOOOOOUUUUY'),
+                'œ', 'oe'), 'Œ', 'OE'), 'æ', 'ae'), 'Æ', 'AE')),
+            '\([^)]*\)', ' ', 'g'), '.', ''),
+        '[^a-z0-9+#]+', ' ', 'g'))
+$$;
+
+-- name_key without the legal forms and "group" (the whole key if nothing else is left)
+CREATE OR REPLACE FUNCTION company_key(name TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT COALESCE(
+        NULLIF(btrim(regexp_replace(
+            regexp_replace(name_key(name), '\m(sa|sas|sasu|sarl|eurl|sca|sci|snc|scop|selarl|group|groupe)\M', ' ', 'g'),
+            ' +', ' ', 'g')), ''),
+        name_key(name)
+    )
+$$;
+
+CREATE OR REPLACE FUNCTION skill_key(name TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT name_key(name)
+$$;
+
+CREATE TABLE IF NOT EXISTS company_alias (
+    alias TEXT PRIMARY KEY,  -- company_key of a name seen in the offers
+    company_id INTEGER NOT NULL REFERENCES company(id) ON DELETE CASCADE,
+    similarity REAL NOT NULL,  -- to the company's own key (1 = same key)
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS skill_alias (
+    alias TEXT NOT NULL,  -- skill_key of a name seen in the offers
+    category TEXT NOT NULL,
+    skill_id INTEGER NOT NULL REFERENCES skill(id) ON DELETE CASCADE,
+    similarity REAL NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (alias, category)
+);
+
+CREATE INDEX IF NOT EXISTS idx_company_alias_company ON company_alias(company_id);
+CREATE INDEX IF NOT EXISTS idx_skill_alias_skill ON skill_alias(skill_id);
+-- Candidates of the similarity matching (% operator)
+CREATE INDEX IF NOT EXISTS idx_company_key_trgm ON company USING GIN (company_key(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_skill_key_trgm ON skill USING GIN (skill_key(name) gin_trgm_ops);
+
+-- Rows created before the aliases: the oldest row of each key is canonical
+INSERT INTO company_alias (alias, company_id, similarity)
+SELECT DISTINCT ON (company_key(name)) company_key(name), id, 1
+FROM company
+ORDER BY company_key(name), id
+ON CONFLICT DO NOTHING;
+
+INSERT INTO skill_alias (alias, category, skill_id, similarity)
+SELECT DISTINCT ON (skill_key(name), category) skill_key(name), category, id, 1
+FROM skill
+ORDER BY skill_key(name), category, id
+ON CONFLICT DO NOTHING;
+
+-- {name: company id} of every name, creating the companies of the names
+-- that match none (`inserted`: the row was created for this very name).
+-- Each pass matches the unknown keys to the companies (one trigram index
+-- lookup per key), then creates the smallest of each group of similar
+-- new keys: the others match it on the next pass, as they would have in
+-- a later batch. Rows are written in key order, so concurrent loaders
+-- take the unique-index locks in the same order; of a key created by
+-- both at once, the first alias wins and the other company row is deleted.
+CREATE OR REPLACE FUNCTION resolve_companies(names TEXT[], threshold REAL DEFAULT 0.6)
+RETURNS TABLE (name TEXT, company_id INTEGER, inserted BOOLEAN)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    previous TEXT := current_setting('pg_trgm.similarity_threshold', true);
+    created INTEGER[] := '{}';
+    new_ids INTEGER[];
+BEGIN
+    -- New keys of the pass (kept for the session: no catalog churn per call)
+    IF to_regclass('pg_temp.resolve_company_keys') IS NULL THEN
+        CREATE TEMP TABLE resolve_company_keys (alias TEXT PRIMARY KEY, name TEXT NOT NULL);
+        CREATE INDEX ON resolve_company_keys USING GIN (alias gin_trgm_ops);
+    END IF;
+    -- Read by the % operator
+    PERFORM set_config('pg_trgm.similarity_threshold', LEAST(threshold, 1)::text, true);
+
+    LOOP
+        IF threshold < 1 THEN
+            INSERT INTO company_alias (alias, company_id, similarity)
+            SELECT k.alias, m.id, m.similarity
+            FROM (
+                SELECT DISTINCT company_key(n) AS alias
+                FROM unnest(names) n
+                WHERE NOT EXISTS (SELECT 1 FROM company_alias a WHERE a.alias = company_key(n))
+            ) k
+            CROSS JOIN LATERAL (
+                SELECT c.id, similarity(company_key(c.name), k.alias) AS similarity
+                FROM company c
+                WHERE company_key(c.name) % k.alias
+                ORDER BY 2 DESC, c.id
+                LIMIT 1
+            ) m
+            ORDER BY k.alias
+            ON CONFLICT (alias) DO NOTHING;
+        END IF;
+
+        -- Temp table: not vacuumed, TRUNCATE rather than DELETE
+        TRUNCATE resolve_company_keys;
+        INSERT INTO resolve_company_keys (alias, name)
+        SELECT company_key(n), min(n)
+        FROM unnest(names) n
+        WHERE NOT EXISTS (SELECT 1 FROM company_alias a WHERE a.alias = company_key(n))
+        GROUP BY 1;
+        EXIT WHEN NOT FOUND;
+
+        IF threshold < 1 THEN
+            DELETE FROM resolve_company_keys k
+            WHERE EXISTS (
+                SELECT 1 FROM resolve_company_keys o
+                WHERE o.alias % k.alias AND o.alias < k.alias
+            );
+        END IF;
+
+        -- A company committed meanwhile by another loader is invisible to
+        -- this statement's snapshot: its key is left to the next pass
+        WITH new_company AS (
+            INSERT INTO company (name)
+            SELECT name FROM resolve_company_keys
+            ORDER BY name
+            ON CONFLICT (name) DO NOTHING
+            RETURNING id, name
+        ),
+        canonical AS (
+            SELECT k.alias, COALESCE(nc.id, c.id) AS id, nc.id AS new_id
+            FROM resolve_company_keys k
+            LEFT JOIN new_company nc ON nc.name = k.name
+            LEFT JOIN company c ON c.name = k.name
+        ),
+        aliased AS (
+            INSERT INTO company_alias (alias, company_id, similarity)
+            SELECT alias, id, 1 FROM canonical
+            WHERE id IS NOT NULL
+            ORDER BY alias
+            ON CONFLICT (alias) DO NOTHING
+        )
+        SELECT COALESCE(array_agg(new_id) FILTER (WHERE new_id IS NOT NULL), '{}')
+        INTO new_ids
+        FROM canonical;
+
+        DELETE FROM company t
+        WHERE t.id = ANY(new_ids)
+          AND NOT EXISTS (SELECT 1 FROM company_alias a WHERE a.company_id = t.id);
+        created := created || new_ids;
+    END LOOP;
+
+    PERFORM set_config('pg_trgm.similarity_threshold', COALESCE(previous, '0.3'), true);
+
+    RETURN QUERY
+    SELECT d.n, c.id, c.id = ANY(created) AND c.name = d.n
+    FROM (SELECT DISTINCT n FROM unnest(names) n) d
+    JOIN company_alias a ON a.alias = company_key(d.n)
+    JOIN company c ON c.id = a.company_id;
+END
+$$;
+
+-- Same for skills, matched within their category: {(name, category): skill id}
+CREATE OR REPLACE FUNCTION resolve_skills(names TEXT[], categories TEXT[], threshold REAL DEFAULT 0.7)
+RETURNS TABLE (name TEXT, category TEXT, skill_id INTEGER, inserted BOOLEAN)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    previous TEXT := current_setting('pg_trgm.similarity_threshold', true);
+    created INTEGER[] := '{}';
+    new_ids INTEGER[];
+BEGIN
+    IF to_regclass('pg_temp.resolve_skill_keys') IS NULL THEN
+        CREATE TEMP TABLE resolve_skill_keys (
+            alias TEXT NOT NULL,
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            PRIMARY KEY (alias, category)
+        );
+        CREATE INDEX ON resolve_skill_keys USING GIN (alias gin_trgm_ops);
+    END IF;
+    PERFORM set_config('pg_trgm.similarity_threshold', LEAST(threshold, 1)::text, true);
+
+    LOOP
+        IF threshold < 1 THEN
+            INSERT INTO skill_alias (alias, category, skill_id, similarity)
+            SELECT k.alias, k.category, m.id, m.similarity
+            FROM (
+                SELECT DISTINCT skill_key(i.n) AS alias, i.cat AS category
+                FROM unnest(names, categories) i (n, cat)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM skill_alias a WHERE a.alias = skill_key(i.n) AND a.category = i.cat
+                )
+            ) k
+            CROSS JOIN LATERAL (
+                SELECT s.id, similarity(skill_key(s.name), k.alias) AS similarity
+                FROM skill s
+                WHERE skill_key(s.name) % k.alias
+                  AND s.category = k.category
+                ORDER BY 2 DESC, s.id
+                LIMIT 1
+            ) m
+            ORDER BY k.alias, k.category
+            ON CONFLICT (alias, category) DO NOTHING;
+        END IF;
+
+        TRUNCATE resolve_skill_keys;
+        INSERT INTO resolve_skill_keys (alias, category, name)
+        SELECT skill_key(i.n), i.cat, min(i.n)
+        FROM unnest(names, categories) i (n, cat)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM skill_alias a WHERE a.alias = skill_key(i.n) AND a.category = i.cat
+        )
+        GROUP BY 1, 2;
+        EXIT WHEN NOT FOUND;
+
+        IF threshold < 1 THEN
+            DELETE FROM resolve_skill_keys k
+            WHERE EXISTS (
+                SELECT 1 FROM resolve_skill_keys o
+                WHERE o.alias % k.alias AND o.category = k.category AND o.alias < k.alias
+            );
+        END IF;
+
+        WITH new_skill AS (
+            INSERT INTO skill (name, category)
+            SELECT name, category FROM resolve_skill_keys
+            ORDER BY name, category
+            ON CONFLICT (name, category) DO NOTHING
+            RETURNING id, name, category
+        ),
+        canonical AS (
+            SELECT k.alias, k.category, COALESCE(ns.id, s.id) AS id, ns.id AS new_id
+            FROM resolve_skill_keys k
+            LEFT JOIN new_skill ns ON ns.name = k.name AND ns.category = k.category
+            LEFT JOIN skill s ON s.name = k.name AND s.category = k.category
+        ),
+        aliased AS (
+            INSERT INTO skill_alias (alias, category, skill_id, similarity)
+            SELECT alias, category, id, 1 FROM canonical
+            WHERE id IS NOT NULL
+            ORDER BY alias, category
+            ON CONFLICT (alias, category) DO NOTHING
+        )
+        SELECT COALESCE(array_agg(new_id) FILTER (WHERE new_id IS NOT NULL), '{}')
+        INTO new_ids
+        FROM canonical;
+
+        DELETE FROM skill t
+        WHERE t.id = ANY(new_ids)
+          AND NOT EXISTS (SELECT 1 FROM skill_alias a WHERE a.skill_id = t.id);
+        created := created || new_ids;
+    END LOOP;
+
+    PERFORM set_config('pg_trgm.similarity_threshold', COALESCE(previous, '0.3'), true);
+
+    RETURN QUERY
+    SELECT d.n, d.cat, s.id, s.id = ANY(created) AND s.name = d.n
+    FROM (SELECT DISTINCT n, cat FROM unnest(names, categories) i (n, cat)) d
+    JOIN skill_alias a ON a.alias = skill_key(d.n) AND a.category = d.cat
+    JOIN skill s ON s.id = a.skill_id;
+END
+$$;
+
+-- Links of offers dated after their links were written: the foreign key
+-- does not reference (nor cascade to) a link with a NULL date_posted
+-- (MATCH SIMPLE), the loaders now move them with their offer
+UPDATE job_offer_skill jos
+SET date_posted = jo.date_posted
+FROM job_offer jo
+WHERE jos.job_offer_id = jo.id
+  AND jos.date_posted IS NULL
+  AND jo.date_posted IS NOT NULL;
+
+-- Staging tables of the COPY loader, temporary since (ingestion/copy_loader.py)
+DROP TABLE IF EXISTS stg_job_offer, stg_job_offer_skill, stg_job_offer_upserted, stg_company, stg_skill;
 
 -- =========================
 -- RESET TABLES